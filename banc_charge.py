@@ -0,0 +1,336 @@
+# banc_charge.py
+# Banc de charge: rejoue un melange pondere d'URLs de pages contre serveur.py
+#
+# Objectif:
+# - Comparer les modes du serveur (cgi / interne / workers, --processus N, cache...)
+# - Detecter une regression avant de deployer (debit, latences, erreurs)
+# - Resultat en JSON: debit (req/s), percentiles de latence, taux d'erreur, detail par URL
+#
+# Utilisation (depuis la racine du serveur):
+#   python banc_charge.py --port 578 --concurrence 8 --duree 20
+#   python banc_charge.py --lancer-serveur "--mode workers --workers 4" --duree 20 > workers.json
+#   python banc_charge.py --urls melange.txt --requetes 2000
+#   python banc_charge.py --lancer-serveur "--mode interne" --reference workers.json --tolerance 0.2
+#
+# Fichier --urls: une ligne "poids url" (ex: "5 /cgi-bin/sim.py?uid={uid}&action=simuler"),
+# lignes vides et "#" ignorees. {uid} = univers de test (--uid, sinon le premier de cgi-bin/universes)
+#
+# IMPORTANT:
+# - Les pages sont vraiment executees: lancer le banc sur une copie si on ne veut pas
+#   que les bases bougent (les URLs par defaut ne font que lire)
+# - recherche.py avec des resultats appelle des API externes (Unsplash, LibreTranslate):
+#   le melange par defaut utilise une recherche sans resultat
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+import subprocess
+import statistics
+import http.client
+
+
+# ============================================================
+# Melange d'URLs par defaut (poids, url)
+# ============================================================
+
+MELANGE_DEFAUT = (
+    (10, "/cgi-bin/vrai_index.py"),
+    (6, "/cgi-bin/index.py"),
+    (4, "/cgi-bin/calculs_classements.py?type=top&critere=prix"),
+    (2, "/cgi-bin/calculs_classements.py?type=flop&critere=ca&filtre_mode=famille&filtre_valeur=Textile"),
+    (3, "/cgi-bin/recherche_populaire.py?choix=cher"),
+    (3, "/cgi-bin/filtre_simple.py?famille=Textile"),
+    (4, "/cgi-bin/objet.py?nom=Drapeau%20danois%20(2x1.5m)"),
+    (4, "/cgi-bin/recherche.py?q=xqzwk"),
+    (2, "/cgi-bin/univers_dashboard.py?uid={uid}"),
+    (3, "/cgi-bin/liaison.py?uid={uid}"),
+    (2, "/cgi-bin/liaison.py?uid={uid}&vue=reseaux"),
+    (2, "/cgi-bin/sim.py?uid={uid}"),
+    (3, "/cgi-bin/sim.py?uid={uid}&action=simuler&selection_ids=1,2,3,4,5&nb_annees=20"
+        "&planning=1:0:0.9:1.0,2:3:1.1:1.0"),
+    (1, "/cgi-bin/sim.py?uid={uid}&action=simuler&famille=Textile&nb_annees=80&planning=1:2:1.2:1.0"),
+    (8, "/fond.png"),
+)
+
+DOSSIER_UNIVERS = "cgi-bin/universes"
+
+PERCENTILES = (50, 90, 95, 99)
+
+# Temps max d'attente du serveur lance par --lancer-serveur
+DELAI_DEMARRAGE = 15.0
+
+
+# ============================================================
+# Melange
+# ============================================================
+
+def premier_univers():
+    """uid du premier univers de cgi-bin/universes (ou '' s'il n'y en a pas)."""
+    try:
+        noms = sorted(os.listdir(DOSSIER_UNIVERS))
+    except OSError:
+        return ""
+    for nom in noms:
+        if nom.startswith("universe_") and nom.endswith(".db"):
+            return nom[len("universe_"):-len(".db")]
+    return ""
+
+
+def lire_melange(chemin):
+    """Fichier 'poids url' -> [(poids, url)]."""
+    melange = []
+    with open(chemin, encoding="utf-8") as f:
+        for ligne in f:
+            ligne = ligne.strip()
+            if not ligne or ligne.startswith("#"):
+                continue
+            poids, _, url = ligne.partition(" ")
+            melange.append((float(poids), url.strip()))
+    return melange
+
+
+def preparer_melange(melange, uid):
+    return [(poids, url.replace("{uid}", uid)) for (poids, url) in melange if poids > 0]
+
+
+# ============================================================
+# Clients
+# ============================================================
+
+class Resultats:
+    """Mesures de tous les clients (thread-safe)."""
+
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.latences = []
+        self.par_url = {}
+        self.codes = {}
+        self.erreurs = {}
+        self.octets = 0
+
+    def ajouter(self, url, latence, code, octets, erreur=None):
+        with self.verrou:
+            d = self.par_url.setdefault(url, {"latences": [], "erreurs": 0})
+            if erreur is not None or code >= 400:
+                cle = erreur or "HTTP {}".format(code)
+                self.erreurs[cle] = self.erreurs.get(cle, 0) + 1
+                d["erreurs"] += 1
+            if code:
+                self.codes[code] = self.codes.get(code, 0) + 1
+            self.latences.append(latence)
+            d["latences"].append(latence)
+            self.octets += octets
+
+
+def client(hote, port, melange, fin, reste, resultats, graine, keepalive, delai):
+    """Un client: enchaine les requetes jusqu'a la fin du temps ou du nombre de requetes."""
+    tirage = random.Random(graine)
+    urls = [u for (_p, u) in melange]
+    poids = [p for (p, _u) in melange]
+    connexion = None
+
+    while time.time() < fin:
+        if reste is not None:
+            with reste["verrou"]:
+                if reste["n"] <= 0:
+                    break
+                reste["n"] -= 1
+
+        url = tirage.choices(urls, weights=poids)[0]
+        if connexion is None:
+            connexion = http.client.HTTPConnection(hote, port, timeout=delai)
+
+        debut = time.perf_counter()
+        try:
+            connexion.request("GET", url, headers={"Accept-Encoding": "gzip"})
+            reponse = connexion.getresponse()
+            corps = reponse.read()
+            latence = time.perf_counter() - debut
+            resultats.ajouter(url, latence, reponse.status, len(corps))
+            if not keepalive or reponse.will_close:
+                connexion.close()
+                connexion = None
+        except (OSError, http.client.HTTPException) as e:
+            resultats.ajouter(url, time.perf_counter() - debut, 0, 0, type(e).__name__)
+            connexion.close()
+            connexion = None
+
+    if connexion is not None:
+        connexion.close()
+
+
+def percentile(valeurs_triees, p):
+    """Percentile (rang le plus proche) d'une liste deja triee."""
+    if not valeurs_triees:
+        return 0.0
+    rang = -(-p * len(valeurs_triees) // 100)
+    return valeurs_triees[max(0, min(len(valeurs_triees), rang) - 1)]
+
+
+def resume_latences(latences):
+    triees = sorted(latences)
+    resume = {"p{}".format(p): round(percentile(triees, p) * 1000, 2) for p in PERCENTILES}
+    resume["moyenne"] = round(statistics.fmean(triees) * 1000, 2) if triees else 0.0
+    resume["max"] = round(triees[-1] * 1000, 2) if triees else 0.0
+    return resume
+
+
+def lancer_banc(hote, port, melange, concurrence=8, duree=10.0, nb_requetes=None,
+                echauffement=1.0, graine=1, keepalive=True, delai=30.0):
+    """Lance le banc. Retour: rapport (dict serialisable en JSON)."""
+    # Echauffement: caches du serveur (code compile, modules, pages...) remplis avant la mesure
+    if echauffement > 0:
+        lancer_clients(hote, port, melange, concurrence, time.time() + echauffement, None,
+                       Resultats(), graine + 1000, keepalive, delai)
+
+    resultats = Resultats()
+    reste = {"n": nb_requetes, "verrou": threading.Lock()} if nb_requetes else None
+    limite = duree if not nb_requetes else 24 * 3600.0
+    debut = time.perf_counter()
+    lancer_clients(hote, port, melange, concurrence, time.time() + limite, reste,
+                   resultats, graine, keepalive, delai)
+    ecoule = time.perf_counter() - debut
+
+    nb = len(resultats.latences)
+    nb_erreurs = sum(resultats.erreurs.values())
+    return {
+        "cible": "{}:{}".format(hote, port),
+        "concurrence": concurrence,
+        "keepalive": keepalive,
+        "duree_s": round(ecoule, 3),
+        "requetes": nb,
+        "debit_rps": round(nb / ecoule, 2) if ecoule > 0 else 0.0,
+        "octets": resultats.octets,
+        "erreurs": nb_erreurs,
+        "taux_erreur": round(nb_erreurs / nb, 4) if nb else 0.0,
+        "detail_erreurs": resultats.erreurs,
+        "codes": {str(c): n for (c, n) in sorted(resultats.codes.items())},
+        "latence_ms": resume_latences(resultats.latences),
+        "urls": {
+            url: dict(requetes=len(d["latences"]), erreurs=d["erreurs"], **resume_latences(d["latences"]))
+            for (url, d) in sorted(resultats.par_url.items())
+        },
+    }
+
+
+def lancer_clients(hote, port, melange, concurrence, fin, reste, resultats, graine, keepalive, delai):
+    threads = [
+        threading.Thread(
+            target=client,
+            args=(hote, port, melange, fin, reste, resultats, graine + i, keepalive, delai),
+            daemon=True
+        )
+        for i in range(max(1, concurrence))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+# ============================================================
+# Serveur lance par le banc (--lancer-serveur)
+# ============================================================
+
+def attendre_port(hote, port, processus):
+    limite = time.time() + DELAI_DEMARRAGE
+    while time.time() < limite:
+        if processus.poll() is not None:
+            raise SystemExit("Le serveur s'est arrete (code {})".format(processus.returncode))
+        try:
+            socket.create_connection((hote, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit("Le serveur ne repond pas sur le port {}".format(port))
+
+
+def demarrer_serveur(port, arguments):
+    commande = [sys.executable, "serveur.py", "--port", str(port)] + arguments.split()
+    return subprocess.Popen(commande, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def arreter_serveur(processus):
+    processus.terminate()
+    try:
+        processus.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        processus.kill()
+        processus.wait()
+
+
+# ============================================================
+# Comparaison avec un rapport de reference
+# ============================================================
+
+def comparer(rapport, reference, tolerance):
+    """Liste des regressions (debit, p95, taux d'erreur) au dela de la tolerance."""
+    regressions = []
+    if rapport["debit_rps"] < reference["debit_rps"] * (1 - tolerance):
+        regressions.append("debit {} < {} req/s".format(rapport["debit_rps"], reference["debit_rps"]))
+    if rapport["latence_ms"]["p95"] > reference["latence_ms"]["p95"] * (1 + tolerance):
+        regressions.append("p95 {} > {} ms".format(rapport["latence_ms"]["p95"], reference["latence_ms"]["p95"]))
+    if rapport["taux_erreur"] > reference["taux_erreur"] + 0.01:
+        regressions.append("erreurs {} > {}".format(rapport["taux_erreur"], reference["taux_erreur"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Banc de charge des pages du serveur")
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=578)
+    parser.add_argument("--concurrence", type=int, default=8, help="clients simultanes")
+    parser.add_argument("--duree", type=float, default=10.0, help="secondes de mesure")
+    parser.add_argument("--requetes", type=int, default=None, help="nombre de requetes (au lieu de --duree)")
+    parser.add_argument("--echauffement", type=float, default=1.0, help="secondes non mesurees au debut")
+    parser.add_argument("--urls", default=None, help="fichier 'poids url' (defaut: melange integre)")
+    parser.add_argument("--uid", default=None, help="univers utilise pour {uid}")
+    parser.add_argument("--graine", type=int, default=1, help="graine du tirage des URLs (reproductible)")
+    parser.add_argument("--sans-keepalive", action="store_true", help="une connexion par requete")
+    parser.add_argument("--delai", type=float, default=30.0, help="timeout d'une requete (s)")
+    parser.add_argument("--lancer-serveur", default=None, metavar="OPTIONS",
+                        help="lancer serveur.py avec ces options pendant le banc (ex: \"--mode workers\")")
+    parser.add_argument("--reference", default=None, help="rapport JSON de reference a comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="ecart tolere avec la reference")
+    options = parser.parse_args()
+
+    uid = options.uid if options.uid is not None else premier_univers()
+    melange = preparer_melange(lire_melange(options.urls) if options.urls else MELANGE_DEFAUT, uid)
+    if not melange:
+        raise SystemExit("Melange d'URLs vide")
+
+    serveur = None
+    if options.lancer_serveur is not None:
+        serveur = demarrer_serveur(options.port, options.lancer_serveur)
+    try:
+        if serveur is not None:
+            attendre_port(options.hote, options.port, serveur)
+        rapport = lancer_banc(
+            options.hote, options.port, melange,
+            concurrence=options.concurrence,
+            duree=options.duree,
+            nb_requetes=options.requetes,
+            echauffement=options.echauffement,
+            graine=options.graine,
+            keepalive=not options.sans_keepalive,
+            delai=options.delai,
+        )
+    finally:
+        if serveur is not None:
+            arreter_serveur(serveur)
+
+    if options.lancer_serveur is not None:
+        rapport["serveur"] = options.lancer_serveur
+    code_sortie = 0
+    if options.reference:
+        with open(options.reference, encoding="utf-8") as f:
+            rapport["regressions"] = comparer(rapport, json.load(f), options.tolerance)
+        code_sortie = 1 if rapport["regressions"] else 0
+
+    print(json.dumps(rapport, indent=2, ensure_ascii=False))
+    sys.exit(code_sortie)
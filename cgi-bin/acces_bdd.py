@@ -0,0 +1,432 @@
+# acces_bdd.py
+# Acces commun aux bases SQLite (objets.db, events.db, universes/*.db)
+#
+# But:
+# - Une seule connexion par base et par page (au lieu d'un sqlite3.connect par fonction)
+# - Reglages appliques une fois a l'ouverture:
+#     * journal WAL (lectures et ecriture en parallele) pour les connexions en ecriture
+#     * mmap_size / cache_size / temp_store=MEMORY (moins de lectures disque)
+#     * busy_timeout (attente au lieu d'une erreur "database is locked")
+#     * cache de requetes preparees plus grand
+# - Connexions en lecture seule pour les pages GET (mode=ro)
+# - Serveur en mode interne / workers: les connexions sont gardees entre deux pages
+#   (serveur_pages appelle fin_de_page() apres chaque page)
+#
+# Utilisation:
+#   from acces_bdd import connecter
+#   conn = connecter("cgi-bin/objets.db", lecture_seule=True)
+#   ...
+#   conn.close()   # rend la connexion (transaction non validee annulee, comme avant)
+#
+# IMPORTANT:
+# - Dans une meme page, connecter() renvoie toujours la meme connexion pour une base donnee
+# - Une base remplacee / supprimee sur le disque est rouverte automatiquement
+# - Variable d'environnement TRACE_SQL=fichier.jsonl: trace des requetes de chaque page (trace_sql.py)
+# - Ecritures concurrentes (plusieurs pages / processus): passer par ecrire(conn, travail)
+#   (BEGIN IMMEDIATE + nouveaux essais si la base est occupee, voir plus bas)
+
+import os
+import time
+import random
+import sqlite3
+import pathlib
+import threading
+
+try:
+    import fcntl  # verrou de fichier entre processus (absent sous Windows)
+except ImportError:
+    fcntl = None
+
+# Trace SQL optionnelle (aucun cout si TRACE_SQL n'est pas definie)
+if os.environ.get("TRACE_SQL"):
+    import trace_sql
+else:
+    trace_sql = None
+
+
+# ============================================================
+# Reglages
+# ============================================================
+
+DELAI_VERROU_MS = 5000           # busy_timeout
+TAILLE_MMAP = 64 * 1024 * 1024   # mmap_size (octets)
+TAILLE_CACHE_KO = 16 * 1024      # cache_size (cache de pages SQLite, en Kio)
+NB_REQUETES_PREPAREES = 256      # cache de requetes preparees par connexion
+
+# Connexions inactives gardees par base (serveur en mode interne)
+NB_INACTIVES_MAX = 4
+
+# Ecritures (ecrire()): attente bornee par essai, puis nouvel essai apres une pause aleatoire
+DELAI_ESSAI_ECRITURE_MS = 1000   # busy_timeout pendant un essai
+NB_ESSAIS_ECRITURE = 6
+PAUSE_ECRITURE_S = 0.02          # pause max avant le 2e essai, doublee a chaque essai
+
+# ECRITURE_EN_FILE=1: une seule ecriture a la fois par base, tous processus confondus
+# (verrou sur le fichier "<base>-ecriture"); sinon seulement entre les threads d'un processus
+ECRITURE_EN_FILE = os.environ.get("ECRITURE_EN_FILE", "") not in ("", "0")
+
+
+class ConnexionPartagee(sqlite3.Connection):
+    """
+    Connexion SQLite reutilisable:
+    close() ne ferme pas vraiment (annule seulement une transaction non validee),
+    fermer() ferme pour de bon.
+    """
+
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def fermer(self):
+        sqlite3.Connection.close(self)
+
+
+class ConnexionTracee(ConnexionPartagee):
+    """Connexion dont les curseurs sont mesures (TRACE_SQL, voir trace_sql.py)."""
+
+    def cursor(self, factory=None):
+        return ConnexionPartagee.cursor(self, factory or trace_sql.CurseurTrace)
+
+    # sqlite3.Connection.execute() ne passe pas par cursor(): raccourcis refaits ici
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, suite):
+        return self.cursor().executemany(sql, suite)
+
+
+# ============================================================
+# Ouverture + reglages
+# ============================================================
+
+def _identite_fichier(chemin):
+    try:
+        st = os.stat(chemin)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino)
+
+
+def version_fichier(chemin):
+    """Identite + date + taille de la base et de son -wal (change a chaque ecriture validee)."""
+    version = []
+    for fichier in (chemin, chemin + "-wal"):
+        try:
+            st = os.stat(fichier)
+            version.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
+
+def _ouvrir(chemin_abs, lecture_seule):
+    if lecture_seule:
+        cible = pathlib.Path(chemin_abs).as_uri() + "?mode=ro"
+    else:
+        cible = chemin_abs
+    conn = sqlite3.connect(
+        cible,
+        uri=lecture_seule,
+        timeout=DELAI_VERROU_MS / 1000.0,
+        cached_statements=NB_REQUETES_PREPAREES,
+        check_same_thread=False,
+        factory=ConnexionPartagee if trace_sql is None else ConnexionTracee,
+    )
+    conn.identite = _identite_fichier(chemin_abs)
+    conn.chemin = chemin_abs
+    conn.execute("PRAGMA busy_timeout = %d" % DELAI_VERROU_MS)
+    conn.execute("PRAGMA mmap_size = %d" % TAILLE_MMAP)
+    conn.execute("PRAGMA cache_size = -%d" % TAILLE_CACHE_KO)
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+    if not lecture_seule:
+        # WAL: les lecteurs ne bloquent plus l'ecrivain (et inversement). Reglage persistant.
+        try:
+            if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() != "wal":
+                conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        except sqlite3.OperationalError:
+            # Base occupee au moment du passage en WAL: on reessaiera a la prochaine ouverture
+            pass
+
+    if trace_sql is not None:
+        trace_sql.brancher(conn)
+    _brancher_observateur(conn)
+    return conn
+
+
+def _reinitialiser(conn):
+    """Etat par defaut avant de confier la connexion a une page."""
+    if conn.in_transaction:
+        conn.rollback()
+    conn.row_factory = None
+    conn.text_factory = str
+
+
+# ============================================================
+# Connexions par page + reserve de connexions inactives
+# ============================================================
+
+_inactives = {}  # (chemin_abs, lecture_seule) -> [connexions]
+_verrou = threading.Lock()
+_local = threading.local()
+
+
+def _empruntees():
+    empruntees = getattr(_local, "empruntees", None)
+    if empruntees is None:
+        empruntees = _local.empruntees = {}
+    return empruntees
+
+
+def _prendre_inactive(cle):
+    while True:
+        with _verrou:
+            liste = _inactives.get(cle)
+            if not liste:
+                return None
+            conn = liste.pop()
+        if conn.identite is not None and conn.identite == _identite_fichier(cle[0]):
+            return conn
+        # Fichier supprime ou remplace depuis l'ouverture
+        conn.fermer()
+
+
+def connecter(chemin, lecture_seule=False):
+    """Connexion a la base 'chemin' (la meme pour toute la page)."""
+    cle = (os.path.abspath(chemin), bool(lecture_seule))
+    empruntees = _empruntees()
+    conn = empruntees.get(cle)
+    if conn is not None:
+        return conn
+
+    conn = _prendre_inactive(cle)
+    if conn is None:
+        conn = _ouvrir(*cle)
+    _reinitialiser(conn)
+    empruntees[cle] = conn
+    return conn
+
+
+def fin_de_page():
+    """Fin d'une page (serveur): transactions oubliees annulees, connexions rendues."""
+    empruntees = _empruntees()
+    for cle, conn in list(empruntees.items()):
+        try:
+            _reinitialiser(conn)
+        except sqlite3.Error:
+            conn.fermer()
+            continue
+        with _verrou:
+            liste = _inactives.setdefault(cle, [])
+            if len(liste) < NB_INACTIVES_MAX:
+                liste.append(conn)
+                conn = None
+        if conn is not None:
+            conn.fermer()
+    empruntees.clear()
+    if trace_sql is not None:
+        trace_sql.fin_de_page()
+
+
+def oublier(chemin):
+    """Ferme toutes les connexions inactives vers 'chemin' (avant suppression du fichier)."""
+    chemin_abs = os.path.abspath(chemin)
+    empruntees = _empruntees()
+    for lecture_seule in (False, True):
+        cle = (chemin_abs, lecture_seule)
+        conn = empruntees.pop(cle, None)
+        if conn is not None:
+            conn.fermer()
+        with _verrou:
+            liste = _inactives.pop(cle, [])
+        for conn in liste:
+            conn.fermer()
+
+
+def supprimer_bdd(chemin):
+    """Supprime une base et ses fichiers WAL (-wal, -shm), file d'ecriture et memo des propagations."""
+    oublier(chemin)
+    for fichier in (chemin, chemin + "-wal", chemin + "-shm", chemin + "-ecriture",
+                    chemin + "-propagations-O", chemin + "-propagations-E"):
+        if os.path.exists(fichier):
+            os.remove(fichier)
+
+
+# ============================================================
+# Ecritures concurrentes: BEGIN IMMEDIATE, attente bornee, nouveaux essais, file par base
+# ============================================================
+
+class BaseOccupee(sqlite3.OperationalError):
+    """Ecriture abandonnee: base toujours verrouillee apres tous les essais."""
+
+
+_verrous_ecriture = {}  # chemin_abs -> threading.Lock (une ecriture a la fois par base et par processus)
+
+
+def _verrou_ecriture(chemin):
+    with _verrou:
+        verrou = _verrous_ecriture.get(chemin)
+        if verrou is None:
+            verrou = _verrous_ecriture[chemin] = threading.Lock()
+    return verrou
+
+
+def base_occupee(erreur):
+    """Vrai si l'erreur SQLite vient d'un verrou (base occupee): l'ecriture peut etre retentee."""
+    message = str(erreur).lower()
+    return "locked" in message or "busy" in message
+
+
+class _FileEcriture:
+    """File d'ecriture d'une base: verrou entre threads, + verrou de fichier entre processus (option)."""
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.verrou = _verrou_ecriture(chemin)
+        self.fichier = None
+
+    def __enter__(self):
+        self.verrou.acquire()
+        if ECRITURE_EN_FILE and fcntl is not None and self.chemin:
+            try:
+                self.fichier = open(self.chemin + "-ecriture", "a")
+                fcntl.flock(self.fichier, fcntl.LOCK_EX)
+            except OSError:
+                # Dossier en lecture seule...: on garde seulement le verrou entre threads
+                self.fermer()
+        return self
+
+    def fermer(self):
+        if self.fichier is not None:
+            self.fichier.close()  # libere aussi le flock
+            self.fichier = None
+
+    def __exit__(self, *_erreur):
+        self.fermer()
+        self.verrou.release()
+
+
+def ecrire(connexion, travail, essais=NB_ESSAIS_ECRITURE):
+    """
+    Execute travail(connexion) dans une transaction d'ecriture, puis valide (COMMIT).
+    - BEGIN IMMEDIATE: le verrou d'ecriture est pris des le debut (pas d'echec au milieu)
+    - Base occupee ("database is locked"): annulation, pause aleatoire croissante, nouvel essai
+      (travail est alors rappele en entier: il ne doit rien faire d'autre qu'ecrire)
+    - Deja dans une transaction: travail en fait partie, rien n'est valide ici
+    Retour: valeur rendue par travail. BaseOccupee si tous les essais echouent.
+    """
+    if connexion.in_transaction:
+        return travail(connexion)
+
+    with _FileEcriture(chemin_connexion(connexion)):
+        connexion.execute("PRAGMA busy_timeout = %d" % DELAI_ESSAI_ECRITURE_MS)
+        try:
+            for essai in range(essais):
+                if essai:
+                    # Pause aleatoire (jitter): les ecrivains en conflit ne repartent pas ensemble
+                    time.sleep(random.uniform(0, PAUSE_ECRITURE_S * (2 ** (essai - 1))))
+                try:
+                    connexion.execute("BEGIN IMMEDIATE")
+                    resultat = travail(connexion)
+                    connexion.commit()
+                    return resultat
+                except sqlite3.OperationalError as e:
+                    if connexion.in_transaction:
+                        connexion.rollback()
+                    if not base_occupee(e):
+                        raise
+                except BaseException:
+                    if connexion.in_transaction:
+                        connexion.rollback()
+                    raise
+            raise BaseOccupee("base occupee: ecriture abandonnee apres %d essais" % essais)
+        finally:
+            connexion.execute("PRAGMA busy_timeout = %d" % DELAI_VERROU_MS)
+
+
+# ============================================================
+# Observation des requetes (outils: conseil_index.py, trace_sql.py)
+# ============================================================
+
+_observateur = None  # fonction(chemin, sql) ou None
+
+
+def _brancher_observateur(conn):
+    # Un seul set_trace_callback par connexion: observateur et trace SQL partagent le meme
+    chemin = conn.chemin
+    observateur = _observateur
+    if observateur is None and trace_sql is None:
+        conn.set_trace_callback(None)
+    elif trace_sql is None:
+        conn.set_trace_callback(lambda sql: observateur(chemin, sql))
+    elif observateur is None:
+        conn.set_trace_callback(trace_sql.instruction)
+    else:
+        def rappel(sql):
+            trace_sql.instruction(sql)
+            observateur(chemin, sql)
+        conn.set_trace_callback(rappel)
+
+
+def observer_requetes(fonction):
+    """
+    fonction(chemin, sql) sera appelee pour chaque instruction SQL executee
+    (parametres deja remplaces dans 'sql'). None: arret de l'observation.
+    """
+    global _observateur
+    _observateur = fonction
+    with _verrou:
+        connexions = [c for liste in _inactives.values() for c in liste]
+    connexions += list(_empruntees().values())
+    for conn in connexions:
+        _brancher_observateur(conn)
+
+
+# ============================================================
+# Cache du schema (colonnes des tables), invalide par PRAGMA schema_version
+# ============================================================
+
+_schemas = {}  # (chemin, table ou cle) -> ((identite fichier, schema_version), valeur)
+
+
+def chemin_connexion(connexion):
+    """Fichier de la base 'main' d'une connexion ('' pour une base en memoire)."""
+    chemin = getattr(connexion, "chemin", None)
+    if chemin is None:
+        for _seq, nom, fichier in connexion.execute("PRAGMA database_list"):
+            if nom == "main":
+                return fichier or ""
+        return ""
+    return chemin
+
+
+def memoriser_schema(connexion, cle, calcul):
+    """
+    Valeur derivee du schema (ex: correspondance de colonnes), calculee une seule fois
+    par version du schema: calcul(connexion) n'est rappele qu'apres un CREATE / ALTER / DROP.
+    """
+    chemin = chemin_connexion(connexion)
+    if not chemin:
+        return calcul(connexion)
+    # Fichier recree au meme chemin: schema_version peut repartir a la meme valeur
+    version = (getattr(connexion, "identite", None),
+               connexion.execute("PRAGMA schema_version").fetchone()[0])
+    entree = _schemas.get((chemin, cle))
+    if entree is not None and entree[0] == version:
+        return entree[1]
+    valeur = calcul(connexion)
+    _schemas[(chemin, cle)] = (version, valeur)
+    return valeur
+
+
+def infos_colonnes(connexion, table):
+    """Lignes de PRAGMA table_info(table) (tuple vide si la table n'existe pas), en cache."""
+    def lire(conn):
+        return tuple(conn.execute('PRAGMA table_info("{}")'.format(table.replace('"', '""'))).fetchall())
+    return memoriser_schema(connexion, ("table_info", table), lire)
+
+
+def noms_colonnes(connexion, table):
+    """Noms des colonnes de la table (liste, dans l'ordre du schema)."""
+    return [c[1] for c in infos_colonnes(connexion, table)]
@@ -1,11 +1,12 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
-import sqlite3
 import html
 import urllib.parse
 import os
 
+from catalogue import catalogue
+
 print("Content-Type: text/html; charset=utf-8\n")
 
 DB_PATH = "cgi-bin/objets.db"
@@ -33,7 +34,7 @@ if type_classement not in ("top", "flop"):
     type_classement = "top"
 
 # ==========================
-# MAPPING CRITERES SQL
+# MAPPING CRITERES (colonnes)
 # ==========================
 criteres_sql = {
     "prix": ("Prix_Moyen_Actuel", "Prix moyen"),
@@ -45,55 +46,33 @@ if critere not in criteres_sql:
     critere = "prix"
 
 colonne, label_colonne = criteres_sql[critere]
-ordre = "DESC" if type_classement == "top" else "ASC"
+decroissant = type_classement == "top"
 
 # ==========================
-# FILTRE SQL
+# FILTRE
 # ==========================
-conditions = [f"{colonne} IS NOT NULL"]
-params = []
+egal = {}
 
 if filtre_mode == "famille" and filtre_valeur:
-    conditions.append("Famille = ?")
-    params.append(filtre_valeur)
+    egal["Famille"] = filtre_valeur
 elif filtre_mode == "type" and filtre_valeur:
-    conditions.append("Type = ?")
-    params.append(filtre_valeur)
+    egal["Type"] = filtre_valeur
 else:
     filtre_mode = "aucun"
     filtre_valeur = ""
 
-where_sql = " AND ".join(conditions)
-
 # ==========================
-# REQUETE SQL
+# CLASSEMENT (instantane en memoire de Prix_Objets, voir catalogue.py)
 # ==========================
-sql = f"""
-SELECT Objet, {colonne}, Famille, Type
-FROM Prix_Objets
-WHERE {where_sql}
-ORDER BY {colonne} {ordre}
-LIMIT ?
-"""
-
-params.append(limite)
-
-conn = sqlite3.connect(DB_PATH)
-cur = conn.cursor()
-cur.execute(sql, params)
-rows = cur.fetchall()
-conn.close()
+cat = catalogue(DB_PATH)
+indices = cat.filtrer(egal=egal, non_nuls=(colonne,))
+rows = cat.lignes(("Objet", colonne, "Famille", "Type"), cat.top(colonne, limite, decroissant, indices))
 
 # ==========================
 # LISTES POUR SELECT
 # ==========================
-conn = sqlite3.connect(DB_PATH)
-cur = conn.cursor()
-cur.execute("SELECT DISTINCT Famille FROM Prix_Objets WHERE Famille IS NOT NULL")
-familles = [r[0] for r in cur.fetchall()]
-cur.execute("SELECT DISTINCT Type FROM Prix_Objets WHERE Type IS NOT NULL")
-types = [r[0] for r in cur.fetchall()]
-conn.close()
+familles = cat.distinctes("Famille")
+types = cat.distinctes("Type")
 
 # ==========================
 # HTML
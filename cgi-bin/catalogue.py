@@ -0,0 +1,241 @@
+# catalogue.py
+# Instantane en memoire (lecture seule) de la table Prix_Objets de objets.db
+#
+# But:
+# - Prix_Objets (~600 lignes) ne change presque jamais, mais chaque page la relisait en SQL
+# - La table est chargee une fois en colonnes compactes:
+#     * colonnes numeriques typees (array 'd' pour REAL, NULL -> NaN ; array 'q' pour INTEGER)
+#     * autres colonnes en tuples
+# - Filtre / tri / top-k / recherche par valeur directement en python, sans requete
+# - Rechargement automatique quand objets.db change (date + taille de la base et du -wal)
+# - Serveur en mode interne / workers: l'instantane est partage entre les pages
+#
+# Utilisation:
+#   from catalogue import catalogue, comme
+#   cat = catalogue()
+#   indices = cat.filtrer(egal={"Famille": "Textile"}, maxi={"Prix_Moyen_Actuel": 50.0})
+#   rows = cat.lignes(("Objet", "Prix_Moyen_Actuel"), indices)
+#   meilleurs = cat.top("Prix_Moyen_Actuel", 10)
+#
+# IMPORTANT:
+# - Meme resultat que le SQL remplace: ordre des lignes = ordre de la table (rowid),
+#   tris stables, NULL exclus des comparaisons (comme en SQL)
+
+import os
+import re
+import math
+import heapq
+import threading
+from array import array
+
+from acces_bdd import connecter, version_fichier
+from facettes import Facette
+
+
+CHEMIN_OBJETS = "cgi-bin/objets.db"
+TABLE_OBJETS = "Prix_Objets"
+
+
+# ============================================================
+# Outils
+# ============================================================
+
+def _colonne_compacte(valeurs):
+    """Colonne typee si possible: REAL -> array('d') (NULL = NaN), INTEGER sans NULL -> array('q')."""
+    types = {type(v) for v in valeurs}
+    if types and types <= {float, type(None)}:
+        return array("d", [math.nan if v is None else v for v in valeurs])
+    if types == {int}:
+        try:
+            return array("q", valeurs)
+        except OverflowError:
+            pass
+    return tuple(valeurs)
+
+
+def _lire_valeur(colonne, i):
+    v = colonne[i]
+    if v != v:  # NaN = NULL
+        return None
+    return v
+
+
+def comme(motif):
+    """
+    Predicat equivalent a SQL 'valeur LIKE motif' (% et _, casse ignoree pour les lettres ASCII
+    seulement, comme SQLite). NULL ne correspond jamais.
+    """
+    morceaux = []
+    for c in motif:
+        if c == "%":
+            morceaux.append(".*")
+        elif c == "_":
+            morceaux.append(".")
+        elif "a" <= c.lower() <= "z" and c.isascii():
+            morceaux.append("[" + c.lower() + c.upper() + "]")
+        else:
+            morceaux.append(re.escape(c))
+    expression = re.compile("".join(morceaux), re.DOTALL)
+
+    def predicat(valeur):
+        return valeur is not None and expression.fullmatch(str(valeur)) is not None
+    return predicat
+
+
+# ============================================================
+# Instantane
+# ============================================================
+
+class Instantane:
+    """Copie en colonnes d'une table (lecture seule)."""
+
+    def __init__(self, noms, lignes, version):
+        self.colonnes = tuple(noms)
+        self.version = version
+        self.nb_lignes = len(lignes)
+        self._donnees = {
+            nom: _colonne_compacte([ligne[j] for ligne in lignes])
+            for j, nom in enumerate(self.colonnes)
+        }
+        self._index = {}  # colonne -> {valeur: premier indice}
+        self._facettes = {}  # colonne -> Facette
+
+    def __len__(self):
+        return self.nb_lignes
+
+    # ----- acces -----
+
+    def colonne(self, nom):
+        """Colonne brute (array ou tuple). Colonnes REAL: NaN pour NULL."""
+        return self._donnees[nom]
+
+    def valeur(self, i, nom):
+        return _lire_valeur(self._donnees[nom], i)
+
+    def ligne(self, i, colonnes=None):
+        return tuple(_lire_valeur(self._donnees[nom], i) for nom in (colonnes or self.colonnes))
+
+    def ligne_dict(self, i):
+        return {nom: _lire_valeur(self._donnees[nom], i) for nom in self.colonnes}
+
+    def lignes(self, colonnes=None, indices=None):
+        """Liste de tuples (comme cur.fetchall()) pour les indices donnes (defaut: toutes)."""
+        donnees = [self._donnees[nom] for nom in (colonnes or self.colonnes)]
+        if indices is None:
+            indices = range(self.nb_lignes)
+        return [tuple(_lire_valeur(d, i) for d in donnees) for i in indices]
+
+    # ----- recherche -----
+
+    def chercher(self, nom, valeur):
+        """Indice de la premiere ligne ou colonne == valeur (None si absente)."""
+        index = self._index.get(nom)
+        if index is None:
+            index = {}
+            for i, v in enumerate(self._donnees[nom]):
+                index.setdefault(v, i)
+            self._index[nom] = index
+        return index.get(valeur)
+
+    def filtrer(self, egal=None, maxi=None, non_nuls=(), condition=None, indices=None):
+        """
+        Indices des lignes qui respectent tous les criteres (ordre de la table):
+        - egal:      {colonne: valeur}   (colonne = valeur)
+        - maxi:      {colonne: borne}    (colonne <= borne, NULL exclu)
+        - non_nuls:  colonnes IS NOT NULL
+        - condition: {colonne: predicat(valeur)} (ex: comme("Forte%"))
+        """
+        if indices is None:
+            indices = range(self.nb_lignes)
+        resultat = list(indices)
+        for nom, attendu in (egal or {}).items():
+            d = self._donnees[nom]
+            resultat = [i for i in resultat if d[i] == attendu]
+        for nom, borne in (maxi or {}).items():
+            d = self._donnees[nom]
+            resultat = [i for i in resultat if d[i] <= borne]  # NaN <= x est faux
+        for nom in non_nuls:
+            d = self._donnees[nom]
+            resultat = [i for i in resultat if _lire_valeur(d, i) is not None]
+        for nom, predicat in (condition or {}).items():
+            d = self._donnees[nom]
+            resultat = [i for i in resultat if predicat(_lire_valeur(d, i))]
+        return resultat
+
+    def _cle_tri(self, nom):
+        d = self._donnees[nom]
+        # Ordre SQLite: NULL < nombres < texte < blob (NULL en premier en croissant, en dernier en decroissant)
+        def cle(i):
+            v = _lire_valeur(d, i)
+            if v is None:
+                return (0, 0)
+            if isinstance(v, (int, float)):
+                return (1, v)
+            return (2, v) if isinstance(v, str) else (3, v)
+        return cle
+
+    def trier(self, nom, indices=None, decroissant=False):
+        """Indices tries sur une colonne (tri stable)."""
+        if indices is None:
+            indices = range(self.nb_lignes)
+        return sorted(indices, key=self._cle_tri(nom), reverse=decroissant)
+
+    def top(self, nom, k, decroissant=True, indices=None):
+        """k premiers indices tries sur une colonne (ORDER BY ... LIMIT k ; k < 0 = sans limite)."""
+        if indices is None:
+            indices = range(self.nb_lignes)
+        if k < 0:
+            return self.trier(nom, indices, decroissant)
+        choisir = heapq.nlargest if decroissant else heapq.nsmallest
+        return choisir(k, indices, key=self._cle_tri(nom))
+
+    def facette(self, nom):
+        """Valeurs distinctes non NULL + nombre de lignes (ordre de premiere apparition)."""
+        facette = self._facettes.get(nom)
+        if facette is None:
+            comptes = {}
+            for i in range(self.nb_lignes):
+                v = _lire_valeur(self._donnees[nom], i)
+                if v is not None:
+                    comptes[v] = comptes.get(v, 0) + 1
+            facette = self._facettes[nom] = Facette(comptes)
+        return facette
+
+    def distinctes(self, nom, non_vides=False):
+        """Valeurs distinctes non NULL (ordre de premiere apparition) ; non_vides: sans '' / espaces."""
+        return self.facette(nom).valeurs(non_vides)
+
+
+# ============================================================
+# Chargement + partage (recharge si la base change)
+# ============================================================
+
+_instantanes = {}  # (chemin_abs, table) -> Instantane
+_verrou = threading.Lock()
+
+
+def _charger(chemin, table, version):
+    connexion = connecter(chemin, lecture_seule=True)
+    try:
+        cur = connexion.cursor()
+        cur.execute('SELECT * FROM "{}" ORDER BY rowid'.format(table.replace('"', '""')))
+        lignes = cur.fetchall()
+        noms = [d[0] for d in cur.description]
+    finally:
+        connexion.close()
+    return Instantane(noms, lignes, version)
+
+
+def catalogue(chemin=CHEMIN_OBJETS, table=TABLE_OBJETS):
+    """Instantane a jour de 'table' (recharge seulement si le fichier a change)."""
+    cle = (os.path.abspath(chemin), table)
+    version = version_fichier(cle[0])
+    instantane = _instantanes.get(cle)
+    if instantane is not None and instantane.version == version:
+        return instantane
+    with _verrou:
+        instantane = _instantanes.get(cle)
+        if instantane is None or instantane.version != version:
+            instantane = _charger(chemin, table, version)
+            _instantanes[cle] = instantane
+    return instantane
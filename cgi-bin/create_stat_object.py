@@ -2,10 +2,12 @@
 # -*- coding: utf-8 -*-
 
 import os
-import sqlite3
 import time
 import urllib.parse
 
+from acces_bdd import connecter, supprimer_bdd
+from migrations import migrer_univers
+
 print("Content-Type: text/html; charset=utf-8\n")
 
 MAX_UNIVERSES = 3
@@ -78,11 +80,11 @@ def create_universe(name):
             return (False, f"La base de données source n'existe pas : {DB_PATH}")
         
         # Créer la connexion à la nouvelle BDD
-        conn_new = sqlite3.connect(new_universe_path)
+        conn_new = connecter(new_universe_path)
         cur_new = conn_new.cursor()
         
         # Se connecter à la BDD source
-        conn_source = sqlite3.connect(DB_PATH)
+        conn_source = connecter(DB_PATH, lecture_seule=True)
         cur_source = conn_source.cursor()
         
         # Récupérer la structure de la table Prix_Objets
@@ -118,6 +120,10 @@ def create_universe(name):
         cur_new.execute("ALTER TABLE stat_objects ADD COLUMN liaison TEXT DEFAULT 'null'")
         
         conn_new.commit()
+
+        # Schema des univers a la derniere version (evenements, liaisons, id_stat...)
+        migrer_univers(conn_new)
+
         conn_source.close()
         conn_new.close()
         
@@ -131,14 +137,14 @@ def create_universe(name):
     except Exception as e:
         # Nettoyer en cas d'erreur
         if os.path.exists(new_universe_path):
-            os.remove(new_universe_path)
+            supprimer_bdd(new_universe_path)
         return (False, f"Impossible de créer l'univers : {e}")
 
 def delete_universe(universe_id):
     """Supprime un univers en effaçant son fichier SQLite et son nom"""
     path = universe_path(universe_id)
     if os.path.exists(path):
-        os.remove(path)
+        supprimer_bdd(path)
     
     # Supprimer le nom de l'univers dans le fichier de noms
     names_file = os.path.join(UNIVERSE_DIR, "univers_names.txt")
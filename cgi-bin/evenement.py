@@ -52,10 +52,13 @@ Note:
 """
 
 import os
-import sqlite3
 import urllib.parse
 import html
 
+from acces_bdd import connecter, infos_colonnes
+from facettes import facette
+from migrations import migrer_univers
+
 
 # ============================================================
 # En-tete CGI obligatoire
@@ -153,60 +156,9 @@ def recuperer_nom_univers(uid):
 # ============================================================
 # BDD: creation tables
 # ============================================================
-def colonne_existe(connexion, table, colonne):
-    """Verifie si une colonne existe (evite crash ALTER TABLE)."""
-    cur = connexion.cursor()
-    cur.execute(f"PRAGMA table_info({table})")
-    for row in cur.fetchall():
-        if row and len(row) >= 2 and (row[1] or "").lower() == colonne.lower():
-            return True
-    return False
-
-
 def creer_tables_evenements_si_besoin(connexion):
-    """Cree evenements + parametres_evenements si besoin."""
-    cur = connexion.cursor()
-
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS evenements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nom TEXT NOT NULL,
-            type_evenement TEXT NOT NULL DEFAULT 'E',
-            type_detail TEXT NOT NULL DEFAULT '',
-            afficher_simulation INTEGER NOT NULL DEFAULT 1,
-            description TEXT NOT NULL DEFAULT '',
-            date_creation TEXT DEFAULT (datetime('now'))
-        )
-    """)
-
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS parametres_evenements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            evenement_id INTEGER NOT NULL,
-            cle TEXT NOT NULL,
-            valeur TEXT NOT NULL DEFAULT '',
-            ordre INTEGER NOT NULL DEFAULT 0,
-            date_creation TEXT DEFAULT (datetime('now'))
-        )
-    """)
-
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_params_evt ON parametres_evenements(evenement_id, ordre)")
-    connexion.commit()
-
-    # Migration douce si ancienne version
-    if not colonne_existe(connexion, "evenements", "type_detail"):
-        try:
-            cur.execute("ALTER TABLE evenements ADD COLUMN type_detail TEXT NOT NULL DEFAULT ''")
-            connexion.commit()
-        except Exception:
-            pass
-
-    if not colonne_existe(connexion, "evenements", "afficher_simulation"):
-        try:
-            cur.execute("ALTER TABLE evenements ADD COLUMN afficher_simulation INTEGER NOT NULL DEFAULT 1")
-            connexion.commit()
-        except Exception:
-            pass
+    """Cree evenements + parametres_evenements si besoin (migrations versionnees, voir migrations.py)."""
+    migrer_univers(connexion)
 
 
 # ============================================================
@@ -214,9 +166,7 @@ def creer_tables_evenements_si_besoin(connexion):
 # ============================================================
 def detecter_colonnes_stat_objects(connexion):
     """Detecte id + Objet dans stat_objects (copie de Prix_Objets)."""
-    cur = connexion.cursor()
-    cur.execute("PRAGMA table_info(stat_objects)")
-    infos = cur.fetchall()
+    infos = infos_colonnes(connexion, "stat_objects")
 
     colonne_id = None
     colonne_nom = None
@@ -290,17 +240,8 @@ def lire_stat_objet(connexion, objet_id, champ):
 def distinct_texte(connexion, colonne):
     """Liste distincte d une colonne texte si elle existe (Famille / Type)."""
     try:
-        cur = connexion.cursor()
-        # On tente une requete simple; si colonne inexistante => exception
-        cur.execute(
-            f"""
-            SELECT DISTINCT [{colonne}]
-            FROM stat_objects
-            WHERE [{colonne}] IS NOT NULL AND TRIM([{colonne}]) != ''
-            ORDER BY [{colonne}] COLLATE NOCASE
-            """
-        )
-        return [r[0] for r in cur.fetchall()]
+        # Facette en cache; si colonne inexistante => exception
+        return facette(connexion, "stat_objects", colonne).triees()
     except Exception:
         return []
 
@@ -423,7 +364,7 @@ if not os.path.exists(chemin_bdd):
     print("<p>Chemin attendu : " + echapper_html(chemin_bdd) + "</p>")
     raise SystemExit
 
-connexion = sqlite3.connect(chemin_bdd)
+connexion = connecter(chemin_bdd)
 creer_tables_evenements_si_besoin(connexion)
 
 # stat_objects est necessaire pour: recherche objets + familles/types + constats objet
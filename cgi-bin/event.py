@@ -2,12 +2,14 @@
 # -*- coding: utf-8 -*-
 
 import os
-import sqlite3
 import urllib.parse
 import html
 import datetime
 import sys
 
+from acces_bdd import connecter, ecrire
+from migrations import migrer_events
+
 
 # -------------------------
 # Paths (robust in CGI)
@@ -36,75 +38,14 @@ def get_param(name, default=""):
     return params.get(name, [default])[0]
 
 
-def qident(name):
-    """Quote sqlite identifier safely"""
-    return '"' + (name or "").replace('"', '""') + '"'
-
-
 # -------------------------
 # DB init / migration
 # -------------------------
-def table_exists(cur, name):
-    """Check if table exists"""
-    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,))
-    return cur.fetchone() is not None
-
-
-def get_columns(cur, table):
-    """Get column names for a table"""
-    cur.execute("PRAGMA table_info(%s)" % qident(table))
-    return [r[1] for r in cur.fetchall()]
-
-
-def ensure_column(cur, table, col_name, col_def):
-    """Add column if it doesn't exist"""
-    cols = [c.lower() for c in get_columns(cur, table)]
-    if col_name.lower() not in cols:
-        cur.execute("ALTER TABLE %s ADD COLUMN %s %s" % (qident(table), qident(col_name), col_def))
-
-
 def init_db():
-    """Initialize database and ensure schema is up to date"""
+    """Bring the schema up to date (versioned migrations, nothing written if already current)"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-
-        # events table (base)
-        if not table_exists(cur, "events"):
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS events (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    type TEXT NOT NULL,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    event_date TEXT,
-                    event_time TEXT,
-                    location TEXT,
-                    created_at TEXT NOT NULL
-                )
-            """)
-
-        # migrate columns if older DB
-        ensure_column(cur, "events", "identity_mode", "TEXT")
-        ensure_column(cur, "events", "identity_pseudo", "TEXT")
-        ensure_column(cur, "events", "likes", "INTEGER DEFAULT 0")
-
-        # settings table (for Identifier pseudo)
-        if not table_exists(cur, "settings"):
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS settings (
-                    key TEXT PRIMARY KEY,
-                    value TEXT
-                )
-            """)
-
-        # indexes
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_title ON events(title)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_type ON events(type)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_date ON events(event_date)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_created ON events(created_at)")
-
-        conn.commit()
+        conn = connecter(DB_PATH)
+        migrer_events(conn)
         conn.close()
     except Exception as e:
         print("Content-Type: text/html; charset=utf-8\n\n")
@@ -164,7 +105,7 @@ def build_set_cookie(liked_ids_set):
 def get_setting(key, default=""):
     """Get setting value from database"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = connecter(DB_PATH)
         cur = conn.cursor()
         cur.execute("SELECT value FROM settings WHERE key = ?", (key,))
         row = cur.fetchone()
@@ -177,7 +118,7 @@ def get_setting(key, default=""):
 def set_setting(key, value):
     """Set setting value in database"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = connecter(DB_PATH)
         cur = conn.cursor()
         cur.execute("""
             INSERT INTO settings(key, value) VALUES(?, ?)
@@ -204,7 +145,7 @@ def insert_event(ev_type, title, description, event_date, event_time, location,
     identity_pseudo = (identity_pseudo or "").strip()
 
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = connecter(DB_PATH)
         cur = conn.cursor()
         cur.execute("""
             INSERT INTO events(type, title, description, event_date, event_time, location, created_at, identity_mode, identity_pseudo, likes)
@@ -229,7 +170,7 @@ def insert_event(ev_type, title, description, event_date, event_time, location,
 def delete_event(event_id):
     """Delete event from database"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = connecter(DB_PATH)
         cur = conn.cursor()
         cur.execute("DELETE FROM events WHERE id = ?", (event_id,))
         conn.commit()
@@ -239,15 +180,16 @@ def delete_event(event_id):
 
 
 def like_event(event_id):
-    """Increment like count for event"""
+    """Increment like count for event (retried if the db is busy). Returns True if saved."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute("UPDATE events SET likes = COALESCE(likes, 0) + 1 WHERE id = ?", (event_id,))
-        conn.commit()
+        conn = connecter(DB_PATH)
+        ecrire(conn, lambda c: c.execute(
+            "UPDATE events SET likes = COALESCE(likes, 0) + 1 WHERE id = ?", (event_id,)))
         conn.close()
+        return True
     except Exception as e:
         print("<!-- Error liking event: %s -->" % esc(str(e)))
+        return False
 
 
 def search_events(q, type_filter):
@@ -256,7 +198,7 @@ def search_events(q, type_filter):
     type_filter = (type_filter or "").strip()
 
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = connecter(DB_PATH)
         cur = conn.cursor()
 
         where = []
@@ -401,10 +343,12 @@ if method == "POST":
             if eid in liked_ids:
                 msg = "Already liked (this browser)."
             else:
-                like_event(eid)
-                liked_ids.add(eid)
-                set_cookie_header_value = build_set_cookie(liked_ids)
-                msg = "Liked."
+                if like_event(eid):
+                    liked_ids.add(eid)
+                    set_cookie_header_value = build_set_cookie(liked_ids)
+                    msg = "Liked."
+                else:
+                    msg = "Like not saved (database busy), please retry."
 
 rows = search_events(q, type_filter)
 
@@ -0,0 +1,97 @@
+# facettes.py
+# Cache des valeurs distinctes (Famille / Type / Speculation...) pour les listes deroulantes
+#
+# But:
+# - index.py, filtre_simple.py, calculs_classements.py, sim.py, evenement.py relisaient
+#   a chaque page SELECT DISTINCT ... ORDER BY ... COLLATE NOCASE (parcours complet de la table)
+# - Une facette = valeurs distinctes non NULL + nombre de lignes par valeur, calculee une fois
+#   par base / table / colonne
+# - Invalidee quand la base change (date + taille du fichier et du -wal) ou explicitement
+#   par les pages qui ecrivent dans la table (invalider)
+#
+# Utilisation:
+#   from facettes import facette
+#   familles = facette(connexion, "stat_objects", "Famille").triees()
+#
+# IMPORTANT:
+# - objets.db / Prix_Objets: les facettes viennent de l'instantane (catalogue.facette(colonne))
+# - triees() reproduit ORDER BY ... COLLATE NOCASE (seules les lettres ASCII sont repliees)
+
+import os
+import threading
+
+from acces_bdd import chemin_connexion, version_fichier
+
+
+def cle_nocase(valeur):
+    """Cle de tri equivalente a COLLATE NOCASE (seules les lettres ASCII sont repliees)."""
+    return "".join(chr(ord(c) + 32) if "A" <= c <= "Z" else c for c in str(valeur))
+
+
+class Facette:
+    """Valeurs distinctes non NULL d'une colonne et nombre de lignes par valeur."""
+
+    def __init__(self, comptes):
+        self.comptes = comptes  # {valeur: nb lignes}, ordre de premiere apparition
+        self._triees = {}
+
+    def __len__(self):
+        return len(self.comptes)
+
+    def nb(self, valeur):
+        return self.comptes.get(valeur, 0)
+
+    def valeurs(self, non_vides=False):
+        """Valeurs dans l'ordre de la table ; non_vides: sans '' / espaces (TRIM(...) != '')."""
+        if not non_vides:
+            return list(self.comptes)
+        return [v for v in self.comptes if str(v).strip() != ""]
+
+    def triees(self, non_vides=True):
+        """Valeurs triees sans tenir compte de la casse (ORDER BY ... COLLATE NOCASE)."""
+        triees = self._triees.get(non_vides)
+        if triees is None:
+            triees = self._triees[non_vides] = sorted(self.valeurs(non_vides), key=cle_nocase)
+        return list(triees)
+
+
+# ============================================================
+# Cache par base / table / colonne
+# ============================================================
+
+_facettes = {}     # (chemin, table, colonne) -> (version, Facette)
+_generations = {}  # (chemin, table) -> compteur, incremente par invalider()
+_verrou = threading.Lock()
+
+
+def _calculer(connexion, table, colonne):
+    cur = connexion.cursor()
+    # Un seul parcours: valeur + compte, dans l'ordre de premiere apparition
+    cur.execute(
+        "SELECT [{c}], COUNT(*) FROM [{t}] WHERE [{c}] IS NOT NULL GROUP BY [{c}] ORDER BY MIN(rowid)".format(
+            c=colonne, t=table
+        )
+    )
+    return Facette(dict(cur.fetchall()))
+
+
+def facette(connexion, table, colonne):
+    """Facette de table.colonne (recalculee seulement si la base a change depuis)."""
+    chemin = chemin_connexion(connexion)
+    if not chemin:
+        return _calculer(connexion, table, colonne)
+    version = (version_fichier(chemin), _generations.get((chemin, table), 0))
+    entree = _facettes.get((chemin, table, colonne))
+    if entree is not None and entree[0] == version:
+        return entree[1]
+    valeur = _calculer(connexion, table, colonne)
+    with _verrou:
+        _facettes[(chemin, table, colonne)] = (version, valeur)
+    return valeur
+
+
+def invalider(chemin, table):
+    """A appeler apres une ecriture dans 'table' (les facettes seront recalculees)."""
+    cle = (os.path.abspath(chemin), table)
+    with _verrou:
+        _generations[cle] = _generations.get(cle, 0) + 1
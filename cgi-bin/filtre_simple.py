@@ -1,11 +1,12 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
-import sqlite3
 import html
 import urllib.parse
 import os
 
+from catalogue import catalogue
+
 print("Content-Type: text/html; charset=utf-8\n")
 
 DB_PATH = "cgi-bin/objets.db"
@@ -19,13 +20,11 @@ def get_param(name, default=""):
 # ==================================================
 # OUTILS BDD
 # ==================================================
+# Prix_Objets est lue depuis l'instantane en memoire (catalogue.py), plus de SQL par page
+cat = catalogue(DB_PATH)
+
 def distinct(col):
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(f"SELECT DISTINCT {col} FROM Prix_Objets WHERE {col} IS NOT NULL")
-    vals = [r[0] for r in cur.fetchall()]
-    conn.close()
-    return vals
+    return cat.distinctes(col)
 
 familles = distinct("Famille")
 types = distinct("Type")
@@ -41,46 +40,33 @@ prix_max = get_param("prix_max")
 
 
 # ==================================================
-# CONSTRUCTION SQL
+# CONSTRUCTION DU FILTRE
 # ==================================================
-conditions = []
-params = []
+egal = {}
+maxi = {}
 
 if famille:
-    conditions.append("Famille = ?")
-    params.append(famille)
+    egal["Famille"] = famille
 
 if type_:
-    conditions.append("Type = ?")
-    params.append(type_)
+    egal["Type"] = type_
 
 if speculation:
-    conditions.append("Speculation = ?")
-    params.append(speculation)
+    egal["Speculation"] = speculation
 
 if prix_max:
     try:
-        conditions.append("Prix_Moyen_Actuel <= ?")
-        params.append(float(prix_max))
+        maxi["Prix_Moyen_Actuel"] = float(prix_max)
     except ValueError:
         pass
 
-sql = """
-SELECT Objet, Famille, Type, Speculation, Prix_Moyen_Actuel
-FROM Prix_Objets
-"""
-
-if conditions:
-    sql += " WHERE " + " AND ".join(conditions)
-
 # ==================================================
 # EXECUTION
 # ==================================================
-conn = sqlite3.connect(DB_PATH)
-cur = conn.cursor()
-cur.execute(sql, params)
-rows = cur.fetchall()
-conn.close()
+rows = cat.lignes(
+    ("Objet", "Famille", "Type", "Speculation", "Prix_Moyen_Actuel"),
+    cat.filtrer(egal=egal, maxi=maxi),
+)
 
 # ==================================================
 # HTML
@@ -0,0 +1,284 @@
+# graphe_liaisons.py
+# Graphe des liaisons d'un univers en memoire (adjacence compacte "CSR"), pour la propagation
+#
+# But:
+# - Avant: calculer_propagation_reseau / calculer_propagation_evenements (sim_calc) lancaient
+#   une requete SQL par noeud visite (voisins_objet / voisins_evenement), plus une seconde
+#   requete de secours sur liaisons_objets
+# - Maintenant: toutes les liaisons d'un type (O / E) sont lues en une requete, une fois,
+#   et rangees en tableaux: voisins de l'element k = cibles[debut[k]:debut[k + 1]]
+#   (poids alignes, deja multiplies par la probabilite et bornes a 0..1)
+# - Le graphe est garde en cache par base et par type, tant que les liaisons ne changent pas
+# - Il garde aussi les propagations deja calculees (sim_calc): un evenement qui revient chaque
+#   annee, ou dans chaque simulation, ne refait pas son BFS (memo jetee avec le graphe
+#   des que les liaisons changent)
+# - Cette memo est aussi enregistree a cote de la base ("<base>-propagations-O" / "-E"),
+#   avec la version du journal des liaisons: en mode cgi (un processus par page),
+#   la simulation suivante la relit au lieu de tout recalculer
+#
+# Utilisation:
+#   from graphe_liaisons import graphe
+#   g = graphe(connexion, "O")
+#   for voisin_id, poids in g.voisins(objet_id): ...
+#
+# IMPORTANT:
+# - Memes voisins, dans le meme ordre, que l'ancienne requete par noeud:
+#   liaisons triees par (cible_id, rowid) (ordre rendu par SQLite via idx_liaisons_cible),
+#   voisin garde a sa premiere position avec le poids le plus fort
+# - Type O: un objet sans voisin dans liaisons_applicables prend ceux de l'ancienne table
+#   liaisons_objets (si elle existe), poids 1.0 (table plus ecrite par l'application:
+#   ses changements ne sont pas suivis par la version du graphe)
+# - Version du graphe: journal des modifications (journal.py) si la base l'a, sinon date / taille du fichier
+#   (memo enregistree seulement avec le journal)
+# - Memo bornee en nombre total d'elements gardes (MAX_ELEMENTS_PROPAGATIONS, departs compris):
+#   un resultat de portee "tout" compte pour tout le catalogue; les plus anciens partent d'abord
+
+import os
+import marshal
+import threading
+from array import array
+
+from acces_bdd import chemin_connexion, version_fichier
+from journal import journal_present, version_journal
+
+
+# Elements gardes au total dans la memo des propagations d'un graphe (resultats + departs)
+MAX_ELEMENTS_PROPAGATIONS = 200000
+
+# Version du format des fichiers "<base>-propagations-<type>"
+# (2: version des liaisons qui ne recule plus a la purge du journal)
+FORMAT_MEMO = 2
+
+
+def _float_robuste(texte, defaut=0.0):
+    """Convertit en float, accepte virgule, sinon defaut (comme sim_calc)."""
+    try:
+        return float(str(texte).replace(",", "."))
+    except Exception:
+        return defaut
+
+
+class Graphe:
+    """
+    Adjacence compacte d'un type de liaisons.
+    - indice[element_id] -> k
+    - voisins de k: cibles[debut[k]:debut[k + 1]], poids[debut[k]:debut[k + 1]]
+    """
+
+    def __init__(self, version, listes):
+        self.version = version
+        self.indice = {}
+        self.debut = array("q", [0])
+        self.cibles = []
+        self.poids = array("d")
+        self.propagations = {}  # cle -> resultat (ordre d'insertion: les plus anciens d'abord)
+        self.nb_elements = 0
+        self.modifie = False  # memo changee depuis la lecture / l'enregistrement du fichier
+        self._verrou = threading.Lock()
+        for element_id, voisins in listes.items():
+            self.indice[element_id] = len(self.indice)
+            for voisin_id, poids in voisins.items():
+                self.cibles.append(voisin_id)
+                self.poids.append(poids)
+            self.debut.append(len(self.cibles))
+
+    def __len__(self):
+        return len(self.indice)
+
+    def nb_liens(self):
+        return len(self.cibles)
+
+    def voisins(self, element_id):
+        """[(voisin_id, poids)] dans l'ordre des liaisons ([] si l'element n'a pas de voisin)."""
+        k = self.indice.get(element_id)
+        if k is None:
+            return []
+        a, b = self.debut[k], self.debut[k + 1]
+        return list(zip(self.cibles[a:b], self.poids[a:b]))
+
+    def propagation(self, cle, calculer):
+        """
+        Resultat de calculer() memorise sous 'cle' (une fois par version du graphe).
+        Le resultat est partage entre appelants: a lire seulement.
+        """
+        resultat = self.propagations.get(cle)
+        if resultat is None:
+            resultat = calculer()
+            self.memoriser(cle, resultat)
+        return resultat
+
+    def memoriser(self, cle, resultat, modifie=True):
+        """Garde un resultat; retire les plus anciens pour rester sous MAX_ELEMENTS_PROPAGATIONS."""
+        taille = _taille(cle, resultat)
+        if taille > MAX_ELEMENTS_PROPAGATIONS:
+            return
+        with self._verrou:
+            if cle in self.propagations:
+                return
+            while self.propagations and self.nb_elements + taille > MAX_ELEMENTS_PROPAGATIONS:
+                ancienne = next(iter(self.propagations))
+                self.nb_elements -= _taille(ancienne, self.propagations.pop(ancienne))
+            self.propagations[cle] = resultat
+            self.nb_elements += taille
+            self.modifie = self.modifie or modifie
+
+
+def _taille(cle, resultat):
+    """Elements gardes pour une entree de la memo: resultat + ids de depart de la cle (au moins 1)."""
+    return 1 + len(resultat) + sum(len(partie) for partie in cle if isinstance(partie, tuple))
+
+
+def _lire_liaisons(connexion, type_applicable):
+    """{element_id: {voisin_id: poids}} depuis liaisons_applicables (meme logique que voisins_objet)."""
+    listes = {}
+    try:
+        lignes = connexion.execute(
+            """
+            SELECT source_id, cible_id, implication, poids, probabilite
+            FROM liaisons_applicables
+            WHERE type_applicable = ?
+            ORDER BY cible_id, rowid
+            """,
+            (type_applicable,)
+        ).fetchall()
+    except Exception:
+        return listes
+
+    def ajouter(element_id, voisin_id, poids):
+        voisins = listes.setdefault(element_id, {})
+        voisins[voisin_id] = max(poids, voisins.get(voisin_id, 0.0))
+
+    for sid, cid, impl, poids, probabilite in lignes:
+        poids_liaison = _float_robuste(poids, 1.0) * _float_robuste(probabilite, 1.0)
+        poids_liaison = max(0.0, min(1.0, poids_liaison))
+        ajouter(sid, cid, poids_liaison)
+        if impl == "<->" and cid != sid:
+            ajouter(cid, sid, poids_liaison)
+    return listes
+
+
+def _ajouter_secours_objets(connexion, listes):
+    """Ancienne table liaisons_objets: voisins des objets qui n'en ont pas dans liaisons_applicables."""
+    try:
+        lignes = connexion.execute(
+            "SELECT source_objet_id, cible_objet_id FROM liaisons_objets ORDER BY rowid").fetchall()
+    except Exception:
+        return
+    secours = {}
+    for source_id, cible_id in lignes:
+        if not listes.get(source_id):
+            # Liste (doublons gardes): l'ancienne requete rendait chaque ligne
+            secours.setdefault(source_id, []).append(cible_id)
+    for source_id, cibles in secours.items():
+        listes[source_id] = _ListeSecours(cibles)
+
+
+class _ListeSecours:
+    """Voisins de secours (doublons possibles, poids 1.0) avec la meme interface que dict.items()."""
+
+    def __init__(self, cibles):
+        self.cibles = cibles
+
+    def items(self):
+        return [(cible_id, 1.0) for cible_id in self.cibles]
+
+
+# ============================================================
+# Cache par base / type
+# ============================================================
+
+_graphes = {}  # (chemin, type_applicable) -> Graphe
+_verrou = threading.Lock()
+
+
+def version_graphe(connexion):
+    """Change des qu'une liaison est ajoutee / modifiee / supprimee (ou que la base est remplacee)."""
+    identite = getattr(connexion, "identite", None)
+    if journal_present(connexion):
+        return (identite, "journal", version_journal(connexion, ["liaisons_applicables"]))
+    chemin = chemin_connexion(connexion)
+    return (identite, "fichier", version_fichier(chemin) if chemin else None)
+
+
+def charger(connexion, type_applicable, version=None):
+    """Lit toutes les liaisons du type et construit le graphe (sans cache)."""
+    listes = _lire_liaisons(connexion, type_applicable)
+    if type_applicable == "O":
+        _ajouter_secours_objets(connexion, listes)
+    return Graphe(version, listes)
+
+
+def graphe(connexion, type_applicable):
+    """Graphe des liaisons 'O' ou 'E' de la base (relu seulement si les liaisons ont change)."""
+    chemin = chemin_connexion(connexion)
+    if not chemin or connexion.in_transaction:
+        # Base en memoire, ou ecritures non validees: pas de cache
+        return charger(connexion, type_applicable)
+    version = version_graphe(connexion)
+    g = _graphes.get((chemin, type_applicable))
+    if g is not None and g.version == version:
+        return g
+    g = charger(connexion, type_applicable, version)
+    _lire_memo(g, chemin_memo(chemin, type_applicable))
+    with _verrou:
+        _graphes[(chemin, type_applicable)] = g
+    return g
+
+
+# ============================================================
+# Memo des propagations enregistree par univers
+# ============================================================
+
+def chemin_memo(chemin, type_applicable):
+    """Fichier de la memo des propagations d'une base, pour un type de liaisons."""
+    return chemin + "-propagations-" + type_applicable
+
+
+def _version_enregistrable(g):
+    """Seules les versions du journal identifient les liaisons d'une base d'un processus a l'autre."""
+    return g.version is not None and g.version[1] == "journal"
+
+
+def _lire_memo(g, fichier):
+    """Reprend la memo enregistree si elle a ete calculee sur la meme version des liaisons."""
+    if not _version_enregistrable(g):
+        return
+    try:
+        with open(fichier, "rb") as f:
+            format_memo, version, propagations = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return
+    if format_memo != FORMAT_MEMO or version != g.version:
+        return
+    for cle, resultat in propagations.items():
+        g.memoriser(cle, resultat, modifie=False)
+
+
+def sauver_propagations(connexion):
+    """
+    Enregistre la memo des graphes de cette base qui a change (a appeler apres une simulation).
+    Ecriture dans un fichier temporaire puis remplacement: un lecteur voit l'ancienne ou la nouvelle.
+    """
+    chemin = chemin_connexion(connexion)
+    if not chemin:
+        return
+    for type_applicable in ("O", "E"):
+        g = _graphes.get((chemin, type_applicable))
+        if g is None or not g.modifie or not _version_enregistrable(g):
+            continue
+        with g._verrou:
+            propagations = dict(g.propagations)
+            g.modifie = False
+        fichier = chemin_memo(chemin, type_applicable)
+        temporaire = "{}.{}.{}".format(fichier, os.getpid(), threading.get_ident())
+        try:
+            with open(temporaire, "wb") as f:
+                marshal.dump((FORMAT_MEMO, g.version, propagations), f)
+            os.replace(temporaire, fichier)
+        except (OSError, ValueError):
+            # Dossier en lecture seule, id non enregistrable...: memo gardee en memoire seulement
+            g.modifie = True
+            try:
+                os.remove(temporaire)
+            except OSError:
+                pass
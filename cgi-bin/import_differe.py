@@ -0,0 +1,51 @@
+# import_differe.py
+# Import "paresseux" des modules lourds (urllib.request, difflib, json, ...)
+#
+# But:
+# - Un script CGI repart de zero a chaque page: chaque import coute au demarrage
+# - Beaucoup de pages n'utilisent ces modules que sur certains chemins
+#   (ex: recherche.py sans "q" n'appelle jamais urllib.request)
+# - differer("nom") renvoie le module tout de suite, mais son code n'est execute
+#   qu'au premier acces a un attribut (module.fonction)
+#
+# Utilisation:
+#   from import_differe import differer
+#   difflib = differer("difflib")
+#   ...
+#   difflib.get_close_matches(...)   # import reel ici, seulement si on passe par la
+#
+# IMPORTANT:
+# - Si le module est deja importe (serveur en mode interne / workers), il est renvoye tel quel
+# - Le premier acces doit se faire depuis un seul thread (cas d'un script CGI)
+
+import sys
+import importlib
+import importlib.util
+
+
+def differer(nom):
+    """Module 'nom' charge au premier acces (ou deja charge s'il est dans sys.modules)."""
+    module = sys.modules.get(nom)
+    if module is not None:
+        return module
+
+    parent, _, enfant = nom.rpartition(".")
+    if parent:
+        # Le paquet parent (ex: urllib pour urllib.request) est importe normalement
+        importlib.import_module(parent)
+
+    spec = importlib.util.find_spec(nom)
+    if spec is None or spec.loader is None:
+        # Module introuvable: meme erreur qu'un import classique
+        return importlib.import_module(nom)
+
+    chargeur = importlib.util.LazyLoader(spec.loader)
+    spec.loader = chargeur
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[nom] = module
+    chargeur.exec_module(module)
+
+    if parent:
+        # "import urllib.request" puis urllib.request.urlopen(...) doit fonctionner
+        setattr(sys.modules[parent], enfant, module)
+    return module
@@ -1,9 +1,10 @@
 #!/usr/bin/python3
 # -*- coding: utf-8 -*-
 
-import sqlite3
 import html
 
+from catalogue import catalogue
+
 print("Content-type: text/html; charset=utf-8\n")
 
 # Chemin de la base de données principale
@@ -16,16 +17,8 @@ def echapper_html(texte):
 def valeurs_distinctes(colonne):
     """Retourne les valeurs distinctes d'une colonne de la table Prix_Objets."""
     try:
-        connexion = sqlite3.connect(CHEMIN_BDD)
-        curseur = connexion.cursor()
-        curseur.execute(
-            f"SELECT DISTINCT {colonne} FROM Prix_Objets "
-            f"WHERE {colonne} IS NOT NULL AND TRIM({colonne}) != '' "
-            f"ORDER BY {colonne} COLLATE NOCASE"
-        )
-        valeurs = [ligne[0] for ligne in curseur.fetchall()]
-        connexion.close()
-        return valeurs
+        # Facette en cache (recalculee seulement si objets.db change)
+        return catalogue(CHEMIN_BDD).facette(colonne).triees()
     except Exception:
         return []
 
@@ -0,0 +1,169 @@
+# journal.py
+# Journal des modifications des univers (table journal_modifications, remplie par triggers)
+#
+# But:
+# - Savoir ce qui a change dans un univers depuis une version donnee, sans tout relire
+# - Les caches derives (facettes, classements, index de recherche, propagation...) gardent
+#   la version du journal a laquelle ils ont ete calcules, puis ne mettent a jour que
+#   les lignes modifiees depuis (ou recalculent tout si le journal ne suffit plus)
+#
+# Utilisation:
+#   from journal import version_journal, changements_depuis
+#   v = version_journal(conn)                          -> version actuelle (0: rien de journalise)
+#   v = version_journal(conn, ["liaisons_applicables"]) -> version de ces tables (ne recule pas a la purge)
+#   ch = changements_depuis(conn, v_cache, ["liaisons_applicables"])
+#   if not ch.complet: ... tout recalculer ...
+#   for ligne_id, operation in ch.lignes.get("liaisons_applicables", {}).items(): ...  # 'I', 'U' ou 'D'
+#   v_cache = ch.version
+#
+# Retention:
+# - migrations.migrer_univers() appelle entretenir() a chaque ouverture d'univers:
+#   une lecture; quand le journal depasse GARDER + MARGE_PURGE entrees, purge des plus anciennes
+#   (une ecriture toutes les MARGE_PURGE modifications, pas a chaque page)
+#
+# IMPORTANT:
+# - Tables suivies: migrations.TABLES_JOURNAL (triggers poses par la migration 4 des univers)
+# - ligne_id = rowid de la ligne (= id sauf pour stat_objects, dont id n'est pas le rowid)
+# - Les ids du journal sont croissants et sans trou (AUTOINCREMENT, une transaction annulee
+#   n'en consomme pas): un trou au debut = entrees purgees -> changements incomplets
+
+import sqlite3
+
+from acces_bdd import ecrire
+
+
+TABLE = "journal_modifications"
+
+# Entrees gardees par la purge, et depassement tolere avant de purger
+GARDER = 10000
+MARGE_PURGE = 2000
+
+
+def journal_present(connexion):
+    """La base a-t-elle sa table journal_modifications (migration 4) ?"""
+    ligne = connexion.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (TABLE,)).fetchone()
+    return ligne is not None
+
+
+def version_journal(connexion, tables=None):
+    """
+    Version actuelle: id de la derniere modification (de 'tables' si precise).
+    0 si rien n'a ete journalise (ou pas de journal: base pas encore migree).
+    Avec 'tables': jamais en dessous de la limite de purge (derniere entree supprimee),
+    pour ne pas revenir a une version deja rendue quand la purge efface leurs dernieres entrees.
+    """
+    try:
+        if tables is None:
+            ligne = connexion.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name=?", (TABLE,)).fetchone()
+            return int(ligne[0]) if ligne else 0
+        # Limite de purge: entrees purgees = ids avant le premier garde (tout, si le journal est vide)
+        ligne = connexion.execute(
+            "SELECT COALESCE((SELECT MIN(id) FROM journal_modifications) - 1,"
+            " (SELECT seq FROM sqlite_sequence WHERE name=?), 0)", (TABLE,)).fetchone()
+        version = int(ligne[0])
+        for table in tables:
+            ligne = connexion.execute(
+                "SELECT MAX(id) FROM journal_modifications WHERE table_nom=?", (table,)).fetchone()
+            version = max(version, ligne[0] or 0)
+        return version
+    except sqlite3.OperationalError:
+        return 0
+
+
+class Changements:
+    """
+    Resultat de changements_depuis():
+    - version: version atteinte (a garder pour le prochain appel)
+    - lignes: {table: {ligne_id: operation}} (operation nette: 'I', 'U' ou 'D')
+    - complet: False si des entrees ont ete purgees (ou pas de journal) -> tout recalculer
+    """
+
+    def __init__(self, version, lignes, complet):
+        self.version = version
+        self.lignes = lignes
+        self.complet = complet
+
+    def vide(self):
+        return self.complet and not self.lignes
+
+    def ids(self, table):
+        return set(self.lignes.get(table, ()))
+
+
+def _operation_nette(premiere, derniere):
+    """Insertion puis modifications -> 'I' ; insertion puis suppression -> None (rien a voir)."""
+    if premiere == "I":
+        return None if derniere == "D" else "I"
+    # La ligne existait avant 'version'
+    return "D" if derniere == "D" else "U"
+
+
+def changements_depuis(connexion, version, tables=None):
+    """Modifications apres 'version' (toutes les tables suivies, ou seulement 'tables')."""
+    if not journal_present(connexion):
+        return Changements(0, {}, False)
+
+    actuelle = version_journal(connexion)
+    if version >= actuelle:
+        return Changements(actuelle, {}, True)
+
+    # Premier id conserve: trou entre 'version' et lui = entrees purgees
+    premier = connexion.execute("SELECT MIN(id) FROM journal_modifications").fetchone()[0]
+    complet = premier is not None and premier <= version + 1
+
+    sql = "SELECT table_nom, operation, ligne_id FROM journal_modifications WHERE id > ? AND id <= ?"
+    params = [version, actuelle]
+    if tables is not None:
+        tables = list(tables)
+        if not tables:
+            return Changements(actuelle, {}, complet)
+        sql += " AND table_nom IN ({})".format(",".join("?" * len(tables)))
+        params += tables
+    sql += " ORDER BY id"
+
+    suivi = {}  # (table, ligne_id) -> [premiere operation, derniere operation]
+    for table_nom, operation, ligne_id in connexion.execute(sql, params):
+        ops = suivi.get((table_nom, ligne_id))
+        if ops is None:
+            suivi[(table_nom, ligne_id)] = [operation, operation]
+        else:
+            ops[1] = operation
+
+    lignes = {}
+    for (table_nom, ligne_id), (premiere, derniere) in suivi.items():
+        operation = _operation_nette(premiere, derniere)
+        if operation is not None:
+            lignes.setdefault(table_nom, {})[ligne_id] = operation
+    return Changements(actuelle, lignes, complet)
+
+
+def purger(connexion, garder=GARDER):
+    """Supprime les entrees anciennes (garde les 'garder' dernieres). Retour: nb supprimees."""
+    if not journal_present(connexion):
+        return 0
+    limite = version_journal(connexion) - garder
+
+    def supprimer(conn):
+        return conn.execute("DELETE FROM journal_modifications WHERE id <= ?", (limite,)).rowcount
+
+    return ecrire(connexion, supprimer) if limite > 0 else 0
+
+
+def entretenir(connexion, garder=GARDER, marge=MARGE_PURGE):
+    """
+    Retention: purge si le journal a plus de garder + marge entrees (sinon une seule lecture).
+    Jamais d'erreur: base occupee ou sans journal -> rien (prochaine ouverture).
+    Retour: nb d'entrees supprimees.
+    """
+    try:
+        # Ids sans trou: nb d'entrees = derniere - premiere + 1
+        ligne = connexion.execute(
+            "SELECT (SELECT seq FROM sqlite_sequence WHERE name=?) - (SELECT MIN(id) FROM journal_modifications)",
+            (TABLE,)).fetchone()
+        if ligne is None or ligne[0] is None or ligne[0] + 1 <= garder + marge:
+            return 0
+        return purger(connexion, garder)
+    except sqlite3.Error:
+        return 0
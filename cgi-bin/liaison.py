@@ -17,7 +17,7 @@ PAGE "LIAISON / RESEAUX" (univers)
 - Voir les reseaux sous forme "lisible" (texte) pour preparer la simulation.
 
 Contraintes:
-- CGI sans JavaScript (GET + reload)
+- CGI sans JavaScript (GET + reload; formulaire de creation des liaisons en POST)
 - Variables / fonctions en francais
 - Beaucoup de commentaires
 - Donnees exploitables plus tard dans simulation (tables propres, champs stables)
@@ -29,11 +29,14 @@ Note architecture importante:
 """
 
 import os
-import sqlite3
+import sys
 import urllib.parse
 import html
 import datetime
 
+from acces_bdd import connecter, ecrire, infos_colonnes
+from migrations import migrer_univers
+
 
 # ============================================================
 # En-tete CGI obligatoire (sinon page blanche)
@@ -50,13 +53,36 @@ DOSSIER_UNIVERS = "cgi-bin/universes/"  # Dossier contenant les BDD des univers
 # ============================================================
 # Utils: securite / params / format
 # ============================================================
+_parametres_post = None
+
+
+def lire_parametres_post():
+    """
+    Champs du formulaire envoye en POST (creation de liaisons: un lot peut depasser
+    la longueur max d une URL). Corps lu une seule fois. {} pour une requete GET.
+    """
+    global _parametres_post
+    if _parametres_post is None:
+        _parametres_post = {}
+        if os.environ.get("REQUEST_METHOD", "GET").upper() == "POST":
+            try:
+                taille = int(os.environ.get("CONTENT_LENGTH", "0") or "0")
+            except Exception:
+                taille = 0
+            corps = sys.stdin.read(taille) if taille > 0 else ""
+            _parametres_post = urllib.parse.parse_qs(corps, keep_blank_values=True)
+    return _parametres_post
+
+
 def lire_parametre_get(nom, defaut=""):
     """
-    Lire un parametre GET (?nom=...).
+    Lire un parametre GET (?nom=...), ou du formulaire POST si absent de l URL.
     - keep_blank_values=True: permet de recuperer les champs vides
     """
     query_string = os.environ.get("QUERY_STRING", "")
     params = urllib.parse.parse_qs(query_string, keep_blank_values=True)
+    if nom not in params:
+        params = lire_parametres_post()
     return params.get(nom, [defaut])[0]
 
 
@@ -82,6 +108,31 @@ def ids_depuis_chaine(chaine):
     return resultat
 
 
+def couples_depuis_texte(texte):
+    """
+    Lot de liaisons: une ligne = "source cible" (separateurs: espace, virgule, ;),
+    ou "source -> cible" / "source <-> cible" (implication propre a la ligne).
+    Retour: ([(source_id, cible_id, implication ou None), ...], nombre de lignes invalides).
+    implication None = celle du formulaire.
+    """
+    couples = []
+    invalides = 0
+    for ligne in (texte or "").splitlines():
+        implication_ligne = None
+        if "<->" in ligne:
+            implication_ligne = "<->"
+        elif "->" in ligne:
+            implication_ligne = "->"
+        morceaux = ligne.replace("<->", " ").replace("->", " ").replace(",", " ").replace(";", " ").split()
+        if not morceaux:
+            continue
+        if len(morceaux) == 2 and morceaux[0].isdigit() and morceaux[1].isdigit():
+            couples.append((int(morceaux[0]), int(morceaux[1]), implication_ligne))
+        else:
+            invalides += 1
+    return couples, invalides
+
+
 def chaine_depuis_ids(liste_ids):
     """Transformer [1,2,3] -> '1,2,3'."""
     return ",".join([str(x) for x in (liste_ids or [])])
@@ -133,9 +184,7 @@ def detecter_colonnes_stat_objects(connexion):
     - colonne_nom: idealement "Objet"
     Fallback: si les noms ne matchent pas, on prend les 2 premieres colonnes.
     """
-    cur = connexion.cursor()
-    cur.execute("PRAGMA table_info(stat_objects)")
-    infos = cur.fetchall()
+    infos = infos_colonnes(connexion, "stat_objects")
 
     colonne_id = None
     colonne_nom = None
@@ -181,81 +230,10 @@ def creer_tables_si_besoin(connexion):
     4) paternes:
        - objet "paterne" simple (type suite)
        - utile hors simulation (structure + liaison)
-    """
-    cur = connexion.cursor()
-
-    # Table evenements (minimaliste, stable pour futur)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS evenements (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nom TEXT NOT NULL,
-            type_evenement TEXT NOT NULL DEFAULT 'E',  -- E, Ec, Ep, Ea plus tard
-            definir_comme_E INTEGER NOT NULL DEFAULT 1, -- 1 = visible en simulation
-            description TEXT NOT NULL DEFAULT '',
-            date_creation TEXT DEFAULT (datetime('now'))
-        )
-    """)
-
-    # Table reseaux
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS reseaux_applicables (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            type_applicable TEXT NOT NULL,             -- 'O' ou 'E'
-            nom TEXT NOT NULL DEFAULT '',              -- optionnel (ex: "R1 - Economie")
-            date_creation TEXT DEFAULT (datetime('now'))
-        )
-    """)
-
-    # Table liaisons
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS liaisons_applicables (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
 
-            type_applicable TEXT NOT NULL,             -- 'O' ou 'E'
-            reseau_id INTEGER NOT NULL,                -- cle de regroupement
-
-            source_id INTEGER NOT NULL,
-            cible_id INTEGER NOT NULL,
-
-            implication TEXT NOT NULL DEFAULT '->',     -- '->' (implication) / '<->' (equivalence)
-
-            -- Precision optionnelle (si non maitrise, laisser valeurs par defaut)
-            type_lien TEXT NOT NULL DEFAULT 'associe',  -- associe / depend / compose / etc.
-            poids REAL NOT NULL DEFAULT 1.0,            -- coefficient de force (simulation plus tard)
-            probabilite REAL NOT NULL DEFAULT 1.0,      -- probabilite d'activation (evenements, etc.)
-            commentaire TEXT NOT NULL DEFAULT '',
-
-            date_creation TEXT DEFAULT (datetime('now'))
-        )
-    """)
-
-    # Index utiles (performance + futures simulations)
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_liaisons_type_reseau ON liaisons_applicables(type_applicable, reseau_id)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_liaisons_source ON liaisons_applicables(type_applicable, source_id)")
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_liaisons_cible ON liaisons_applicables(type_applicable, cible_id)")
-
-    # Table paternes (objet hors simulation)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS paternes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nom TEXT NOT NULL,
-            type_paterne TEXT NOT NULL DEFAULT 'suite',
-            formule TEXT NOT NULL DEFAULT '',
-            description TEXT NOT NULL DEFAULT '',
-            date_creation TEXT DEFAULT (datetime('now'))
-        )
-    """)
-
-    # Migration douce: colonne probabilite si ancienne version
-    cur.execute("PRAGMA table_info(liaisons_applicables)")
-    colonnes = [r[1] for r in cur.fetchall()]
-    if "probabilite" not in colonnes:
-        try:
-            cur.execute("ALTER TABLE liaisons_applicables ADD COLUMN probabilite REAL NOT NULL DEFAULT 1.0")
-        except Exception:
-            pass
-
-    connexion.commit()
+    Schema versionne (migrations.py): rien n'est ecrit si la base est deja a jour.
+    """
+    migrer_univers(connexion)
 
 
 # ============================================================
@@ -362,13 +340,20 @@ def nom_paterne_par_id(connexion, paterne_id):
 
 # ============================================================
 # BDD: reseaux (creation / detection / fusion)
+#
+# Unite de travail: toutes ces fonctions ecrivent via acces_bdd.ecrire()
+# - appelees seules: une transaction + un COMMIT chacune
+# - appelees dans ecrire(connexion, travail): elles rejoignent la transaction en cours,
+#   un seul COMMIT a la fin (ex: nouvelle liaison qui fusionne 3 reseaux = 1 COMMIT, pas 5)
 # ============================================================
+TAILLE_LOT_IN = 400  # ids par requete IN (...) (limite de variables SQLite)
+
+
 def creer_reseau(connexion, type_applicable):
     """Creer un reseau et renvoyer son id."""
-    cur = connexion.cursor()
-    cur.execute("INSERT INTO reseaux_applicables (type_applicable, nom) VALUES (?, ?)", (type_applicable, ""))
-    connexion.commit()
-    return cur.lastrowid
+    return ecrire(connexion, lambda conn: conn.execute(
+        "INSERT INTO reseaux_applicables (type_applicable, nom) VALUES (?, ?)", (type_applicable, "")
+    ).lastrowid)
 
 
 def reseaux_pour_element(connexion, type_applicable, element_id):
@@ -391,31 +376,54 @@ def reseaux_pour_element(connexion, type_applicable, element_id):
     return [r[0] for r in cur.fetchall()]
 
 
-def fusionner_reseaux(connexion, type_applicable, reseau_garde, reseau_supprime):
-    """
-    Fusion:
-    - on met toutes les liaisons de reseau_supprime dans reseau_garde
-    - on supprime la ligne reseau_supprime (propre)
-    """
+def reseaux_pour_elements(connexion, type_applicable, elements_ids):
+    """Comme reseaux_pour_element, pour plusieurs elements: {element_id: set(reseau_id)}."""
+    elements = sorted(set(elements_ids))
+    voulus = set(elements)
+    resultat = {}
     cur = connexion.cursor()
+    for debut in range(0, len(elements), TAILLE_LOT_IN):
+        morceau = elements[debut:debut + TAILLE_LOT_IN]
+        marques = ",".join(["?"] * len(morceau))
+        cur.execute(
+            f"""
+            SELECT source_id, cible_id, reseau_id
+            FROM liaisons_applicables
+            WHERE type_applicable = ?
+              AND (source_id IN ({marques}) OR cible_id IN ({marques}))
+            """,
+            [type_applicable] + morceau + morceau
+        )
+        for src, cib, reseau_id in cur.fetchall():
+            for element_id in (src, cib):
+                if element_id in voulus:
+                    resultat.setdefault(element_id, set()).add(reseau_id)
+    return resultat
 
-    # Mise a jour des liaisons
-    cur.execute(
+
+def _fusionner(conn, type_applicable, fusions):
+    """fusions: [(reseau_garde, reseau_supprime)] -> liaisons deplacees, reseaux supprimes."""
+    conn.executemany(
         """
         UPDATE liaisons_applicables
         SET reseau_id = ?
         WHERE type_applicable = ? AND reseau_id = ?
         """,
-        (reseau_garde, type_applicable, reseau_supprime)
+        [(garde, type_applicable, supprime) for garde, supprime in fusions]
     )
-
-    # Suppression du reseau "vide" (ou devenu inutile)
-    cur.execute(
+    conn.executemany(
         "DELETE FROM reseaux_applicables WHERE id = ? AND type_applicable = ?",
-        (reseau_supprime, type_applicable)
+        [(supprime, type_applicable) for _garde, supprime in fusions]
     )
 
-    connexion.commit()
+
+def fusionner_reseaux(connexion, type_applicable, reseau_garde, reseau_supprime):
+    """
+    Fusion:
+    - on met toutes les liaisons de reseau_supprime dans reseau_garde
+    - on supprime la ligne reseau_supprime (propre)
+    """
+    ecrire(connexion, lambda conn: _fusionner(conn, type_applicable, [(reseau_garde, reseau_supprime)]))
 
 
 def choisir_reseau_pour_nouvelle_liaison(connexion, type_applicable, source_id, cible_id):
@@ -427,29 +435,32 @@ def choisir_reseau_pour_nouvelle_liaison(connexion, type_applicable, source_id,
     - Un seul est dans un reseau -> reutiliser ce reseau
     - Les deux sont dans des reseaux differents -> fusionner
     """
-    reseaux_source = reseaux_pour_element(connexion, type_applicable, source_id)
-    reseaux_cible = reseaux_pour_element(connexion, type_applicable, cible_id)
+    def choisir(conn):
+        reseaux_source = reseaux_pour_element(conn, type_applicable, source_id)
+        reseaux_cible = reseaux_pour_element(conn, type_applicable, cible_id)
 
-    # On prend des ensembles pour simplifier
-    set_source = set(reseaux_source)
-    set_cible = set(reseaux_cible)
-    union = set_source.union(set_cible)
+        # On prend des ensembles pour simplifier
+        set_source = set(reseaux_source)
+        set_cible = set(reseaux_cible)
+        union = set_source.union(set_cible)
 
-    if not union:
-        # Aucun reseau existant -> nouveau
-        return creer_reseau(connexion, type_applicable)
+        if not union:
+            # Aucun reseau existant -> nouveau
+            return creer_reseau(conn, type_applicable)
 
-    if len(union) == 1:
-        # Meme reseau (ou un seul cote)
-        return list(union)[0]
+        if len(union) == 1:
+            # Meme reseau (ou un seul cote)
+            return list(union)[0]
 
-    # Plusieurs reseaux -> fusion en gardant le plus petit id (choix stable)
-    reseau_garde = min(union)
-    for r in sorted(union):
-        if r != reseau_garde:
-            fusionner_reseaux(connexion, type_applicable, reseau_garde, r)
+        # Plusieurs reseaux -> fusion en gardant le plus petit id (choix stable)
+        reseau_garde = min(union)
+        for r in sorted(union):
+            if r != reseau_garde:
+                fusionner_reseaux(conn, type_applicable, reseau_garde, r)
 
-    return reseau_garde
+        return reseau_garde
+
+    return ecrire(connexion, choisir)
 
 
 # ============================================================
@@ -457,9 +468,11 @@ def choisir_reseau_pour_nouvelle_liaison(connexion, type_applicable, source_id,
 # ============================================================
 def inserer_liaison(connexion, type_applicable, reseau_id, source_id, cible_id,
                     implication, type_lien, poids, probabilite, commentaire):
-    """Insertion d'une liaison (simple) dans le reseau cible."""
-    cur = connexion.cursor()
-    cur.execute(
+    """
+    Insertion d'une liaison (simple) dans le reseau cible.
+    Ecriture via acces_bdd.ecrire(): nouveaux essais si une autre page ecrit en meme temps.
+    """
+    ecrire(connexion, lambda conn: conn.execute(
         """
         INSERT INTO liaisons_applicables (
             type_applicable, reseau_id,
@@ -469,8 +482,69 @@ def inserer_liaison(connexion, type_applicable, reseau_id, source_id, cible_id,
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
         (type_applicable, reseau_id, source_id, cible_id, implication, type_lien, poids, probabilite, commentaire)
-    )
-    connexion.commit()
+    ))
+
+
+def inserer_liaisons(connexion, type_applicable, couples,
+                     implication, type_lien, poids, probabilite, commentaire):
+    """
+    Ajout de plusieurs liaisons [(source_id, cible_id), ...] en une seule transaction (1 COMMIT).
+    Un couple peut porter sa propre implication: (source_id, cible_id, "<->") (None = 'implication').
+    Memes reseaux que choisir_reseau_pour_nouvelle_liaison + inserer_liaison liaison par liaison,
+    mais calcules en memoire:
+    - reseaux des elements concernes lus en une fois (reseaux_pour_elements)
+    - fusions notees dans une union-find (le plus petit id garde), appliquees a la fin
+    - liaisons inserees avec un seul executemany
+    Les liaisons vers soi-meme sont ignorees. Retour: nombre de liaisons creees.
+    """
+    couples = [(c[0], c[1], (c[2] if len(c) > 2 and c[2] else implication)) for c in couples if c[0] != c[1]]
+    if not couples:
+        return 0
+
+    def ajouter(conn):
+        reseaux_element = reseaux_pour_elements(conn, type_applicable, [e for couple in couples for e in couple[:2]])
+        parent = {}  # reseau fusionne -> reseau garde
+
+        def racine(reseau_id):
+            while reseau_id in parent:
+                reseau_id = parent[reseau_id]
+            return reseau_id
+
+        fusions = []
+        reseaux_couples = []
+        for source_id, cible_id, _implication in couples:
+            union = {racine(r) for r in reseaux_element.get(source_id, ())}
+            union.update(racine(r) for r in reseaux_element.get(cible_id, ()))
+            if not union:
+                reseau_id = creer_reseau(conn, type_applicable)
+            else:
+                reseau_id = min(union)
+                for r in sorted(union):
+                    if r != reseau_id:
+                        parent[r] = reseau_id
+                        fusions.append(r)
+            reseaux_element[source_id] = {reseau_id}
+            reseaux_element[cible_id] = {reseau_id}
+            reseaux_couples.append(reseau_id)
+
+        if fusions:
+            _fusionner(conn, type_applicable, [(racine(r), r) for r in fusions])
+        conn.executemany(
+            """
+            INSERT INTO liaisons_applicables (
+                type_applicable, reseau_id,
+                source_id, cible_id,
+                implication, type_lien, poids, probabilite, commentaire
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [(type_applicable, racine(reseau_id), source_id, cible_id,
+              implication_couple, type_lien, poids, probabilite, commentaire)
+             for (source_id, cible_id, implication_couple), reseau_id in zip(couples, reseaux_couples)]
+        )
+        return len(couples)
+
+    return ecrire(connexion, ajouter)
 
 
 def supprimer_liaison(connexion, type_applicable, liaison_id):
@@ -482,12 +556,10 @@ def supprimer_liaison(connexion, type_applicable, liaison_id):
     - Le menu "Voir reseaux" reste fiable, mais un reseau pourrait devenir "disperse"
       si on supprime beaucoup. (Cas rare / acceptable, ou on fera un "rebuild" plus tard.)
     """
-    cur = connexion.cursor()
-    cur.execute(
+    ecrire(connexion, lambda conn: conn.execute(
         "DELETE FROM liaisons_applicables WHERE type_applicable = ? AND id = ?",
         (type_applicable, liaison_id)
-    )
-    connexion.commit()
+    ))
 
 
 def lister_liaisons(connexion, type_applicable, limite=250):
@@ -770,7 +842,7 @@ if not os.path.exists(chemin_bdd):
     print("<p>Chemin attendu : " + echapper_html(chemin_bdd) + "</p>")
     raise SystemExit
 
-connexion = sqlite3.connect(chemin_bdd)
+connexion = connecter(chemin_bdd)
 creer_tables_si_besoin(connexion)
 
 # Table objets requise si on veut lier des objets
@@ -811,6 +883,7 @@ type_lien = (lire_parametre_get("type_lien", "associe") or "associe").strip()
 poids_str = (lire_parametre_get("poids", "1.0") or "1.0").strip()
 probabilite_str = (lire_parametre_get("probabilite", "1.0") or "1.0").strip()
 commentaire = (lire_parametre_get("commentaire", "") or "").strip()
+liaisons_lot = lire_parametre_get("liaisons_lot", "") or ""  # Lot: une liaison "source cible" par ligne
 
 # Paternes (creation simple)
 paterne_nom = (lire_parametre_get("paterne_nom", "") or "").strip()
@@ -916,28 +989,45 @@ if action == "creer_liaison":
         message_erreur = "Aucune cible selectionnee."
     else:
         try:
-            nb = 0
-            for cid in cibles_ids:
-                if cid == source_id:
-                    continue  # eviter lien vers soi
-                reseau_id = choisir_reseau_pour_nouvelle_liaison(connexion, type_applicable, source_id, cid)
-                inserer_liaison(
-                    connexion,
-                    type_applicable=type_applicable,
-                    reseau_id=reseau_id,
-                    source_id=source_id,
-                    cible_id=cid,
-                    implication=implication,
-                    type_lien=(type_lien or "associe"),
-                    poids=poids,
-                    probabilite=probabilite,
-                    commentaire=commentaire
-                )
-                nb += 1
+            # Une seule transaction pour toutes les cibles (liens vers soi ignores)
+            nb = inserer_liaisons(
+                connexion,
+                type_applicable=type_applicable,
+                couples=[(source_id, cid) for cid in cibles_ids],
+                implication=implication,
+                type_lien=(type_lien or "associe"),
+                poids=poids,
+                probabilite=probabilite,
+                commentaire=commentaire
+            )
             message_ok = "Liaison(s) creee(s): " + str(nb)
         except Exception as e:
             message_erreur = "Erreur creation liaison: " + str(e)
 
+# Action: creer plusieurs liaisons (lot "source cible" par ligne)
+if action == "creer_liaisons_lot":
+    couples_lot, lignes_invalides = couples_depuis_texte(liaisons_lot)
+    if not couples_lot:
+        message_erreur = "Aucune liaison valide dans le lot (une ligne = \"source cible\")."
+    else:
+        try:
+            nb = inserer_liaisons(
+                connexion,
+                type_applicable=type_applicable,
+                couples=couples_lot,
+                implication=implication,
+                type_lien=(type_lien or "associe"),
+                poids=poids,
+                probabilite=probabilite,
+                commentaire=commentaire
+            )
+            message_ok = "Liaison(s) creee(s): " + str(nb)
+            if lignes_invalides:
+                message_ok += " (lignes ignorees: " + str(lignes_invalides) + ")"
+            liaisons_lot = ""
+        except Exception as e:
+            message_erreur = "Erreur creation liaisons: " + str(e)
+
 # Action: supprimer liaison
 if action == "supprimer_liaison":
     lid = (lire_parametre_get("liaison_id", "") or "").strip()
@@ -1582,11 +1672,13 @@ if vue == "liaison":
           <strong>Precision</strong> (optionnel) = details (poids, type de lien, commentaire).
         </div>
 
-        <!-- Form creation (GET) -->
-        <form method="get" action="/cgi-bin/liaison.py">
+        <!-- Form creation (POST: un lot de liaisons ne tient pas dans une URL, et un rechargement
+             de la page ne doit pas recreer les liaisons sans confirmation) -->
+        <form method="post" action="/cgi-bin/liaison.py">
           <input type="hidden" name="uid" value="{echapper_html(uid)}">
           <input type="hidden" name="type_applicable" value="{echapper_html(type_applicable)}">
           <input type="hidden" name="vue" value="liaison">
+          <input type="hidden" name="implication" value="{echapper_html(implication)}">
 
           <!-- Conserver selections -->
           <input type="hidden" name="source_id" value="{echapper_html('' if source_id is None else str(source_id))}">
@@ -1636,6 +1728,16 @@ if vue == "liaison":
             Astuce: si tu ne maitrises pas la precision, n ouvre pas le bloc.
             Par defaut: <strong>associe</strong>, poids <strong>1.0</strong>.
           </div>
+
+          <!-- Lot de liaisons (optionnel): memes implication / precision pour toutes -->
+          <details {"open" if liaisons_lot else ""}>
+            <summary>Plusieurs liaisons (lot)</summary>
+            <label class="label">Une liaison par ligne: "source cible" (ids), ou "source &lt;-&gt; cible" pour une equivalence</label>
+            <textarea class="champ-texte" name="liaisons_lot" rows="6" placeholder="12 45&#10;12 46&#10;45 -> 80">{echapper_html(liaisons_lot)}</textarea>
+            <div class="ligne-actions">
+              <button class="bouton" type="submit" name="action" value="creer_liaisons_lot">Creer les liaisons du lot</button>
+            </div>
+          </details>
         </form>
 
         <div class="message" style="margin-top:10px;">
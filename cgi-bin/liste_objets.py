@@ -2,10 +2,12 @@
 # -*- coding: utf-8 -*-
 
 import os
-import sqlite3
 import urllib.parse
 import html
 
+from acces_bdd import connecter
+from facettes import invalider
+
 print("Content-Type: text/html; charset=utf-8\n")
 
 REPERTOIRE_UNIVERS = "cgi-bin/universes/"
@@ -40,7 +42,7 @@ def recuperer_nom_univers(identifiant_univers):
 
 def recuperer_infos_table(chemin_bdd, nom_table):
     """Récupère les informations de colonnes d'une table."""
-    connexion = sqlite3.connect(chemin_bdd)
+    connexion = connecter(chemin_bdd, lecture_seule=True)
     curseur = connexion.cursor()
     curseur.execute(f"PRAGMA table_info({nom_table})")
     infos = curseur.fetchall()
@@ -112,7 +114,7 @@ def recuperer_objets_crees(identifiant_univers):
         colonne_nom = trouver_colonne_nom(colonnes)
 
         # On recupere rowid pour supprimer proprement
-        connexion = sqlite3.connect(chemin_bdd)
+        connexion = connecter(chemin_bdd, lecture_seule=True)
         curseur = connexion.cursor()
 
         if colonne_type:
@@ -191,7 +193,7 @@ def supprimer_objet(identifiant_univers, valeur_rowid):
 
         colonne_nom = trouver_colonne_nom(colonnes)
 
-        connexion = sqlite3.connect(chemin_bdd)
+        connexion = connecter(chemin_bdd)
         curseur = connexion.cursor()
 
         # Recuperer le nom AVANT suppression (pour nettoyer liaison)
@@ -230,6 +232,7 @@ def supprimer_objet(identifiant_univers, valeur_rowid):
         # Suppression par rowid (fiable)
         curseur.execute("DELETE FROM stat_objects WHERE rowid = ?", (identifiant,))
         connexion.commit()
+        invalider(chemin_bdd, "stat_objects")
         connexion.close()
         return True
 
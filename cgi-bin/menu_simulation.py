@@ -12,10 +12,11 @@ Notes:
 """
 
 import os              # Variables d'environnement, chemins
-import sqlite3         # Lecture BDD SQLite
 import urllib.parse    # Gestion des parametres URL
 import html            # Echappement HTML (anti-injection)
 
+from acces_bdd import connecter  # Connexions SQLite communes (reglages, reutilisation)
+
 
 # ============================================================
 # En-tete HTTP CGI obligatoire
@@ -89,7 +90,7 @@ def verifier_univers(uid):
         return False, "Fichier univers introuvable."
 
     try:
-        conn = sqlite3.connect(chemin_bdd)
+        conn = connecter(chemin_bdd, lecture_seule=True)
         cur = conn.cursor()
 
         cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='stat_objects'")
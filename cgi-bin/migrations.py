@@ -0,0 +1,309 @@
+# migrations.py
+# Schema des bases (events.db, universes/*.db) par versions numerotees (PRAGMA user_version)
+#
+# But:
+# - Avant: chaque page relancait ses CREATE TABLE IF NOT EXISTS / ALTER TABLE a chaque requete
+#   (ecriture + verrou sur la base meme pour un simple GET)
+# - Maintenant: une page lit seulement PRAGMA user_version; si la base est a jour, aucune ecriture
+# - Les migrations en attente sont appliquees une seule fois, dans une transaction (BEGIN IMMEDIATE)
+#
+# Ajouter une migration:
+# - ajouter (numero suivant, description, fonction(curseur)) a la fin de la liste concernee
+# - ne jamais modifier une migration deja livree (les bases existantes ne la rejoueront pas)
+#
+# IMPORTANT:
+# - Les bases existantes sont en version 0 mais ont deja (une partie de) leurs tables:
+#   les migrations sont donc idempotentes (IF NOT EXISTS, colonne ajoutee seulement si absente)
+
+import sqlite3
+
+import journal
+
+
+# ============================================================
+# Outils
+# ============================================================
+
+def table_existe(cur, table):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,))
+    return cur.fetchone() is not None
+
+
+def ajouter_colonne(cur, table, colonne, definition):
+    """ALTER TABLE ... ADD COLUMN si la colonne n'existe pas encore."""
+    cur.execute('PRAGMA table_info("{}")'.format(table))
+    if colonne.lower() not in [(r[1] or "").lower() for r in cur.fetchall()]:
+        cur.execute('ALTER TABLE "{}" ADD COLUMN "{}" {}'.format(table, colonne, definition))
+
+
+def version(connexion):
+    return connexion.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrer(connexion, migrations):
+    """
+    Amene la base a la derniere version de 'migrations'.
+    Base a jour: une seule lecture (PRAGMA user_version), rien n'est ecrit.
+    Retour: version de la base.
+    """
+    derniere = migrations[-1][0]
+    if version(connexion) >= derniere:
+        return derniere
+
+    if connexion.in_transaction:
+        connexion.commit()
+    # Verrou d'ecriture des le debut: deux pages qui migrent en meme temps ne se melangent pas
+    connexion.execute("BEGIN IMMEDIATE")
+    try:
+        actuelle = version(connexion)  # une autre page a peut-etre migre entre temps
+        cur = connexion.cursor()
+        for numero, _description, appliquer in migrations:
+            if numero > actuelle:
+                appliquer(cur)
+                actuelle = numero
+        connexion.execute("PRAGMA user_version = %d" % actuelle)
+        connexion.commit()
+    except sqlite3.Error:
+        connexion.rollback()
+        raise
+    return actuelle
+
+
+# ============================================================
+# Index des tables d'objets (Prix_Objets de objets.db, stat_objects des univers)
+# ============================================================
+
+# (suffixe du nom, colonnes): filtres / tris des pages et de sim_calc
+# (WHERE Famille = ?, WHERE id IN (...), ORDER BY Prix_Moyen_Actuel ...).
+# - Egalites: index sur une seule colonne -> lignes egales rendues dans l'ordre rowid (comme sans index)
+# - Tris: les colonnes apres la premiere rendent l'index couvrant (pas de lecture de la table)
+# IMPORTANT: un SELECT sans ORDER BY peut alors parcourir un index couvrant (ordre different):
+#   ajouter ORDER BY rowid quand l'ordre de la table compte
+INDEX_OBJETS = [
+    ("id", ("id",)),
+    ("famille", ("Famille",)),
+    ("type", ("Type",)),
+    ("speculation", ("Speculation",)),
+    ("prix", ("Prix_Moyen_Actuel", "Famille", "Type", "Objet")),
+    ("coef", ("Coef_Total_2000_2025", "Famille", "Type", "Objet")),
+    ("ca", ("CA_2025_2035_MDEUR", "Famille", "Type", "Objet")),
+]
+
+
+def index_objets(cur, table):
+    """
+    CREATE INDEX utiles pour 'table' (liste de (nom, sql)).
+    Ignores: colonnes absentes, colonne = rowid (INTEGER PRIMARY KEY),
+    index deja couvert par un index existant (meme debut de colonnes).
+    """
+    cur.execute('PRAGMA table_info("{}")'.format(table))
+    infos = cur.fetchall()
+    colonnes = {r[1].lower(): r[1] for r in infos}
+    cles_primaires = [r for r in infos if r[5]]
+    rowid = None
+    if len(cles_primaires) == 1 and (cles_primaires[0][2] or "").upper() == "INTEGER":
+        rowid = cles_primaires[0][1].lower()
+
+    existants = []
+    cur.execute('PRAGMA index_list("{}")'.format(table))
+    for index in cur.fetchall():
+        cur.execute('PRAGMA index_info("{}")'.format(index[1]))
+        existants.append(tuple(r[2].lower() for r in cur.fetchall() if r[2]))
+
+    resultat = []
+    for suffixe, noms in INDEX_OBJETS:
+        if any(n.lower() not in colonnes for n in noms) or noms[0].lower() == rowid:
+            continue
+        cles = tuple(n.lower() for n in noms)
+        if any(e[:len(cles)] == cles for e in existants):
+            continue
+        nom = "idx_{}_{}".format(table.lower(), suffixe)
+        resultat.append((nom, 'CREATE INDEX IF NOT EXISTS "{}" ON "{}" ({})'.format(
+            nom, table, ", ".join('"{}"'.format(colonnes[n.lower()]) for n in noms))))
+    return resultat
+
+
+# ============================================================
+# events.db (event.py)
+# ============================================================
+
+def _events_1(cur):
+    """events + settings + index."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT,
+            event_date TEXT,
+            event_time TEXT,
+            location TEXT,
+            created_at TEXT NOT NULL
+        )
+    """)
+    # Colonnes ajoutees apres coup (anciennes bases)
+    ajouter_colonne(cur, "events", "identity_mode", "TEXT")
+    ajouter_colonne(cur, "events", "identity_pseudo", "TEXT")
+    ajouter_colonne(cur, "events", "likes", "INTEGER DEFAULT 0")
+
+    # settings (pseudo de l'Identifier)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_title ON events(title)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_type ON events(type)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_date ON events(event_date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_events_created ON events(created_at)")
+
+
+MIGRATIONS_EVENTS = [
+    (1, "events, settings et index", _events_1),
+]
+
+
+# ============================================================
+# universes/*.db (evenement.py, liaison.py, personnalisation_objet.py)
+# ============================================================
+
+def _univers_1(cur):
+    """evenements + parametres, reseaux / liaisons, paternes."""
+    # evenements: union des deux anciennes versions (evenement.py et liaison.py)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS evenements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nom TEXT NOT NULL,
+            type_evenement TEXT NOT NULL DEFAULT 'E',
+            type_detail TEXT NOT NULL DEFAULT '',
+            afficher_simulation INTEGER NOT NULL DEFAULT 1,
+            definir_comme_E INTEGER NOT NULL DEFAULT 1,
+            description TEXT NOT NULL DEFAULT '',
+            date_creation TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    ajouter_colonne(cur, "evenements", "type_detail", "TEXT NOT NULL DEFAULT ''")
+    ajouter_colonne(cur, "evenements", "afficher_simulation", "INTEGER NOT NULL DEFAULT 1")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS parametres_evenements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            evenement_id INTEGER NOT NULL,
+            cle TEXT NOT NULL,
+            valeur TEXT NOT NULL DEFAULT '',
+            ordre INTEGER NOT NULL DEFAULT 0,
+            date_creation TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_params_evt ON parametres_evenements(evenement_id, ordre)")
+
+    # Reseaux (type 'O' objets / 'E' evenements) et leurs liaisons
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS reseaux_applicables (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type_applicable TEXT NOT NULL,
+            nom TEXT NOT NULL DEFAULT '',
+            date_creation TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS liaisons_applicables (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type_applicable TEXT NOT NULL,
+            reseau_id INTEGER NOT NULL,
+            source_id INTEGER NOT NULL,
+            cible_id INTEGER NOT NULL,
+            implication TEXT NOT NULL DEFAULT '->',
+            type_lien TEXT NOT NULL DEFAULT 'associe',
+            poids REAL NOT NULL DEFAULT 1.0,
+            probabilite REAL NOT NULL DEFAULT 1.0,
+            commentaire TEXT NOT NULL DEFAULT '',
+            date_creation TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    ajouter_colonne(cur, "liaisons_applicables", "probabilite", "REAL NOT NULL DEFAULT 1.0")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_liaisons_type_reseau ON liaisons_applicables(type_applicable, reseau_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_liaisons_source ON liaisons_applicables(type_applicable, source_id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_liaisons_cible ON liaisons_applicables(type_applicable, cible_id)")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS paternes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nom TEXT NOT NULL,
+            type_paterne TEXT NOT NULL DEFAULT 'suite',
+            formule TEXT NOT NULL DEFAULT '',
+            description TEXT NOT NULL DEFAULT '',
+            date_creation TEXT DEFAULT (datetime('now'))
+        )
+    """)
+
+
+def _univers_2(cur):
+    """stat_objects: colonnes liaison et id_stat (rempli pour les anciennes lignes)."""
+    if not table_existe(cur, "stat_objects"):
+        return
+    ajouter_colonne(cur, "stat_objects", "liaison", "TEXT DEFAULT 'null'")
+    ajouter_colonne(cur, "stat_objects", "id_stat", "INTEGER")
+    cur.execute("UPDATE stat_objects SET id_stat = rowid WHERE id_stat IS NULL")
+
+
+def _univers_3(cur):
+    """Index de stat_objects (la copie de Prix_Objets n'en a aucun, pas meme sur id)."""
+    if not table_existe(cur, "stat_objects"):
+        return
+    for _nom, sql in index_objets(cur, "stat_objects"):
+        cur.execute(sql)
+
+
+# Tables suivies par le journal des modifications (journal.py)
+TABLES_JOURNAL = ("stat_objects", "liaisons_applicables", "evenements", "parametres_evenements")
+
+
+def triggers_journal(cur, table):
+    """Triggers INSERT / UPDATE / DELETE de 'table' -> une ligne de journal_modifications chacun."""
+    for operation, quand, ligne in (("I", "INSERT", "NEW.rowid"),
+                                    ("U", "UPDATE", "NEW.rowid"),
+                                    ("D", "DELETE", "OLD.rowid")):
+        cur.execute(
+            'CREATE TRIGGER IF NOT EXISTS "journal_{t}_{o}" AFTER {q} ON "{t}" BEGIN '
+            "INSERT INTO journal_modifications (table_nom, operation, ligne_id) "
+            "VALUES ('{t}', '{o}', {l}); END".format(t=table, o=operation, q=quand, l=ligne))
+
+
+def _univers_4(cur):
+    """Journal des modifications (triggers sur objets, liaisons, evenements, parametres)."""
+    # AUTOINCREMENT: ids croissants jamais reutilises, meme apres une purge
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS journal_modifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_nom TEXT NOT NULL,
+            operation TEXT NOT NULL,
+            ligne_id INTEGER NOT NULL,
+            date_modification TEXT DEFAULT (datetime('now'))
+        )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_journal_table ON journal_modifications(table_nom, id)")
+    for table in TABLES_JOURNAL:
+        if table_existe(cur, table):
+            triggers_journal(cur, table)
+
+
+MIGRATIONS_UNIVERS = [
+    (1, "evenements, parametres, reseaux, liaisons, paternes", _univers_1),
+    (2, "stat_objects.liaison + stat_objects.id_stat", _univers_2),
+    (3, "index de stat_objects (famille, type, id, tris)", _univers_3),
+    (4, "journal des modifications (triggers)", _univers_4),
+]
+
+
+def migrer_events(connexion):
+    return migrer(connexion, MIGRATIONS_EVENTS)
+
+
+def migrer_univers(connexion):
+    resultat = migrer(connexion, MIGRATIONS_UNIVERS)
+    # Retention du journal des modifications (purge de temps en temps, voir journal.entretenir)
+    journal.entretenir(connexion)
+    return resultat
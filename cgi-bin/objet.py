@@ -4,9 +4,9 @@
 import os
 import sys
 import math
-import sqlite3
 import urllib.parse
 
+from catalogue import catalogue
 from stats_utils import calculer_courbe_evolution
 
 print("Content-Type: text/html; charset=utf-8\n")
@@ -31,21 +31,16 @@ nom = urllib.parse.unquote(nom)
 img = urllib.parse.unquote(img) if img else "/no_image.png"
 
 # ---------- BDD ----------
+# Instantane en memoire de Prix_Objets (catalogue.py), recherche par nom sans SQL
 DB_PATH = "cgi-bin/objets.db"
-conn = sqlite3.connect(DB_PATH)
-cur = conn.cursor()
+cat = catalogue(DB_PATH)
+indice = cat.chercher("Objet", nom)
 
-cur.execute("SELECT * FROM Prix_Objets WHERE Objet = ?", (nom,))
-row = cur.fetchone()
-
-if not row:
-    conn.close()
+if indice is None:
     print("<h2>Objet non trouvé</h2>")
     sys.exit()
 
-colonnes = [desc[0] for desc in cur.description]
-data = dict(zip(colonnes, row))
-conn.close()
+data = cat.ligne_dict(indice)
 
 # ---------- Courbe via stats_utils ----------
 courbe = calculer_courbe_evolution(
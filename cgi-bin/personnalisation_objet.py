@@ -4,8 +4,13 @@
 import os  # Acces aux variables d'environnement et chemins
 import sqlite3  # Acces a la base SQLite
 import urllib.parse  # Lecture / encodage des parametres URL
-import difflib  # Recherche floue (similarite entre chaines)
 import html  # Echappement HTML (anti-injection)
+from acces_bdd import base_occupee, connecter, ecrire, noms_colonnes  # Connexions SQLite communes (une par page, reglages)
+from facettes import invalider  # Cache des listes Famille / Type (a invalider apres ecriture)
+from migrations import migrer_univers  # Schema versionne des univers (PRAGMA user_version)
+from import_differe import differer  # Import au premier usage (demarrage plus rapide)
+
+difflib = differer("difflib")  # Recherche floue (similarite entre chaines), chargee si utilisee
 
 print("Content-Type: text/html; charset=utf-8\n")  # En-tete HTTP obligatoire pour un CGI
 
@@ -27,52 +32,20 @@ def chemin_univers(universe_id):  # Fonction: construit le chemin du fichier .db
 def echapper_html(s):  # Fonction: echappe une valeur pour l'afficher en HTML sans risque
     return html.escape("" if s is None else str(s))  # Transforme en string + escape HTML
 
-def assurer_colonne(db_path, table, col_name, col_def_sql):  # Fonction: s'assure qu'une colonne existe
-    conn = None  # Variable connexion (pour fermer proprement)
-    try:  # Bloc protegeant contre les erreurs
-        conn = sqlite3.connect(db_path)  # Ouvre la connexion SQLite
-        cur = conn.cursor()  # Cree un curseur
-        cur.execute(f"PRAGMA table_info({table})")  # Liste les colonnes de la table
-        cols = [r[1] for r in cur.fetchall()]  # Extrait les noms de colonnes
-        if col_name not in cols:  # Si la colonne n'existe pas
-            cur.execute(f"ALTER TABLE {table} ADD COLUMN {col_name} {col_def_sql}")  # Ajoute la colonne
-            conn.commit()  # Valide la modification
-        return True  # Ok
-    except Exception:  # Si erreur (table inexistante, fichier manquant, etc.)
+def assurer_schema(db_path):  # Fonction: met le schema de l'univers a jour (colonnes liaison + id_stat remplie)
+    if not os.path.exists(db_path):  # Univers inexistant: rien a migrer (et pas de fichier vide cree)
         return False  # Echec
-    finally:  # Toujours execute
-        if conn is not None:  # Si connexion ouverte
-            conn.close()  # Ferme la connexion
-
-def assurer_id_stat_rempli(db_path):  # Fonction: garantit id_stat existe et est rempli pour les anciennes lignes
-    conn = None  # Variable connexion
     try:  # Bloc protegeant contre les erreurs
-        conn = sqlite3.connect(db_path)  # Ouvre SQLite
-        cur = conn.cursor()  # Cree un curseur
-
-        cur.execute("PRAGMA table_info(stat_objects)")  # Liste colonnes de stat_objects
-        cols = [r[1] for r in cur.fetchall()]  # Recupere noms colonnes
-        if "id_stat" not in cols:  # Si la colonne id_stat n'existe pas
-            cur.execute("ALTER TABLE stat_objects ADD COLUMN id_stat INTEGER")  # Ajoute id_stat
-            conn.commit()  # Valide
-
-        cur.execute("UPDATE stat_objects SET id_stat = rowid WHERE id_stat IS NULL")  # Remplit id_stat manquant
-        conn.commit()  # Valide la mise a jour
+        migrer_univers(connecter(db_path))  # Migrations en attente seulement (simple lecture si a jour)
         return True  # Ok
-    except Exception:  # Si erreur
+    except Exception:  # Si erreur (base verrouillee, fichier invalide, etc.)
         return False  # Echec
-    finally:  # Toujours execute
-        if conn is not None:  # Si connexion ouverte
-            conn.close()  # Ferme
 
 def lire_colonnes_stat_objects(db_path):  # Fonction: recupere la liste des colonnes de stat_objects
     conn = None  # Variable connexion
     try:  # Bloc protegeant
-        conn = sqlite3.connect(db_path)  # Ouvre SQLite
-        cur = conn.cursor()  # Curseur
-        cur.execute("PRAGMA table_info(stat_objects)")  # Colonnes
-        cols = [r[1] for r in cur.fetchall()]  # Noms colonnes
-        return cols  # Retourne la liste
+        conn = connecter(db_path)  # Ouvre SQLite
+        return noms_colonnes(conn, "stat_objects")  # Noms colonnes (cache par version du schema)
     except Exception:  # Si erreur
         return []  # Liste vide
     finally:  # Toujours execute
@@ -115,7 +88,7 @@ def trouver_colonne_prix(columns):  # Fonction: tente de trouver la colonne prix
 
 def chercher_objets_flou(db_path, search_term):  # Fonction: recherche floue dans stat_objects
     try:  # Bloc protegeant
-        conn = sqlite3.connect(db_path)  # Ouvre SQLite
+        conn = connecter(db_path)  # Ouvre SQLite
         cur = conn.cursor()  # Curseur
 
         cols = lire_colonnes_stat_objects(db_path)  # Recupere colonnes de stat_objects
@@ -128,7 +101,7 @@ def chercher_objets_flou(db_path, search_term):  # Fonction: recherche floue dan
             conn.close()  # Ferme
             return []  # Rien
 
-        cur.execute(f"SELECT rowid, [{name_col}] FROM stat_objects")  # Prend rowid + nom
+        cur.execute(f"SELECT rowid, [{name_col}] FROM stat_objects ORDER BY rowid")  # Prend rowid + nom (ordre de la table)
         all_objects = cur.fetchall()  # Liste (rowid, nom)
         conn.close()  # Ferme (important en CGI)
 
@@ -188,7 +161,7 @@ def calculer_agregats(db_path, selected_counts, method):  # Fonction: calcule un
     if not cols:  # Si rien
         return {}, []  # Retour vide
 
-    conn = sqlite3.connect(db_path)  # Ouvre SQLite
+    conn = connecter(db_path)  # Ouvre SQLite
     cur = conn.cursor()  # Curseur
 
     rowids = list(selected_counts.keys())  # Liste des rowid selectionnes
@@ -233,19 +206,18 @@ def calculer_agregats(db_path, selected_counts, method):  # Fonction: calcule un
 
     return agg, cols  # Retourne dict + colonnes
 
-def prochain_id_stat(db_path):  # Fonction: calcule le prochain id_stat
-    conn = None  # Connexion
+def prochain_id_stat(conn):  # Fonction: calcule le prochain id_stat (dans la transaction d'ecriture)
     try:  # Bloc protegeant
-        conn = sqlite3.connect(db_path)  # Ouvre
         cur = conn.cursor()  # Curseur
         cur.execute("SELECT COALESCE(MAX(id_stat), 0) + 1 FROM stat_objects")  # Max + 1
         v = cur.fetchone()[0]  # Recupere le resultat
         return int(v)  # Renvoie int
+    except sqlite3.OperationalError as e:  # Base occupee: l'erreur remonte (nouvel essai dans ecrire)
+        if base_occupee(e):  # Verrou (meme test que ecrire)
+            raise  # Remonte
+        return None  # Pas d'id (colonne absente...)
     except Exception:  # Si erreur
         return None  # Pas d'id
-    finally:  # Toujours execute
-        if conn is not None:  # Si ouvert
-            conn.close()  # Ferme
 
 # ---------------------------
 # creer_objet_statistique
@@ -271,16 +243,11 @@ def creer_objet_statistique(db_path, name, compact_counts, method):  # Fonction:
 
     agg, cols = calculer_agregats(db_path, counts, method)  # Calcule les champs agreges
 
-    assurer_colonne(db_path, "stat_objects", "liaison", "TEXT DEFAULT 'null'")  # Garantit liaison
-    assurer_id_stat_rempli(db_path)  # Garantit id_stat present + rempli
+    assurer_schema(db_path)  # Garantit liaison + id_stat present et rempli
 
     agg[name_col] = name  # Force le nom de l'objet cree
     agg["liaison"] = "null"  # Force liaison a "null"
 
-    new_id = prochain_id_stat(db_path)  # Prochain id_stat
-    if new_id is not None:  # Si calcule
-        agg["id_stat"] = new_id  # Applique
-
     if type_col:  # Si colonne type existe
         if method == "fusion":  # Si fusion
             agg[type_col] = "Fusion"  # Texte
@@ -304,21 +271,21 @@ def creer_objet_statistique(db_path, name, compact_counts, method):  # Fonction:
 
     for c in cols_to_insert:  # Parcourt les colonnes a inserer
         insert_cols.append(c)  # Ajoute la colonne
-        insert_vals.append(agg.get(c, "?"))  # Ajoute la valeur ou "?"
 
     # Securite: si liaison/id_stat etaient dans cols mais pas dans cols_to_insert
     for extra in ("liaison", "id_stat"):  # Colonnes meta
         if extra in cols and extra not in cols_to_insert:  # Si existe et pas deja prevu
             insert_cols.append(extra)  # Ajoute colonne
-            insert_vals.append(agg.get(extra, "?"))  # Ajoute valeur
 
     cols_sql = ",".join([f"[{c}]" for c in insert_cols])  # Colonnes entre crochets
-    ph = ",".join(["?"] * len(insert_vals))  # Placeholders
+    ph = ",".join(["?"] * len(insert_cols))  # Placeholders
 
-    conn = None  # Connexion
-    try:  # Bloc protegeant
-        conn = sqlite3.connect(db_path)  # Ouvre
+    def inserer(conn):  # Ecriture (rejouee en entier si la base est occupee)
         cur = conn.cursor()  # Curseur
+        new_id = prochain_id_stat(conn)  # Prochain id_stat, lu sous verrou (pas de doublon entre 2 pages)
+        if new_id is not None:  # Si calcule
+            agg["id_stat"] = new_id  # Applique
+        insert_vals = [agg.get(c, "?") for c in insert_cols]  # Valeurs (ou "?")
         cur.execute(f"INSERT INTO stat_objects ({cols_sql}) VALUES ({ph})", insert_vals)  # Insertion
 
         if method == "fusion":  # Si fusion
@@ -328,7 +295,11 @@ def creer_objet_statistique(db_path, name, compact_counts, method):  # Fonction:
                     [f"lie a {name}"] + list(counts.keys())
                 )
 
-        conn.commit()  # Valide
+    conn = None  # Connexion
+    try:  # Bloc protegeant
+        conn = connecter(db_path)  # Ouvre
+        ecrire(conn, inserer)  # BEGIN IMMEDIATE + commit, nouveaux essais si base verrouillee
+        invalider(db_path, "stat_objects")  # Familles / types a recalculer
         return True, "Objet cree avec succes !"  # Meme message
     except Exception as e:  # Si erreur SQL
         return False, f"Erreur: {e}"  # Meme format
@@ -346,8 +317,7 @@ action = lire_parametre_get("action", "")  # Recupere l'action demandee
 db_path = chemin_univers(universe_id)  # Calcule le chemin du fichier .db
 
 if universe_id:  # Si universe_id fourni
-    assurer_colonne(db_path, "stat_objects", "liaison", "TEXT DEFAULT 'null'")  # S'assure liaison existe
-    assurer_id_stat_rempli(db_path)  # S'assure id_stat existe et rempli
+    assurer_schema(db_path)  # S'assure liaison + id_stat existent (id_stat rempli)
 
 msg = ""  # Message a afficher
 msg_class = "ok"  # Classe CSS du message
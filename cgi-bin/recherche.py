@@ -1,11 +1,14 @@
     #!/usr/bin/env python3
-import sqlite3
 import sys
-import difflib
-import urllib.request
 import urllib.parse
-import json
+from catalogue import catalogue
+from import_differe import differer
 from no_resultat import page_no_resultat
+
+# Modules lourds charges seulement si utilises (pas de requete -> jamais charges)
+difflib = differer("difflib")
+json = differer("json")
+differer("urllib.request")  # urllib.request.urlopen(...) reste utilisable tel quel
 import re
 import os
 
@@ -112,13 +115,9 @@ if not requete:
 requete_minuscule = requete.lower()
 
 # ---------- BDD ----------
+# Instantane en memoire de Prix_Objets (catalogue.py): pas de requete SQL par recherche
 CHEMIN_BDD = "cgi-bin/objets.db"
-connexion = sqlite3.connect(CHEMIN_BDD)
-curseur = connexion.cursor()
-
-curseur.execute("SELECT Objet, Famille, Type FROM Prix_Objets")
-lignes = curseur.fetchall()
-objets = lignes
+objets = catalogue(CHEMIN_BDD).lignes(("Objet", "Famille", "Type"))
 
 # ---------- RECHERCHE TOLÉRANTE ----------
 resultats = []
@@ -200,4 +199,3 @@ for _, objet, famille, type_objet in resultats:
 
 print("</div>")
 print("</body></html>")
-connexion.close()
@@ -2,10 +2,11 @@
 # -*- coding: utf-8 -*-
 
 import os
-import sqlite3
 import html
 import urllib.parse
 
+from catalogue import catalogue, comme
+
 print("Content-Type: text/html; charset=utf-8\n")
 
 DB_PATH = "cgi-bin/objets.db"
@@ -23,68 +24,49 @@ choix = get_param("choix", "")
 # ==========================
 # REQUETES POPULAIRES
 # ==========================
+# Lues dans l'instantane en memoire de Prix_Objets (catalogue.py) au lieu d'une requete SQL.
+# "indices": fonction (cat) -> lignes retenues, dans l'ordre d'affichage (10 au plus)
+technologie = (comme("%Numérique%"), comme("%Technologie%"))
+
 requetes = {
     "cher": {
         "titre": "Objets les plus chers",
-        "sql": """
-            SELECT Objet, Prix_Moyen_Actuel
-            FROM Prix_Objets
-            WHERE Prix_Moyen_Actuel IS NOT NULL
-            ORDER BY Prix_Moyen_Actuel DESC
-            LIMIT 10
-        """,
+        "colonne": "Prix_Moyen_Actuel",
+        "indices": lambda cat: cat.top("Prix_Moyen_Actuel", 10,
+                                       indices=cat.filtrer(non_nuls=("Prix_Moyen_Actuel",))),
         "label": "Prix moyen (EUR)"
     },
     "evolution": {
         "titre": "Plus forte evolution depuis 2000",
-        "sql": """
-            SELECT Objet, Coef_Total_2000_2025
-            FROM Prix_Objets
-            WHERE Coef_Total_2000_2025 IS NOT NULL
-            ORDER BY Coef_Total_2000_2025 DESC
-            LIMIT 10
-        """,
+        "colonne": "Coef_Total_2000_2025",
+        "indices": lambda cat: cat.top("Coef_Total_2000_2025", 10,
+                                       indices=cat.filtrer(non_nuls=("Coef_Total_2000_2025",))),
         "label": "Coefficient evolution"
     },
     "quotidien": {
         "titre": "Objets du quotidien",
-        "sql": """
-            SELECT Objet, Taux_Utilisation
-            FROM Prix_Objets
-            WHERE Taux_Utilisation LIKE 'Quotidien%'
-            LIMIT 10
-        """,
+        "colonne": "Taux_Utilisation",
+        "indices": lambda cat: cat.filtrer(condition={"Taux_Utilisation": comme("Quotidien%")})[:10],
         "label": "Utilisation"
     },
     "tech": {
         "titre": "Marches technologiques",
-        "sql": """
-            SELECT Objet, Famille
-            FROM Prix_Objets
-            WHERE Famille LIKE '%Numérique%' OR Famille LIKE '%Technologie%'
-            LIMIT 10
-        """,
+        "colonne": "Famille",
+        "indices": lambda cat: cat.filtrer(
+            condition={"Famille": lambda v: technologie[0](v) or technologie[1](v)})[:10],
         "label": "Famille"
     },
     "speculation": {
         "titre": "Objets a forte speculation",
-        "sql": """
-            SELECT Objet, Speculation
-            FROM Prix_Objets
-            WHERE Speculation LIKE 'Forte%'
-            LIMIT 10
-        """,
+        "colonne": "Speculation",
+        "indices": lambda cat: cat.filtrer(condition={"Speculation": comme("Forte%")})[:10],
         "label": "Speculation"
     },
     "ca": {
         "titre": "Plus gros CA futur",
-        "sql": """
-            SELECT Objet, CA_2025_2035_MDEUR
-            FROM Prix_Objets
-            WHERE CA_2025_2035_MDEUR IS NOT NULL
-            ORDER BY CA_2025_2035_MDEUR DESC
-            LIMIT 10
-        """,
+        "colonne": "CA_2025_2035_MDEUR",
+        "indices": lambda cat: cat.top("CA_2025_2035_MDEUR", 10,
+                                       indices=cat.filtrer(non_nuls=("CA_2025_2035_MDEUR",))),
         "label": "CA futur (MdEUR)"
     }
 }
@@ -98,11 +80,8 @@ if choix in requetes:
     titre_resultat = req["titre"]
     label_col = req["label"]
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(req["sql"])
-    rows = cur.fetchall()
-    conn.close()
+    cat = catalogue(DB_PATH)
+    rows = cat.lignes(("Objet", req["colonne"]), req["indices"](cat))
 
 # ==========================
 # HTML
@@ -18,14 +18,18 @@ Contraintes:
 """
 
 import os
-import sqlite3
 import urllib.parse
 import html
-import difflib
 
+from acces_bdd import connecter, noms_colonnes
+from facettes import facette
+from import_differe import differer
 from sim_calc import executer_simulation, detecter_colonnes_statistiques
 from stats_utils import generer_svg_courbes
 
+# Recherche floue: chargee seulement si une suggestion est demandee
+difflib = differer("difflib")
+
 
 # ============================================================
 # En tete CGI obligatoire
@@ -204,10 +208,8 @@ def lire_parametres_evenements(conn, ids_evenements):
 
 def colonnes_evenements(conn):
     """Liste des colonnes disponibles dans evenements."""
-    cur = conn.cursor()
     try:
-        cur.execute("PRAGMA table_info(evenements)")
-        return {c[1] for c in cur.fetchall() if c[1]}
+        return {c for c in noms_colonnes(conn, "evenements") if c}
     except Exception:
         return set()
 
@@ -230,7 +232,7 @@ if not os.path.exists(chemin_bdd):
     print("<p>Chemin attendu: {}</p>".format(echapper_html(chemin_bdd)))
     raise SystemExit
 
-connexion = sqlite3.connect(chemin_bdd)
+connexion = connecter(chemin_bdd, lecture_seule=True)
 colonnes = detecter_colonnes_statistiques(connexion)
 
 if not colonnes.get("id") or not colonnes.get("nom"):
@@ -351,14 +353,8 @@ def lister_distinct(conn, nom_col):
     """Liste des valeurs distinctes (non vides) d une colonne."""
     if not nom_col:
         return []
-    cur = conn.cursor()
     try:
-        cur.execute(
-            "SELECT DISTINCT [{c}] FROM stat_objects WHERE [{c}] IS NOT NULL AND TRIM([{c}]) != '' ORDER BY [{c}] COLLATE NOCASE".format(
-                c=nom_col
-            )
-        )
-        return [r[0] for r in cur.fetchall()]
+        return facette(conn, "stat_objects", nom_col).triees()
     except Exception:
         return []
 
@@ -392,7 +388,7 @@ if recherche_objet:
     if not resultats_recherche:
         try:
             cur.execute(
-                "SELECT [{nomc}] FROM stat_objects WHERE [{nomc}] IS NOT NULL AND TRIM([{nomc}]) != ''".format(
+                "SELECT [{nomc}] FROM stat_objects WHERE [{nomc}] IS NOT NULL AND TRIM([{nomc}]) != '' ORDER BY rowid".format(
                     nomc=colonnes["nom"]
                 )
             )
@@ -10,7 +10,12 @@
 # - Ce fichier ne doit jamais faire de print HTML
 # - Il doit juste fournir des fonctions "propres" reutilisables
 
+from collections import deque
+
 from stats_utils import facteur_speculation, facteur_utilisation
+from acces_bdd import infos_colonnes, memoriser_schema, noms_colonnes
+import graphe_liaisons
+import sim_vectoriel
 
 
 # ============================================================
@@ -23,6 +28,9 @@ PROFONDEUR_RESEAU_MAX = 6
 # Attenuation sur la propagation (niveau 1 -> *0.70, niveau 2 -> *0.70^2, ...)
 ATTENUATION_RESEAU = 0.70
 
+# Ids par requete IN (...) au chargement du planning (limite de variables SQLite)
+TAILLE_LOT_IN = 400
+
 # Croissance annuelle par defaut si on ne sait pas faire mieux
 TAUX_PRIX_DEFAUT = 0.02
 TAUX_CA_DEFAUT = 0.01
@@ -63,11 +71,17 @@ def detecter_colonnes_statistiques(connexion, nom_table="stat_objects"):
     - speculation, taux_utilisation, coef_aug_prev
 
     Retourne: dict {cle_interne: nom_colonne_sqlite_ou_None}
+    (calcule une fois par version du schema, voir acces_bdd.memoriser_schema)
     """
-    cur = connexion.cursor()
-    cur.execute("PRAGMA table_info({})".format(nom_table))
-    infos = cur.fetchall()
+    colonnes = memoriser_schema(
+        connexion, ("colonnes_statistiques", nom_table),
+        lambda conn: _detecter_colonnes(infos_colonnes(conn, nom_table))
+    )
+    return dict(colonnes)
+
 
+def _detecter_colonnes(infos):
+    """Correspondance cle_interne -> colonne, depuis les lignes de PRAGMA table_info."""
     # Liste de colonnes presentes (en minuscules) -> vrai nom
     mapping_present = {}
     for col in infos:
@@ -120,7 +134,8 @@ def lister_objets_par_ids(connexion, colonnes, ids_objets, nom_table="stat_objec
     if not cols_sql:
         return []
 
-    requete = "SELECT {} FROM {} WHERE [{}] IN ({})".format(
+    # ORDER BY rowid: ordre de la table, meme si l index sur id est utilise
+    requete = "SELECT {} FROM {} WHERE [{}] IN ({}) ORDER BY rowid".format(
         ", ".join(cols_sql),
         nom_table,
         colonnes["id"],
@@ -176,42 +191,11 @@ def lister_ids_objets_par_type(connexion, colonnes, type_objet, nom_table="stat_
 
 def voisins_objet(connexion, objet_id):
     """
-    Retourne la liste des voisins directs d un objet via liaisons_objets.
-    IMPORTANT: on suppose la table creee par liaison.py
+    Retourne la liste des voisins directs d un objet (liaisons_applicables type O,
+    sinon ancienne table liaisons_objets), via le graphe en memoire (graphe_liaisons).
     Retour: liste de tuples (voisin_id, poids_liaison)
     """
-    cur = connexion.cursor()
-    try:
-        # Priorite: table liaisons_applicables (nouveau)
-        cur.execute(
-            """
-            SELECT source_id, cible_id, implication, poids, probabilite
-            FROM liaisons_applicables
-            WHERE type_applicable = 'O' AND (source_id = ? OR cible_id = ?)
-            """,
-            (objet_id, objet_id)
-        )
-        voisins_map = {}
-        for sid, cid, impl, poids, probabilite in cur.fetchall():
-            poids_liaison = _float_robuste(poids, 1.0) * _float_robuste(probabilite, 1.0)
-            poids_liaison = max(0.0, min(1.0, poids_liaison))
-            if sid == objet_id:
-                voisins_map[cid] = max(poids_liaison, voisins_map.get(cid, 0.0))
-            elif impl == "<->" and cid == objet_id:
-                voisins_map[sid] = max(poids_liaison, voisins_map.get(sid, 0.0))
-        if voisins_map:
-            return [(vid, poids) for vid, poids in voisins_map.items()]
-    except Exception:
-        pass
-
-    try:
-        cur.execute(
-            "SELECT cible_objet_id FROM liaisons_objets WHERE source_objet_id = ?",
-            (objet_id,)
-        )
-        return [(r[0], 1.0) for r in cur.fetchall()]
-    except Exception:
-        return []
+    return graphe_liaisons.graphe(connexion, "O").voisins(objet_id)
 
 
 def voisins_evenement(connexion, evenement_id):
@@ -219,33 +203,16 @@ def voisins_evenement(connexion, evenement_id):
     Retourne la liste des evenements lies via liaisons_applicables (type E).
     Retour: liste de tuples (evenement_id, poids_liaison)
     """
-    cur = connexion.cursor()
-    try:
-        cur.execute(
-            """
-            SELECT source_id, cible_id, implication, poids, probabilite
-            FROM liaisons_applicables
-            WHERE type_applicable = 'E' AND (source_id = ? OR cible_id = ?)
-            """,
-            (evenement_id, evenement_id)
-        )
-        voisins_map = {}
-        for sid, cid, impl, poids, probabilite in cur.fetchall():
-            poids_liaison = _float_robuste(poids, 1.0) * _float_robuste(probabilite, 1.0)
-            poids_liaison = max(0.0, min(1.0, poids_liaison))
-            if sid == evenement_id:
-                voisins_map[cid] = max(poids_liaison, voisins_map.get(cid, 0.0))
-            elif impl == "<->" and cid == evenement_id:
-                voisins_map[sid] = max(poids_liaison, voisins_map.get(sid, 0.0))
-        return [(vid, poids) for vid, poids in voisins_map.items()]
-    except Exception:
-        return []
+    return graphe_liaisons.graphe(connexion, "E").voisins(evenement_id)
 
 
-def calculer_propagation_evenements(connexion, evenements_depart, profondeur_max=PROFONDEUR_RESEAU_MAX, attenuation=1.0):
+def calculer_propagation_evenements(connexion, evenements_depart, profondeur_max=PROFONDEUR_RESEAU_MAX, attenuation=1.0,
+                                    graphe=None):
     """
     Propagation BFS d activation d evenements lies.
+    graphe: graphe des liaisons E deja charge (sinon lu / repris du cache)
     Retour: dict evenement_id -> poids_activation
+    (memorise par le graphe pour ce depart / profondeur / attenuation: a lire seulement)
     """
     if profondeur_max < 0:
         profondeur_max = 0
@@ -254,15 +221,27 @@ def calculer_propagation_evenements(connexion, evenements_depart, profondeur_max
     if attenuation > 1.0:
         attenuation = 1.0
 
+    if graphe is None:
+        graphe = graphe_liaisons.graphe(connexion, "E")
+
+    # Depart en tuple ordonne (et non en ensemble): l ordre de decouverte du BFS compte
+    depart = tuple(evenements_depart or [])
+    return graphe.propagation(
+        ("E", depart, profondeur_max, attenuation),
+        lambda: _propagation_evenements(graphe, depart, profondeur_max, attenuation))
+
+
+def _propagation_evenements(graphe, evenements_depart, profondeur_max, attenuation):
+    """BFS de calculer_propagation_evenements (parametres deja bornes)."""
     resultat = {}
-    file_bfs = []
+    file_bfs = deque()
 
-    for eid in (evenements_depart or []):
+    for eid in evenements_depart:
         resultat[eid] = 1.0
         file_bfs.append((eid, 0, 1.0))
 
     while file_bfs:
-        courant, niv, poids_courant = file_bfs.pop(0)
+        courant, niv, poids_courant = file_bfs.popleft()
 
         if niv >= profondeur_max:
             continue
@@ -272,7 +251,7 @@ def calculer_propagation_evenements(connexion, evenements_depart, profondeur_max
         if base_poids <= 0.0:
             continue
 
-        for v, poids_liaison in voisins_evenement(connexion, courant):
+        for v, poids_liaison in graphe.voisins(courant):
             if v is None:
                 continue
             poids_suiv = base_poids * _float_robuste(poids_liaison, 1.0)
@@ -286,13 +265,13 @@ def calculer_propagation_evenements(connexion, evenements_depart, profondeur_max
     return resultat
 
 
-def etendre_evenements_lies(connexion, evenements_planifies):
+def etendre_evenements_lies(connexion, evenements_planifies, graphe=None):
     """Etend les evenements planifies avec leurs liaisons d activation."""
     if not evenements_planifies:
         return []
 
     depart = [eid for (eid, _cp, _cc) in evenements_planifies]
-    propagation = calculer_propagation_evenements(connexion, depart)
+    propagation = calculer_propagation_evenements(connexion, depart, graphe=graphe)
 
     base_coeffs = {}
     for (eid, coef_prix, coef_ca) in evenements_planifies:
@@ -316,15 +295,18 @@ def etendre_evenements_lies(connexion, evenements_planifies):
     return evenements_etendus
 
 
-def calculer_propagation_reseau(connexion, objets_depart, profondeur_max=PROFONDEUR_RESEAU_MAX, attenuation=ATTENUATION_RESEAU):
+def calculer_propagation_reseau(connexion, objets_depart, profondeur_max=PROFONDEUR_RESEAU_MAX, attenuation=ATTENUATION_RESEAU,
+                                graphe=None):
     """
     Propagation BFS:
     - niveau 0: objets_depart
     - niveau n: voisins de niveau n-1
     - poids = attenuation^niveau
+    - graphe: graphe des liaisons O deja charge (sinon lu / repris du cache)
 
     Retour:
     - dict objet_id -> (niveau, poids)
+      (memorise par le graphe pour ce depart / profondeur / attenuation: a lire seulement)
     """
     if profondeur_max < 0:
         profondeur_max = 0
@@ -333,16 +315,27 @@ def calculer_propagation_reseau(connexion, objets_depart, profondeur_max=PROFOND
     if attenuation > 1.0:
         attenuation = 1.0
 
+    if graphe is None:
+        graphe = graphe_liaisons.graphe(connexion, "O")
+
+    depart = tuple(objets_depart or [])
+    return graphe.propagation(
+        ("O", depart, profondeur_max, attenuation),
+        lambda: _propagation_reseau(graphe, depart, profondeur_max, attenuation))
+
+
+def _propagation_reseau(graphe, objets_depart, profondeur_max, attenuation):
+    """BFS de calculer_propagation_reseau (parametres deja bornes)."""
     resultat = {}
-    file_bfs = []
+    file_bfs = deque()
 
-    for oid in (objets_depart or []):
+    for oid in objets_depart:
         resultat[oid] = (0, 1.0)
         file_bfs.append((oid, 0, 1.0))
 
     # BFS classique
     while file_bfs:
-        courant, niv, poids_courant = file_bfs.pop(0)
+        courant, niv, poids_courant = file_bfs.popleft()
 
         if niv >= profondeur_max:
             continue
@@ -352,7 +345,7 @@ def calculer_propagation_reseau(connexion, objets_depart, profondeur_max=PROFOND
         if base_poids <= 0.0:
             continue
 
-        for v, poids_liaison in voisins_objet(connexion, courant):
+        for v, poids_liaison in graphe.voisins(courant):
             if v is None:
                 continue
 
@@ -387,9 +380,7 @@ def lire_evenement(connexion, evenement_id):
     """
     cur = connexion.cursor()
     try:
-        cur.execute("PRAGMA table_info(evenements)")
-        info_cols = cur.fetchall()
-        colonnes = [c[1] for c in info_cols]
+        colonnes = noms_colonnes(connexion, "evenements")
     except Exception:
         colonnes = []
 
@@ -422,8 +413,7 @@ def lire_impacts_evenement(connexion, evenement_id):
     cur = connexion.cursor()
     try:
         # Support colonne probabilite si presente
-        cur.execute("PRAGMA table_info(impacts_evenements)")
-        colonnes = [c[1] for c in cur.fetchall()]
+        colonnes = noms_colonnes(connexion, "impacts_evenements")
         if "probabilite" in colonnes:
             cur.execute(
                 "SELECT objet_id, poids_final, probabilite FROM impacts_evenements WHERE evenement_id = ?",
@@ -482,7 +472,7 @@ def _lister_tous_objets(connexion, colonnes):
         return []
     cur = connexion.cursor()
     try:
-        cur.execute("SELECT [{}] FROM stat_objects".format(colonnes["id"]))
+        cur.execute("SELECT [{}] FROM stat_objects ORDER BY rowid".format(colonnes["id"]))
         return [r[0] for r in cur.fetchall()]
     except Exception:
         return []
@@ -566,7 +556,7 @@ def construire_etat_objets_initial(connexion, colonnes, ids_objets):
         return etat
 
     cur = connexion.cursor()
-    requete = "SELECT {} FROM stat_objects WHERE [{}] IN ({})".format(
+    requete = "SELECT {} FROM stat_objects WHERE [{}] IN ({}) ORDER BY rowid".format(
         ", ".join(champs),
         colonnes["id"],
         placeholders
@@ -626,15 +616,8 @@ def construire_etat_objets_initial(connexion, colonnes, ids_objets):
 # Base evolution annuelle (hors evenements)
 # ============================================================
 
-def appliquer_croissance_annuelle(etat_objet):
-    """
-    Applique une croissance simple:
-    - prix: via coef_aug_prev + facteurs spec/util si dispo
-    - ca: petite croissance defaut
-    """
-    if not etat_objet:
-        return
-
+def coefficient_annuel(etat_objet):
+    """Coefficient de prix annuel d un objet: coef_aug_prev * facteurs spec/util (1.0 si <= 0)."""
     coef = _float_robuste(etat_objet.get("coef_aug_prev"), 1.02)
 
     # Facteurs "soft"
@@ -645,6 +628,24 @@ def appliquer_croissance_annuelle(etat_objet):
     coef_final = coef * fs * fu
     if coef_final <= 0:
         coef_final = 1.0
+    return coef_final
+
+
+def appliquer_croissance_annuelle(etat_objet, nb_annees=1):
+    """
+    Applique une croissance simple:
+    - prix: via coef_aug_prev + facteurs spec/util si dispo
+    - ca: petite croissance defaut
+    nb_annees > 1: plusieurs annees d un coup (forme fermee: prix * coef^n, ca * 1.01^n)
+    """
+    if not etat_objet:
+        return
+
+    coef_final = coefficient_annuel(etat_objet)
+    facteur_ca = 1.0 + TAUX_CA_DEFAUT
+    if nb_annees != 1:
+        coef_final = coef_final ** nb_annees
+        facteur_ca = facteur_ca ** nb_annees
 
     # Prix
     etat_objet["prix_moyen"] = max(0.0, etat_objet.get("prix_moyen", 0.0) * coef_final)
@@ -653,7 +654,7 @@ def appliquer_croissance_annuelle(etat_objet):
 
     # CA (defaut)
     ca = _float_robuste(etat_objet.get("ca"), 0.0)
-    etat_objet["ca"] = max(0.0, ca * (1.0 + TAUX_CA_DEFAUT))
+    etat_objet["ca"] = max(0.0, ca * facteur_ca)
 
 
 # ============================================================
@@ -690,6 +691,39 @@ def appliquer_evenement_parametrique(
     if not impacts:
         return
 
+    coef_prix_action, coef_ca_action, delta_prix, prob_evt = _coefficients_action(
+        coef_prix, coef_ca, action_param, valeur_param, probabilite_evt)
+
+    for oid, poids_impact in impacts.items():
+        if oid not in etat:
+            # Si l objet n est pas dans la projection, on ignore (on reste deterministe)
+            continue
+
+        # Poids reseau (liaison): si l objet est proche des objets de depart, il est plus affecte
+        poids_reseau = 1.0
+        if propagation and oid in propagation:
+            poids_reseau = _float_robuste(propagation[oid][1], 1.0)
+
+        poids_total = _float_robuste(poids_impact, 1.0) * poids_reseau * prob_evt
+        if poids_total < 0.0:
+            poids_total = 0.0
+        if poids_total > 1.0:
+            # On limite pour eviter des delires
+            poids_total = 1.0
+
+        # Coeff local prix / ca
+        coef_local_prix = 1.0 + (coef_prix_action - 1.0) * poids_total
+        coef_local_ca = 1.0 + (coef_ca_action - 1.0) * poids_total
+
+        # Appliquer a l etat
+        etat[oid]["prix_moyen"] = max(0.0, etat[oid]["prix_moyen"] * coef_local_prix + delta_prix * poids_total)
+        etat[oid]["prix_min"] = max(0.0, etat[oid]["prix_min"] * coef_local_prix + delta_prix * poids_total)
+        etat[oid]["prix_max"] = max(0.0, etat[oid]["prix_max"] * coef_local_prix + delta_prix * poids_total)
+        etat[oid]["ca"] = max(0.0, etat[oid]["ca"] * coef_local_ca)
+
+
+def _coefficients_action(coef_prix, coef_ca, action_param, valeur_param, probabilite_evt):
+    """Coefficients prix / ca, decalage de prix et probabilite (0..1) selon l action Ep."""
     # Adapter coefficients selon action
     coef_prix_action = coef_prix
     coef_ca_action = coef_ca
@@ -713,32 +747,246 @@ def appliquer_evenement_parametrique(
     if prob_evt > 1.0:
         prob_evt = 1.0
 
+    return coef_prix_action, coef_ca_action, delta_prix, prob_evt
+
+
+def appliquer_evenement_vectoriel(
+    vecteur,
+    evenement,
+    impacts,
+    propagation,
+    coef_prix=1.0,
+    coef_ca=1.0,
+    action_param="coef_evolution",
+    valeur_param=1.0,
+    probabilite_evt=1.0
+):
+    """Meme calcul que appliquer_evenement_parametrique, sur un sim_vectoriel.EtatVectoriel."""
+    if not evenement or not impacts:
+        return
+
+    coef_prix_action, coef_ca_action, delta_prix, prob_evt = _coefficients_action(
+        coef_prix, coef_ca, action_param, valeur_param, probabilite_evt)
+
+    positions, poids = _cibles_vectorielles(vecteur, impacts, propagation)
+    vecteur.appliquer_evenement(positions, poids, coef_prix_action, coef_ca_action, delta_prix, prob_evt)
+
+
+def _cibles_vectorielles(vecteur, impacts, propagation):
+    """Objets touches -> positions dans les vecteurs + poids (impact * reseau)."""
+    positions = []
+    poids = []
     for oid, poids_impact in impacts.items():
-        if oid not in etat:
-            # Si l objet n est pas dans la projection, on ignore (on reste deterministe)
+        pos = vecteur.position.get(oid)
+        if pos is None:
             continue
-
-        # Poids reseau (liaison): si l objet est proche des objets de depart, il est plus affecte
         poids_reseau = 1.0
         if propagation and oid in propagation:
             poids_reseau = _float_robuste(propagation[oid][1], 1.0)
+        positions.append(pos)
+        poids.append(_float_robuste(poids_impact, 1.0) * poids_reseau)
+    return positions, poids
 
-        poids_total = _float_robuste(poids_impact, 1.0) * poids_reseau * prob_evt
-        if poids_total < 0.0:
-            poids_total = 0.0
-        if poids_total > 1.0:
-            # On limite pour eviter des delires
-            poids_total = 1.0
 
-        # Coeff local prix / ca
-        coef_local_prix = 1.0 + (coef_prix_action - 1.0) * poids_total
-        coef_local_ca = 1.0 + (coef_ca_action - 1.0) * poids_total
+# ============================================================
+# Compilation du planning (tout lire avant la boucle des annees)
+# ============================================================
+
+def _par_lots(ids):
+    """Decoupe une liste d ids en lots pour IN (...)."""
+    for debut in range(0, len(ids), TAILLE_LOT_IN):
+        yield ids[debut:debut + TAILLE_LOT_IN]
+
+
+def _lire_evenements_lot(connexion, ids):
+    """Comme lire_evenement, pour plusieurs ids: {id: dict} (ids absents: pas dans le dict)."""
+    try:
+        colonnes = noms_colonnes(connexion, "evenements")
+    except Exception:
+        colonnes = []
+    if not colonnes:
+        return {}
+
+    cols_sql = ", ".join(["[{}]".format(c) for c in colonnes])
+    evenements = {}
+    try:
+        for lot in _par_lots(ids):
+            requete = "SELECT id, {} FROM evenements WHERE id IN ({}) ORDER BY rowid".format(
+                cols_sql, ",".join(["?"] * len(lot)))
+            for lig in connexion.execute(requete, lot):
+                if lig[0] not in evenements:
+                    evenements[lig[0]] = {c: lig[i + 1] for i, c in enumerate(colonnes)}
+    except Exception:
+        return {}
+    return evenements
+
+
+def _lire_impacts_lot(connexion, ids):
+    """Comme lire_impacts_evenement, pour plusieurs evenements: {evenement_id: {objet_id: poids}}."""
+    impacts = {}
+    try:
+        avec_probabilite = "probabilite" in noms_colonnes(connexion, "impacts_evenements")
+        champ = ", probabilite" if avec_probabilite else ""
+        for lot in _par_lots(ids):
+            requete = (
+                "SELECT evenement_id, objet_id, poids_final{} FROM impacts_evenements "
+                "WHERE evenement_id IN ({}) ORDER BY rowid"
+            ).format(champ, ",".join(["?"] * len(lot)))
+            for lig in connexion.execute(requete, lot):
+                d = impacts.setdefault(lig[0], {})
+                if avec_probabilite:
+                    poids = _float_robuste(lig[2], 1.0)
+                    probabilite = _float_robuste(lig[3], 1.0)
+                    d[lig[1]] = max(0.0, min(1.0, poids * probabilite))
+                else:
+                    d[lig[1]] = _float_robuste(lig[2], 1.0)
+    except Exception:
+        return {}
+    return impacts
+
+
+def _lire_parametres_lot(connexion, ids):
+    """Comme lire_parametres_evenement, pour plusieurs evenements: {evenement_id: {cle: valeur}}."""
+    parametres = {}
+    try:
+        for lot in _par_lots(ids):
+            requete = (
+                "SELECT evenement_id, cle, valeur FROM parametres_evenements "
+                "WHERE evenement_id IN ({}) ORDER BY evenement_id, ordre ASC, rowid"
+            ).format(",".join(["?"] * len(lot)))
+            for evenement_id, cle, val in connexion.execute(requete, lot):
+                d = parametres.setdefault(evenement_id, {})
+                if cle:
+                    d[str(cle)] = val
+    except Exception:
+        return {}
+    return parametres
+
+
+def _cle_portee(params):
+    """(portee, valeur) d un evenement Ep: meme choix que determiner_impacts_depuis_parametres."""
+    portee = str(params.get("appliquer_portee", "tout") or "tout")
+    if portee == "liste":
+        return ("liste", params.get("appliquer_objets_ids", ""))
+    if portee == "famille":
+        return ("famille", params.get("appliquer_famille", ""))
+    if portee == "type":
+        return ("type", params.get("appliquer_type", ""))
+    return ("tout", None)
 
-        # Appliquer a l etat
-        etat[oid]["prix_moyen"] = max(0.0, etat[oid]["prix_moyen"] * coef_local_prix + delta_prix * poids_total)
-        etat[oid]["prix_min"] = max(0.0, etat[oid]["prix_min"] * coef_local_prix + delta_prix * poids_total)
-        etat[oid]["prix_max"] = max(0.0, etat[oid]["prix_max"] * coef_local_prix + delta_prix * poids_total)
-        etat[oid]["ca"] = max(0.0, etat[oid]["ca"] * coef_local_ca)
+
+def _ids_par_valeur(connexion, colonnes, cle, valeurs):
+    """
+    {valeur: [ids]} pour la colonne famille / type (comme lister_ids_objets_par_famille / _par_type).
+    Une requete IN; si une valeur rendue n est pas exactement une valeur demandee
+    (colonne numerique, collation...), retour aux requetes par valeur.
+    """
+    lister = lister_ids_objets_par_famille if cle == "famille" else lister_ids_objets_par_type
+    valeurs = [v for v in valeurs if v]
+    resultat = {v: [] for v in valeurs}
+    if not valeurs or not colonnes.get(cle):
+        return resultat
+    try:
+        groupes = {v: [] for v in valeurs}
+        for lot in _par_lots(valeurs):
+            requete = "SELECT [{}], [{}] FROM stat_objects WHERE [{}] IN ({}) ORDER BY rowid".format(
+                colonnes[cle], colonnes["id"], colonnes[cle], ",".join(["?"] * len(lot)))
+            for valeur, oid in connexion.execute(requete, lot):
+                if not isinstance(valeur, str) or valeur not in groupes:
+                    raise ValueError(valeur)
+                groupes[valeur].append(oid)
+        return groupes
+    except Exception:
+        for v in valeurs:
+            resultat[v] = lister(connexion, colonnes, v)
+        return resultat
+
+
+def _resoudre_portees(connexion, colonnes, liste_params):
+    """{(portee, valeur): impacts} pour les parametres Ep donnes (quelques requetes en tout)."""
+    cles = {_cle_portee(params) for params in liste_params}
+    familles = _ids_par_valeur(connexion, colonnes, "famille", [v for (p, v) in cles if p == "famille"])
+    types = _ids_par_valeur(connexion, colonnes, "type", [v for (p, v) in cles if p == "type"])
+
+    portees = {}
+    for (portee, valeur) in cles:
+        if portee == "liste":
+            ids = _ids_depuis_chaine(valeur)
+        elif portee == "famille":
+            ids = familles.get(valeur, [])
+        elif portee == "type":
+            ids = types.get(valeur, [])
+        else:
+            ids = _lister_tous_objets(connexion, colonnes)
+        portees[(portee, valeur)] = {oid: 1.0 for oid in ids}
+    return portees
+
+
+def compiler_planning(connexion, colonnes, planning_index, pas_calcules, graphe_e, graphe_o, vecteur=None):
+    """
+    Prepare tous les evenements que la simulation peut appliquer (planifies + actives par liaison),
+    pour que la boucle des annees ne lise plus rien en base.
+    - evenements / impacts / parametres: une requete par table (par lot de TAILLE_LOT_IN ids)
+    - portees Ep (tout / famille / type / liste) resolues une fois: familles / types en une requete IN chacun
+    - propagation reseau calculee d avance; moteur vectoriel: positions / poids d avance
+
+    Retour: dict evenement_id -> {
+      "evenement", "impacts", "propagation", "action", "valeur", "probabilite",
+      "positions", "poids" (moteur vectoriel seulement)
+    }
+    """
+    # Evenements atteignables: ceux des annees reellement calculees + leurs liaisons d activation
+    atteints = {}
+    for pas in pas_calcules:
+        if pas in planning_index:
+            depart = [eid for (eid, _cp, _cc) in planning_index[pas]]
+            atteints.update(dict.fromkeys(calculer_propagation_evenements(connexion, depart, graphe=graphe_e)))
+    ids = list(atteints)
+    if not ids:
+        return {}
+
+    # Ids entiers (colonnes INTEGER): lus en lot; autres (rares): lecteurs unitaires
+    ids_lot = [eid for eid in ids if isinstance(eid, int)]
+    evenements = _lire_evenements_lot(connexion, ids_lot)
+    impacts_lot = _lire_impacts_lot(connexion, ids_lot)
+    parametres_lot = _lire_parametres_lot(connexion, ids_lot)
+
+    lus = {}
+    for eid in ids:
+        if isinstance(eid, int):
+            lus[eid] = (evenements.get(eid), impacts_lot.get(eid, {}), parametres_lot.get(eid, {}))
+        else:
+            lus[eid] = (lire_evenement(connexion, eid), lire_impacts_evenement(connexion, eid),
+                        lire_parametres_evenement(connexion, eid))
+
+    # Portees Ep des evenements sans impacts
+    portees = _resoudre_portees(connexion, colonnes, [params for (_e, impacts, params) in lus.values()
+                                                      if not impacts and params])
+
+    compiles = {}
+    for eid in ids:
+        evt, impacts, params_evt = lus[eid]
+
+        # Si impacts absents, on les deduit des parametres Ep (portee resolue ci-dessus)
+        if not impacts and params_evt:
+            impacts = portees[_cle_portee(params_evt)]
+
+        # Propagation reseau depuis les objets touches (dans impacts_evenements: niveau 0)
+        propagation = calculer_propagation_reseau(connexion, list(impacts.keys()), graphe=graphe_o)
+
+        compile_evt = {
+            "evenement": evt,
+            "impacts": impacts,
+            "propagation": propagation,
+            "action": params_evt.get("action", "coef_evolution") if params_evt else "coef_evolution",
+            "valeur": params_evt.get("valeur", "1.0") if params_evt else "1.0",
+            "probabilite": params_evt.get("probabilite", "1.0") if params_evt else "1.0",
+        }
+        if vecteur is not None:
+            positions, poids = _cibles_vectorielles(vecteur, impacts, propagation)
+            compile_evt["positions"], compile_evt["poids"] = vecteur.cibles(positions, poids)
+        compiles[eid] = compile_evt
+    return compiles
 
 
 # ============================================================
@@ -750,7 +998,9 @@ def executer_simulation(
     ids_projection,
     nb_annees,
     annee_depart,
-    planning_evenements
+    planning_evenements,
+    moteur="auto",
+    annees_sorties=None
 ):
     """
     Execute la simulation deterministe.
@@ -771,6 +1021,13 @@ def executer_simulation(
         - 0.9 => -10%
         - 1.2 => +20%
 
+    - moteur: "auto" (vecteurs NumPy si disponible, sinon dict), "vectoriel" ou "dict"
+      (memes resultats, voir sim_vectoriel.py)
+      "analytique": saute d un evenement a l autre en forme fermee (prix * coef^n, ca * 1.01^n)
+      au lieu de calculer chaque annee: cout proportionnel au nombre d evenements / annees
+      rendues, pas a l horizon (resultats egaux aux arrondis flottants pres)
+    - annees_sorties: annees relatives (0..nb_annees) a rendre; None = toutes
+
     Retour:
     - resultats: dict
         {
@@ -809,6 +1066,11 @@ def executer_simulation(
             "details_objets": {}
         }
 
+    # Moteur vectoriel: un vecteur par grandeur (coefficient annuel calcule une seule fois)
+    vecteur = None
+    if moteur != "dict" and sim_vectoriel.disponible():
+        vecteur = sim_vectoriel.EtatVectoriel(etat, [coefficient_annuel(d) for d in etat.values()])
+
     # Preparer structure de sortie par objet
     details_objets = {}
     for oid, d in etat.items():
@@ -828,58 +1090,84 @@ def executer_simulation(
         # Une annee peut avoir plusieurs evenements
         planning_index.setdefault(ar, []).append((eid, _float_robuste(cp, 1.0), _float_robuste(cc, 1.0)))
 
+    # Annees rendues / annees calculees
+    if annees_sorties is None:
+        sorties = set(range(0, nb_annees + 1))
+    else:
+        sorties = {p for p in (_int_robuste(a, -1) for a in annees_sorties) if 0 <= p <= nb_annees}
+    if moteur == "analytique":
+        # Seulement les annees avec evenements ou rendues (croissance en forme fermee entre les deux)
+        pas_calcules = sorted(sorties | {p for p in planning_index if 0 <= p <= nb_annees})
+    else:
+        pas_calcules = range(0, nb_annees + 1)
+
+    # Graphes des liaisons: lus une fois pour toute la simulation (aucune requete par noeud du BFS)
+    graphe_e = graphe_liaisons.graphe(connexion, "E") if planning_index else None
+    graphe_o = graphe_liaisons.graphe(connexion, "O") if planning_index else None
+
+    # Evenements, impacts, parametres, portees et propagations lus avant la boucle (aucune I/O ensuite)
+    evenements_compiles = compiler_planning(
+        connexion, colonnes, planning_index, pas_calcules, graphe_e, graphe_o, vecteur) if planning_index else {}
+    if planning_index:
+        # Propagations calculees: enregistrees pour les simulations suivantes (meme version des liaisons)
+        graphe_liaisons.sauver_propagations(connexion)
+
     # Sorties globales
     annees = []
     prix_moyen_total = []
     ca_total = []
 
     # Boucle annees
-    for pas in range(0, nb_annees + 1):
+    pas_precedent = 0
+    for pas in pas_calcules:
         annee = annee_depart + pas
+        ecart = pas - pas_precedent
+        pas_precedent = pas
 
         # 1) appliquer croissance annuelle (sauf a pas=0, on veut l etat "initial")
-        if pas > 0:
-            for oid in etat.keys():
-                appliquer_croissance_annuelle(etat[oid])
+        if ecart > 0:
+            if vecteur is not None:
+                vecteur.croissance(TAUX_CA_DEFAUT, ecart)
+            else:
+                for oid in etat.keys():
+                    appliquer_croissance_annuelle(etat[oid], ecart)
 
         # 2) appliquer evenements prevus cette annee (avec liaisons d activation)
         if pas in planning_index:
-            evenements_a_appliquer = etendre_evenements_lies(connexion, planning_index[pas])
+            evenements_a_appliquer = etendre_evenements_lies(connexion, planning_index[pas], graphe_e)
             for (eid, coef_prix, coef_ca) in evenements_a_appliquer:
-                evt = lire_evenement(connexion, eid)
-                impacts = lire_impacts_evenement(connexion, eid)
-                params_evt = lire_parametres_evenement(connexion, eid)
-
-                # Si impacts absents, on tente de les deduire des parametres Ep
-                if not impacts:
-                    impacts = determiner_impacts_depuis_parametres(connexion, colonnes, params_evt)
-
-                # Parametres Ep utiles
-                action_param = params_evt.get("action", "coef_evolution") if params_evt else "coef_evolution"
-                valeur_param = params_evt.get("valeur", "1.0") if params_evt else "1.0"
-                probabilite_evt = params_evt.get("probabilite", "1.0") if params_evt else "1.0"
-
-                # Si l utilisateur a lie l evenement a une selection, on propage depuis les "objets touches"
-                # Dans impacts_evenements, les objets niveau 0 sont deja dedans, mais on veut aussi tenir compte du reseau
-                objets_depart = list(impacts.keys())
-                propagation = calculer_propagation_reseau(connexion, objets_depart)
+                evt = evenements_compiles[eid]
+                if vecteur is not None:
+                    if not evt["evenement"] or not evt["impacts"]:
+                        continue
+                    coef_prix_action, coef_ca_action, delta_prix, prob_evt = _coefficients_action(
+                        coef_prix, coef_ca, evt["action"], evt["valeur"], evt["probabilite"])
+                    vecteur.appliquer_evenement(evt["positions"], evt["poids"],
+                                                coef_prix_action, coef_ca_action, delta_prix, prob_evt)
+                    continue
 
                 # Appliquer evenement parametrie (Ep)
                 appliquer_evenement_parametrique(
-                    etat=etat,
-                    evenement=evt,
-                    impacts=impacts,
-                    propagation=propagation,
+                    etat,
+                    evenement=evt["evenement"],
+                    impacts=evt["impacts"],
+                    propagation=evt["propagation"],
                     coef_prix=coef_prix,
                     coef_ca=coef_ca,
-                    action_param=action_param,
-                    valeur_param=valeur_param,
-                    probabilite_evt=probabilite_evt
+                    action_param=evt["action"],
+                    valeur_param=evt["valeur"],
+                    probabilite_evt=evt["probabilite"]
                 )
 
         # 3) enregistrer courbes
+        if pas not in sorties:
+            continue
         annees.append(annee)
 
+        if vecteur is not None:
+            vecteur.enregistrer()
+            continue
+
         total_prix = 0.0
         total_ca = 0.0
         for oid, d in etat.items():
@@ -894,6 +1182,9 @@ def executer_simulation(
         prix_moyen_total.append(round(total_prix, 2))
         ca_total.append(round(total_ca, 2))
 
+    if vecteur is not None:
+        return vecteur.resultats(annees)
+
     return {
         "annees": annees,
         "prix_moyen_total": prix_moyen_total,
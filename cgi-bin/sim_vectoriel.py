@@ -0,0 +1,156 @@
+# sim_vectoriel.py
+# Etat de simulation en vecteurs NumPy (moteur rapide de sim_calc.executer_simulation)
+#
+# But:
+# - Avant: un dict par objet, et chaque annee appliquer_croissance_annuelle() par objet
+#   (conversions texte -> float, facteurs speculation / utilisation recalcules)
+# - Maintenant: prix moyen / min / max, CA et coefficient annuel = un vecteur chacun
+#   * une annee = une operation sur tout le vecteur (n annees sans evenement: une seule, coef^n)
+#   * un evenement = une operation sur les positions des objets touches
+#
+# Utilisation (par sim_calc uniquement):
+#   if sim_vectoriel.disponible():
+#       vec = sim_vectoriel.EtatVectoriel(etat, coefficients)
+#       vec.croissance() / vec.appliquer_evenement(...) / vec.enregistrer()
+#       vec.resultats(annees)
+#
+# IMPORTANT:
+# - NumPy est optionnel: sans lui, sim_calc garde le moteur par dict (memes resultats)
+# - Memes operations flottantes, dans le meme ordre, que le moteur par dict:
+#   resultats identiques (totaux additionnes dans l'ordre des objets, comme la boucle Python)
+# - numpy n'est importe qu'au premier etat cree (pages sans simulation: aucun cout)
+
+import importlib.util
+
+from import_differe import differer
+
+
+numpy = differer("numpy") if importlib.util.find_spec("numpy") is not None else None
+
+
+def disponible():
+    return numpy is not None
+
+
+def _positif(valeurs):
+    # fmax (et non maximum): max(0.0, nan) vaut 0.0 en Python, fmax(0.0, nan) aussi
+    return numpy.fmax(0.0, valeurs)
+
+
+def somme_ordonnee(valeurs):
+    """Somme de gauche a droite (comme total += v): cumsum, et non sum (somme par paires)."""
+    if len(valeurs) == 0:
+        return 0.0
+    return float(numpy.cumsum(valeurs)[-1])
+
+
+def arrondir_2(valeurs):
+    """
+    round(v, 2) de Python pour tout un tableau (meme resultat, valeur par valeur).
+    rint(v * 100) / 100 est exact sauf quand v * 100 tombe (presque) sur un demi:
+    ces cas douteux (rares) repassent par round().
+    """
+    with numpy.errstate(over="ignore", invalid="ignore"):
+        cent = valeurs * 100.0
+        resultat = numpy.rint(cent) / 100.0
+        douteux = ~numpy.isfinite(cent) | (
+            numpy.abs(cent - numpy.floor(cent) - 0.5) <= 4.0 * numpy.spacing(numpy.abs(cent)))
+    for position in zip(*numpy.nonzero(douteux)):
+        resultat[position] = round(float(valeurs[position]), 2)
+    return resultat
+
+
+class EtatVectoriel:
+    """
+    Etat de tous les objets projetes, en vecteurs (ordre = ordre de 'etat').
+    position[objet_id] -> indice dans les vecteurs.
+    """
+
+    def __init__(self, etat, coefficients):
+        self.ids = list(etat.keys())
+        self.noms = [etat[oid].get("nom", "") for oid in self.ids]
+        self.position = {oid: i for i, oid in enumerate(self.ids)}
+
+        def vecteur(cle):
+            return numpy.array([etat[oid][cle] for oid in self.ids], dtype=numpy.float64)
+
+        self.prix_moyen = vecteur("prix_moyen")
+        self.prix_min = vecteur("prix_min")
+        self.prix_max = vecteur("prix_max")
+        self.ca = vecteur("ca")
+        self.coef = numpy.array(coefficients, dtype=numpy.float64)
+
+        # Courbes enregistrees (une ligne par annee)
+        self.prix_annees = []
+        self.ca_annees = []
+        self.prix_moyen_total = []
+        self.ca_total = []
+
+    def croissance(self, taux_ca, nb_annees=1):
+        """
+        nb_annees de croissance pour tous les objets (appliquer_croissance_annuelle).
+        nb_annees > 1: forme fermee (coef^n), sans passer par les annees intermediaires.
+        """
+        if nb_annees == 1:
+            coef = self.coef
+            facteur_ca = 1.0 + taux_ca
+        else:
+            coef = self.coef ** nb_annees
+            facteur_ca = (1.0 + taux_ca) ** nb_annees
+        self.prix_moyen = _positif(self.prix_moyen * coef)
+        self.prix_min = _positif(self.prix_min * coef)
+        self.prix_max = _positif(self.prix_max * coef)
+        self.ca = _positif(self.ca * facteur_ca)
+
+    def cibles(self, positions, poids):
+        """Positions / poids en tableaux NumPy, prets pour appliquer_evenement (planning compile)."""
+        return numpy.array(positions, dtype=numpy.intp), numpy.array(poids, dtype=numpy.float64)
+
+    def appliquer_evenement(self, positions, poids, coef_prix, coef_ca, delta_prix, probabilite):
+        """
+        Evenement sur les objets 'positions' (poids = poids impact * poids reseau),
+        memes formules que appliquer_evenement_parametrique.
+        positions / poids: listes, ou tableaux deja prepares par cibles()
+        """
+        if len(positions) == 0:
+            return
+        idx = numpy.asarray(positions, dtype=numpy.intp)
+        poids_total = numpy.clip(numpy.asarray(poids, dtype=numpy.float64) * probabilite, 0.0, 1.0)
+
+        coef_local_prix = 1.0 + (coef_prix - 1.0) * poids_total
+        coef_local_ca = 1.0 + (coef_ca - 1.0) * poids_total
+        decalage = delta_prix * poids_total
+
+        self.prix_moyen[idx] = _positif(self.prix_moyen[idx] * coef_local_prix + decalage)
+        self.prix_min[idx] = _positif(self.prix_min[idx] * coef_local_prix + decalage)
+        self.prix_max[idx] = _positif(self.prix_max[idx] * coef_local_prix + decalage)
+        self.ca[idx] = _positif(self.ca[idx] * coef_local_ca)
+
+    def enregistrer(self):
+        """Note l'annee en cours (prix moyen et CA de chaque objet + totaux)."""
+        self.prix_annees.append(self.prix_moyen.copy())
+        self.ca_annees.append(self.ca.copy())
+        self.prix_moyen_total.append(round(somme_ordonnee(self.prix_moyen), 2))
+        self.ca_total.append(round(somme_ordonnee(self.ca), 2))
+
+    def resultats(self, annees):
+        """Meme structure que executer_simulation (details_objets: [(annee, valeur arrondie)])."""
+        details_objets = {}
+        if self.ids and annees:
+            prix = arrondir_2(numpy.vstack(self.prix_annees).T).tolist()
+            ca = arrondir_2(numpy.vstack(self.ca_annees).T).tolist()
+            for i, oid in enumerate(self.ids):
+                details_objets[oid] = {
+                    "nom": self.noms[i],
+                    "prix": list(zip(annees, prix[i])),
+                    "ca": list(zip(annees, ca[i])),
+                }
+        else:
+            for i, oid in enumerate(self.ids):
+                details_objets[oid] = {"nom": self.noms[i], "prix": [], "ca": []}
+        return {
+            "annees": list(annees),
+            "prix_moyen_total": list(self.prix_moyen_total),
+            "ca_total": list(self.ca_total),
+            "details_objets": details_objets
+        }
@@ -0,0 +1,248 @@
+# trace_sql.py
+# Trace des requetes SQL des pages (optionnelle), dans un fichier JSON lines
+#
+# Activation (variables d'environnement, lues au demarrage):
+#   TRACE_SQL=/tmp/trace_sql.jsonl      -> fichier de trace (vide / absente = pas de trace)
+#   TRACE_SQL_SEUIL_MS=50               -> requete "lente" au-dela de ce temps
+#   TRACE_SQL_N_PLUS_1=10               -> meme requete repetee au moins N fois dans une page = N+1
+#
+# Exemple:
+#   TRACE_SQL=/tmp/trace.jsonl python serveur.py --mode interne
+#
+# Contenu du fichier (une ligne JSON par objet):
+# - {"type": "requete", ...}: page, base, sql (texte avec ?), params (types seulement, pas les valeurs),
+#   duree_ms (execution + lecture des lignes), lignes (rendues), vm (pas de la machine SQLite / 1000),
+#   lent (au-dela du seuil), appelant (fonctions python qui ont lance la requete)
+# - {"type": "page", ...}: resume de la page: nb de requetes, d'instructions (BEGIN / COMMIT compris),
+#   temps SQL total, requetes lentes, motifs N+1 (meme requete repetee, ex: un nom lu par noeud)
+#
+# IMPORTANT:
+# - Branche par acces_bdd sur toutes les connexions (curseurs traces, set_trace_callback,
+#   set_progress_handler). Sans TRACE_SQL, rien n'est branche (aucun cout).
+# - Mode cgi: le resume est ecrit a la sortie du processus ; serveur interne / workers: a la fin de page
+
+import os
+import sys
+import json
+import time
+import atexit
+import sqlite3
+import threading
+import collections
+
+
+FICHIER = os.environ.get("TRACE_SQL", "")
+SEUIL_MS = float(os.environ.get("TRACE_SQL_SEUIL_MS", "50") or 50)
+SEUIL_N_PLUS_1 = int(os.environ.get("TRACE_SQL_N_PLUS_1", "10") or 10)
+
+PAS_PROGRESSION = 1000  # set_progress_handler: appel tous les 1000 pas de la machine SQLite
+FICHIERS_IGNORES = ("acces_bdd.py", "trace_sql.py")
+
+_local = threading.local()
+_verrou_fichier = threading.Lock()
+_atexit_installe = False
+
+
+def actif():
+    return bool(FICHIER)
+
+
+# ============================================================
+# Etat de la page en cours (par thread)
+# ============================================================
+
+def _page():
+    page = getattr(_local, "page", None)
+    if page is None:
+        global _atexit_installe
+        page = _local.page = {
+            "page": os.environ.get("SCRIPT_NAME", "") or os.path.basename(sys.argv[0] or ""),
+            "query": os.environ.get("QUERY_STRING", ""),
+            "debut": time.time(),
+            "requetes": [],
+            "instructions": 0,
+        }
+        if not _atexit_installe:
+            # Mode cgi: pas de fin_de_page(), on ecrit a la sortie du processus
+            _atexit_installe = True
+            atexit.register(fin_de_page)
+    return page
+
+
+def _appelant():
+    """'fichier:fonction:ligne' des 3 premiers appelants hors acces_bdd / trace_sql."""
+    chaine = []
+    cadre = sys._getframe(2)
+    while cadre is not None and len(chaine) < 3:
+        fichier = os.path.basename(cadre.f_code.co_filename)
+        if fichier not in FICHIERS_IGNORES:
+            chaine.append("{}:{}:{}".format(fichier, cadre.f_code.co_name, cadre.f_lineno))
+        cadre = cadre.f_back
+    return " < ".join(chaine)
+
+
+def _forme_params(params):
+    """Types des parametres (jamais les valeurs): ['int', 'str'] ou {'nom': 'float'}."""
+    if params is None:
+        return []
+    if isinstance(params, dict):
+        return {cle: type(v).__name__ for cle, v in params.items()}
+    try:
+        types = [type(v).__name__ for v in params]
+    except TypeError:
+        return type(params).__name__
+    # Longues listes IN (?, ?, ...): resume
+    if len(types) > 8:
+        return {"nb": len(types), "types": sorted(set(types))}
+    return types
+
+
+# ============================================================
+# Branchements sur la connexion / curseur
+# ============================================================
+
+def instruction(_sql):
+    """set_trace_callback: chaque instruction executee (BEGIN / COMMIT / PRAGMA compris)."""
+    _page()["instructions"] += 1
+
+
+def progression():
+    """set_progress_handler: pas de la machine SQLite, attribues a la requete en cours."""
+    entree = getattr(_local, "courante", None)
+    if entree is not None:
+        entree["vm"] += 1
+    return 0  # 0 = continuer
+
+
+def brancher(connexion):
+    connexion.set_progress_handler(progression, PAS_PROGRESSION)
+
+
+class CurseurTrace(sqlite3.Cursor):
+    """Curseur qui mesure chaque requete (duree d'execution + lecture, lignes rendues)."""
+
+    _entree = None
+
+    def _debut(self, sql, params):
+        entree = {
+            "base": os.path.basename(getattr(self.connection, "chemin", "") or ""),
+            "sql": " ".join(str(sql).split()),
+            "params": _forme_params(params),
+            "duree_ms": 0.0,
+            "lignes": 0,
+            "vm": 0,
+            "appelant": _appelant(),
+        }
+        _page()["requetes"].append(entree)
+        self._entree = entree
+        _local.courante = entree
+        return entree
+
+    def _mesurer(self, entree, fonction, *args):
+        precedente = getattr(_local, "courante", None)
+        _local.courante = entree
+        debut = time.perf_counter()
+        try:
+            return fonction(*args)
+        finally:
+            if entree is not None:
+                entree["duree_ms"] += (time.perf_counter() - debut) * 1000.0
+            _local.courante = precedente
+
+    def execute(self, sql, params=()):
+        entree = self._debut(sql, params)
+        return self._mesurer(entree, sqlite3.Cursor.execute, self, sql, params)
+
+    def executemany(self, sql, suite):
+        suite = list(suite)
+        entree = self._debut(sql, suite[0] if suite else ())
+        entree["nb_lots"] = len(suite)
+        return self._mesurer(entree, sqlite3.Cursor.executemany, self, sql, suite)
+
+    def fetchone(self):
+        ligne = self._mesurer(self._entree, sqlite3.Cursor.fetchone, self)
+        if ligne is not None and self._entree is not None:
+            self._entree["lignes"] += 1
+        return ligne
+
+    def fetchmany(self, size=None):
+        args = () if size is None else (size,)
+        lignes = self._mesurer(self._entree, sqlite3.Cursor.fetchmany, self, *args)
+        if self._entree is not None:
+            self._entree["lignes"] += len(lignes)
+        return lignes
+
+    def fetchall(self):
+        lignes = self._mesurer(self._entree, sqlite3.Cursor.fetchall, self)
+        if self._entree is not None:
+            self._entree["lignes"] += len(lignes)
+        return lignes
+
+    def __next__(self):
+        ligne = self._mesurer(self._entree, sqlite3.Cursor.__next__, self)
+        if self._entree is not None:
+            self._entree["lignes"] += 1
+        return ligne
+
+
+# ============================================================
+# Fin de page: ecriture du fichier
+# ============================================================
+
+def _motifs_n_plus_1(requetes):
+    """Requetes parametrees identiques repetees >= SEUIL_N_PLUS_1 fois dans la page."""
+    groupes = collections.OrderedDict()
+    for r in requetes:
+        if r["params"]:
+            groupes.setdefault(r["sql"], []).append(r)
+    motifs = []
+    for sql, liste in groupes.items():
+        if len(liste) < SEUIL_N_PLUS_1:
+            continue
+        appelants = collections.Counter(r["appelant"] for r in liste)
+        motifs.append({
+            "sql": sql,
+            "nb": len(liste),
+            "duree_ms": round(sum(r["duree_ms"] for r in liste), 3),
+            "appelants": [{"appelant": a, "nb": n} for a, n in appelants.most_common(3)],
+        })
+    motifs.sort(key=lambda m: -m["nb"])
+    return motifs
+
+
+def fin_de_page():
+    """Ecrit les requetes + le resume de la page en cours, puis remet l'etat a zero."""
+    page = getattr(_local, "page", None)
+    _local.page = None
+    _local.courante = None
+    if page is None or not FICHIER:
+        return
+
+    lignes = []
+    for r in page["requetes"]:
+        r["duree_ms"] = round(r["duree_ms"], 3)
+        r["lent"] = r["duree_ms"] >= SEUIL_MS
+        lignes.append(dict(r, type="requete", page=page["page"]))
+
+    requetes = page["requetes"]
+    lignes.append({
+        "type": "page",
+        "page": page["page"],
+        "query": page["query"],
+        "debut": round(page["debut"], 3),
+        "nb_requetes": len(requetes),
+        "nb_instructions": page["instructions"],
+        "duree_sql_ms": round(sum(r["duree_ms"] for r in requetes), 3),
+        "lignes": sum(r["lignes"] for r in requetes),
+        "lentes": [{"sql": r["sql"], "duree_ms": r["duree_ms"], "appelant": r["appelant"]}
+                   for r in requetes if r["lent"]],
+        "n_plus_1": _motifs_n_plus_1(requetes),
+    })
+
+    texte = "".join(json.dumps(l, ensure_ascii=False) + "\n" for l in lignes)
+    with _verrou_fichier:
+        try:
+            with open(FICHIER, "a", encoding="utf-8") as f:
+                f.write(texte)
+        except OSError as e:
+            sys.stderr.write("Trace SQL impossible ({}): {}\n".format(FICHIER, e))
@@ -2,10 +2,11 @@
 # -*- coding: utf-8 -*-
 
 import os
-import sqlite3
 import urllib.parse
 import html
 
+from acces_bdd import connecter
+
 # ---------------------------------
 # CGI: en-tete HTTP obligatoire
 # ---------------------------------
@@ -72,7 +73,7 @@ def check_stat_objects_table(universe_id):
         return False, "Le fichier de l'univers n'existe pas : %s" % upath
 
     try:
-        conn = sqlite3.connect(upath)
+        conn = connecter(upath, lecture_seule=True)
         cur = conn.cursor()
 
         cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='stat_objects'")
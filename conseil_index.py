@@ -0,0 +1,273 @@
+# conseil_index.py
+# Conseil d'index: SQL reellement execute par les pages -> EXPLAIN QUERY PLAN -> index manquants
+#
+# Objectif:
+# - Executer les pages (comme le serveur en mode interne) en notant chaque requete SQL
+# - Pour chaque SELECT: plan actuel (parcours complet ? tri temporaire ?) et plan obtenu
+#   avec les index candidats de migrations.INDEX_OBJETS (Famille, Type, Speculation, id, tris...)
+# - Conseiller les index que SQLite utiliserait vraiment, et les creer sur demande
+#
+# Utilisation (depuis la racine du serveur):
+#   python conseil_index.py                        -> pages par defaut (objets.db + chaque univers)
+#   python conseil_index.py "/cgi-bin/sim.py?uid=123&action=simuler&famille=Textile"
+#   python conseil_index.py --appliquer            -> cree les index conseilles
+#   python conseil_index.py --appliquer --toutes   -> cree tous les index candidats (objets.db compris)
+#   python conseil_index.py --json
+#
+# IMPORTANT:
+# - Les pages sont vraiment executees (requetes GET): a lancer sur une copie si besoin
+# - Les nouveaux univers recoivent ces index a leur creation (migration 3 de migrations.py)
+# - Les pages qui lisent l'instantane de Prix_Objets (catalogue.py) ne font plus de SQL filtre:
+#   pour objets.db, --toutes cree quand meme les index (copies, outils, requetes futures)
+
+import os
+import re
+import json
+import sqlite3
+import pathlib
+import argparse
+
+import serveur_pages
+
+
+DOSSIER_CGI = "cgi-bin"
+DOSSIER_UNIVERS = os.path.join(DOSSIER_CGI, "universes")
+CHEMIN_OBJETS = os.path.join(DOSSIER_CGI, "objets.db")
+
+# Pages qui lisent les tables d'objets ({uid} = chaque univers)
+PAGES_DEFAUT = [
+    "/cgi-bin/index.py",
+    "/cgi-bin/calculs_classements.py?type=top&critere=prix",
+    "/cgi-bin/calculs_classements.py?type=flop&critere=ca&filtre_mode=famille&filtre_valeur=Textile",
+    "/cgi-bin/filtre_simple.py?famille=Textile&prix_max=100",
+    "/cgi-bin/recherche_populaire.py?choix=cher",
+    "/cgi-bin/objet.py?nom=Drapeau%20danois%20(2x1.5m)",
+    "/cgi-bin/recherche.py?q=drapeau",
+    "/cgi-bin/univers_dashboard.py?uid={uid}",
+    "/cgi-bin/liste_objets.py?uid={uid}",
+    "/cgi-bin/personnalisation_objet.py?uid={uid}&action=search&search=drap",
+    "/cgi-bin/liaison.py?uid={uid}",
+    "/cgi-bin/evenement.py?uid={uid}",
+    "/cgi-bin/sim.py?uid={uid}",
+    "/cgi-bin/sim.py?uid={uid}&action=simuler&famille=Textile&nb_annees=10",
+    "/cgi-bin/sim.py?uid={uid}&action=simuler&type=Arme&nb_annees=10",
+    "/cgi-bin/sim.py?uid={uid}&action=simuler&selection_ids=1,2,3,4,5&nb_annees=10",
+]
+
+# Litteraux remplaces par ? pour regrouper les requetes identiques
+MOTIF_TEXTE = re.compile(r"'(?:[^']|'')*'")
+MOTIF_NOMBRE = re.compile(r"(?<![\w\]\"])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE)
+MOTIF_LISTE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def normaliser(sql):
+    sql = " ".join(sql.split())
+    sql = MOTIF_TEXTE.sub("?", sql)
+    sql = MOTIF_NOMBRE.sub("?", sql)
+    return MOTIF_LISTE.sub("(...)", sql)
+
+
+def uids_univers():
+    if not os.path.isdir(DOSSIER_UNIVERS):
+        return []
+    return sorted(nom[len("universe_"):-len(".db")] for nom in os.listdir(DOSSIER_UNIVERS)
+                  if nom.startswith("universe_") and nom.endswith(".db"))
+
+
+def urls_defaut():
+    urls = []
+    for url in PAGES_DEFAUT:
+        if "{uid}" in url:
+            urls += [url.format(uid=uid) for uid in uids_univers()]
+        else:
+            urls.append(url)
+    return urls
+
+
+# ============================================================
+# Collecte du SQL des pages
+# ============================================================
+
+def collecter(urls):
+    """
+    Execute les pages et note les requetes.
+    Retour: {chemin base: {sql normalise: {"exemple": sql, "nb": n, "pages": set}}}
+    """
+    serveur_pages.installer_aiguillages()
+    import acces_bdd  # meme module que celui des pages (cgi-bin dans sys.path)
+
+    requetes = {}
+    page_courante = [""]
+
+    def noter(chemin, sql):
+        entree = requetes.setdefault(chemin, {}).setdefault(
+            normaliser(sql), {"exemple": sql, "nb": 0, "pages": set()})
+        entree["nb"] += 1
+        entree["pages"].add(page_courante[0])
+
+    acces_bdd.observer_requetes(noter)
+    try:
+        for url in urls:
+            chemin, _, query = url.partition("?")
+            page_courante[0] = chemin.rsplit("/", 1)[-1]
+            environ = dict(os.environ)
+            environ.update({
+                "REQUEST_METHOD": "GET",
+                "QUERY_STRING": query,
+                "SCRIPT_NAME": chemin,
+                "GATEWAY_INTERFACE": "CGI/1.1",
+            })
+            serveur_pages.executer_script(chemin.lstrip("/"), environ)
+    finally:
+        acces_bdd.observer_requetes(None)
+    return requetes
+
+
+# ============================================================
+# Analyse: EXPLAIN QUERY PLAN avant / apres index candidats
+# ============================================================
+
+def _est_lecture(sql):
+    debut = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+    return debut in ("SELECT", "WITH") and "sqlite_master" not in sql
+
+
+def _plan(connexion, sql):
+    try:
+        return [ligne[3] for ligne in connexion.execute("EXPLAIN QUERY PLAN " + sql)]
+    except sqlite3.Error as e:
+        return ["(erreur: {})".format(e)]
+
+
+def _defaut(plan):
+    """Parcours complet de table ou tri temporaire dans un plan."""
+    for detail in plan:
+        if detail.startswith("SCAN ") and " USING " not in detail:
+            return True
+        if "USE TEMP B-TREE" in detail:
+            return True
+    return False
+
+
+def candidats(connexion):
+    """Index candidats manquants pour chaque table de la base: {nom: sql}."""
+    import migrations
+    cur = connexion.cursor()
+    tables = [r[0] for r in cur.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
+    resultat = {}
+    for table in tables:
+        resultat.update(dict(migrations.index_objets(cur, table)))
+    return resultat
+
+
+def _uri_lecture(chemin):
+    return pathlib.Path(os.path.abspath(chemin)).as_uri() + "?mode=ro"
+
+
+def analyser(chemin, requetes):
+    """Rapport pour une base: requetes lues, plans avant / apres, index conseilles."""
+    reelle = sqlite3.connect(_uri_lecture(chemin), uri=True)
+    index_candidats = candidats(reelle)
+
+    # Meme schema, en memoire, avec tous les candidats (EXPLAIN ne regarde que le schema)
+    essai = sqlite3.connect(":memory:")
+    for (sql,) in reelle.execute(
+            "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+            "ORDER BY type = 'index'"):
+        essai.execute(sql)
+    for sql in index_candidats.values():
+        essai.execute(sql)
+
+    lignes = []
+    conseilles = set()
+    for cle, info in sorted(requetes.items(), key=lambda e: -e[1]["nb"]):
+        if not _est_lecture(info["exemple"]):
+            continue
+        avant = _plan(reelle, info["exemple"])
+        apres = _plan(essai, info["exemple"])
+        utilises = sorted(nom for nom in index_candidats if any(nom in d for d in apres))
+        if _defaut(avant) and utilises:
+            conseilles.update(utilises)
+        lignes.append({
+            "sql": cle,
+            "nb": info["nb"],
+            "pages": sorted(info["pages"]),
+            "plan": avant,
+            "plan_avec_index": apres if utilises else [],
+            "index": utilises,
+        })
+    reelle.close()
+    essai.close()
+    return {
+        "base": chemin,
+        "requetes": lignes,
+        "conseilles": {nom: index_candidats[nom] for nom in sorted(conseilles)},
+        "candidats": index_candidats,
+    }
+
+
+def appliquer(chemin, sqls):
+    connexion = sqlite3.connect(chemin, timeout=30)
+    try:
+        for sql in sqls:
+            connexion.execute(sql)
+        connexion.execute("ANALYZE")
+        connexion.commit()
+    finally:
+        connexion.close()
+
+
+# ============================================================
+# Sortie
+# ============================================================
+
+def afficher(rapports):
+    for r in rapports:
+        print("=" * 70)
+        print(r["base"])
+        for q in r["requetes"]:
+            marque = "!!" if _defaut(q["plan"]) else "ok"
+            print("  [{}] x{:<4} {}".format(marque, q["nb"], q["sql"][:110]))
+            print("         pages: {}".format(", ".join(q["pages"])))
+            for d in q["plan"]:
+                print("         avant: {}".format(d))
+            for d in q["plan_avec_index"]:
+                print("         apres: {}".format(d))
+        print("  Index conseilles: {}".format(", ".join(r["conseilles"]) or "aucun"))
+        for sql in r["conseilles"].values():
+            print("    {};".format(sql))
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conseil d'index (EXPLAIN QUERY PLAN du SQL des pages)")
+    parser.add_argument("urls", nargs="*", help="ex: /cgi-bin/sim.py?uid=123 (defaut: pages usuelles)")
+    parser.add_argument("--appliquer", action="store_true", help="cree les index conseilles")
+    parser.add_argument("--toutes", action="store_true",
+                        help="avec --appliquer: cree tous les index candidats (objets.db + univers)")
+    parser.add_argument("--json", action="store_true", help="sortie JSON")
+    options = parser.parse_args()
+
+    # Sortie des pages ignoree (tampon de serveur_pages): seules les requetes comptent
+    requetes = collecter(options.urls or urls_defaut())
+
+    rapports = [analyser(chemin, requetes[chemin]) for chemin in sorted(requetes)]
+    if options.toutes:
+        for chemin in [os.path.abspath(CHEMIN_OBJETS)] + [
+                os.path.abspath(os.path.join(DOSSIER_UNIVERS, "universe_{}.db".format(uid)))
+                for uid in uids_univers()]:
+            if os.path.exists(chemin) and chemin not in requetes:
+                rapports.append(analyser(chemin, {}))
+
+    if options.json:
+        print(json.dumps(rapports, indent=2, ensure_ascii=False))
+    else:
+        afficher(rapports)
+
+    if options.appliquer:
+        for r in rapports:
+            sqls = list((r["candidats"] if options.toutes else r["conseilles"]).values())
+            if sqls:
+                appliquer(r["base"], sqls)
+                print("{}: {} index crees".format(r["base"], len(sqls)))
@@ -0,0 +1,139 @@
+# profil_demarrage.py
+# Profil du demarrage des pages CGI: temps d'import module par module, par script
+#
+# Objectif:
+# - En mode cgi, chaque page relance un interpreteur python: le demarrage compte
+# - Pour chaque script: temps total (mediane sur N lancements), temps passe dans les imports,
+#   et les modules les plus couteux (python -X importtime)
+#
+# Utilisation (depuis la racine du serveur):
+#   python profil_demarrage.py                          -> tous les scripts de cgi-bin, sans parametre
+#   python profil_demarrage.py "/cgi-bin/recherche.py?q=velo" "/cgi-bin/sim.py?uid=123"
+#   python profil_demarrage.py --json > profil.json
+#
+# IMPORTANT:
+# - Les scripts sont vraiment executes (comme une requete GET): a lancer sur une copie
+#   si on ne veut pas toucher aux bases
+# - Les temps de -X importtime sont en microsecondes, "cumule" = module + ses propres imports
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import urllib.parse
+
+
+DOSSIER_CGI = "cgi-bin"
+
+# Ligne de -X importtime: "import time:  self [us] | cumulative | imported package"
+MOTIF_IMPORTTIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def scripts_pages():
+    """Scripts de cgi-bin qui sont des pages (ils ecrivent un en-tete Content-Type)."""
+    urls = []
+    for nom in sorted(os.listdir(DOSSIER_CGI)):
+        if not nom.endswith(".py"):
+            continue
+        with open(os.path.join(DOSSIER_CGI, nom), encoding="utf-8", errors="replace") as f:
+            if "content-type" in f.read().lower():
+                urls.append("/{}/{}".format(DOSSIER_CGI, nom))
+    return urls
+
+
+def lire_importtime(sortie_erreur):
+    """
+    Analyse la sortie de -X importtime.
+    Retour: liste de dicts {module, propre_us, cumule_us, niveau}
+    """
+    modules = []
+    for ligne in sortie_erreur.splitlines():
+        m = MOTIF_IMPORTTIME.match(ligne)
+        if m:
+            modules.append({
+                "module": m.group(4),
+                "propre_us": int(m.group(1)),
+                "cumule_us": int(m.group(2)),
+                # Indentation de 2 espaces par niveau (1 espace de separation)
+                "niveau": (len(m.group(3)) - 1) // 2,
+            })
+    return modules
+
+
+def lancer(url, importtime=False):
+    """Execute une page comme une requete GET. Retour: (duree_s, stderr)."""
+    chemin, _, query = url.partition("?")
+    script = chemin.lstrip("/")
+    env = dict(os.environ)
+    env.update({
+        "REQUEST_METHOD": "GET",
+        "QUERY_STRING": query,
+        "SCRIPT_NAME": chemin,
+        "GATEWAY_INTERFACE": "CGI/1.1",
+    })
+    commande = [sys.executable]
+    if importtime:
+        commande += ["-X", "importtime"]
+    commande.append(script)
+
+    debut = time.perf_counter()
+    p = subprocess.run(commande, env=env, stdin=subprocess.DEVNULL,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    return time.perf_counter() - debut, p.stderr.decode("utf-8", errors="replace")
+
+
+def profiler(url, repetitions=5, nb_modules=10):
+    """Profil d'une page: duree mediane, temps d'import et modules les plus lents."""
+    durees = [lancer(url)[0] for _ in range(repetitions)]
+    _duree, erreurs = lancer(url, importtime=True)
+    modules = lire_importtime(erreurs)
+
+    # Imports de premier niveau = ce que le script (et le demarrage de python) importe directement
+    premier_niveau = [m for m in modules if m["niveau"] == 0]
+    total_imports = sum(m["cumule_us"] for m in premier_niveau)
+
+    plus_lents = sorted(premier_niveau, key=lambda m: m["cumule_us"], reverse=True)[:nb_modules]
+    return {
+        "url": url,
+        "duree_mediane_ms": round(statistics.median(durees) * 1000, 2),
+        "duree_min_ms": round(min(durees) * 1000, 2),
+        "imports_ms": round(total_imports / 1000, 2),
+        "nb_modules": len(modules),
+        "modules": [
+            {"module": m["module"], "cumule_ms": round(m["cumule_us"] / 1000, 2),
+             "propre_ms": round(m["propre_us"] / 1000, 2)}
+            for m in plus_lents
+        ],
+    }
+
+
+def afficher(profils):
+    for p in profils:
+        print("{url}\n  total {duree_mediane_ms} ms (min {duree_min_ms}) | imports {imports_ms} ms"
+              " | {nb_modules} modules".format(**p))
+        for m in p["modules"]:
+            print("    {:>8.2f} ms  {}".format(m["cumule_ms"], m["module"]))
+    print()
+    print("Classement (imports):")
+    for p in sorted(profils, key=lambda p: p["imports_ms"], reverse=True):
+        print("  {:>8.2f} ms  {}".format(p["imports_ms"], urllib.parse.unquote(p["url"])))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profil de demarrage des pages CGI")
+    parser.add_argument("urls", nargs="*", help="ex: /cgi-bin/recherche.py?q=velo (defaut: toutes les pages)")
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--modules", type=int, default=10, help="modules affiches par page")
+    parser.add_argument("--json", action="store_true", help="sortie JSON")
+    options = parser.parse_args()
+
+    profils = [profiler(url, max(1, options.repetitions), options.modules)
+               for url in (options.urls or scripts_pages())]
+    if options.json:
+        print(json.dumps(profils, indent=2, ensure_ascii=False))
+    else:
+        afficher(profils)
@@ -1,23 +1,579 @@
 import http.server
 import os
+import sys
+import argparse
+import io
+import time
+import datetime
+import itertools
+import threading
+import subprocess
+import email.utils
+import urllib.parse
+
+import serveur_cache
+import serveur_compression
+import serveur_metriques
+import serveur_pages
+import serveur_statique
+import serveur_workers
+import serveur_reuseport
+
 #si problème, penser à changer de port.
 PORT = 578
-server_address = ("", PORT)
 
-handler = http.server.CGIHTTPRequestHandler
+# Modes d'execution des pages de cgi-bin:
+# - "cgi"     : un processus Python par page (comportement historique)
+# - "interne" : pages executees dans le serveur (threads), modules gardes en memoire
+# - "workers" : pages executees par un pool de processus pre-lances (modules deja importes)
+MODES = ("cgi", "interne", "workers")
+
+# Connexions persistantes (HTTP/1.1): les images d'une page passent par la meme connexion
+KEEPALIVE_DELAI = 15       # secondes d'inactivite avant fermeture
+KEEPALIVE_MAX = 100        # requetes max par connexion
+
+# Taille des morceaux envoyes en "chunked" (sortie des scripts en mode cgi)
+TAILLE_MORCEAU = 64 * 1024
+
+
+class GestionnairePages(http.server.CGIHTTPRequestHandler):
+    """Gestionnaire HTTP: fichiers statiques + pages de cgi-bin."""
+
+    cgi_directories = ["/cgi-bin"]
+    mode_execution = "cgi"
+
+    # HTTP/1.1 + keep-alive (desactivable avec --sans-keepalive)
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_DELAI
+    max_requetes_connexion = KEEPALIVE_MAX
+
+    # Fonction qui execute une page hors mode "cgi": (chemin_script, environ, corps) -> octets CGI
+    executeur = staticmethod(serveur_pages.executer_page)
+
+    # Cache des pages GET sans effet de bord (None = desactive)
+    cache_pages = None
+
+    # Compression des pages HTML / SVG (niveau 0 = desactivee)
+    niveau_compression = serveur_compression.NIVEAU_DEFAUT
+    seuil_compression = serveur_compression.SEUIL_DEFAUT
+
+    # Mesures par page (None = desactivees)
+    metriques = None
+
+    # Reecrire les images des pages en URLs avec empreinte (--empreintes, modes interne/workers)
+    empreintes = False
+
+    # Si autre problème, exécuter des scripts à la racine (déconseiller)
+    # cgi_directories = ["/cgi-bin", "/"]
+
+    def run_cgi(self):
+        nom_script, _chemin, path_info, query = self.decouper_chemin_cgi()
+        self.page_mesuree = nom_script
+        self.cle_cache = None
+        if self.cache_pages is not None and self.command in ("GET", "HEAD"):
+            if not path_info:
+                self.cle_cache = self.cache_pages.cle(nom_script, query)
+            if self.cle_cache is not None:
+                sortie = self.cache_pages.lire(self.cle_cache)
+                if sortie is not None:
+                    self.phases = {"demarrage": 0.0, "traitement": 0.0}
+                    self.envoyer_sortie_cgi(sortie)
+                    return
+                self.version_cache = self.cache_pages.version(self.cle_cache)
+
+        if self.mode_execution == "cgi":
+            return self.executer_cgi_externe()
+        return self.executer_page_interne()
+
+    def garder_en_cache(self, sortie):
+        """Sortie complete d'une page cachable -> cache (HEAD exclu: corps eventuellement absent)."""
+        if self.cle_cache is not None and self.command == "GET":
+            self.cache_pages.ecrire(self.cle_cache, self.version_cache, sortie)
+
+    # ----------------------
+    # Keep-alive: compteur de requetes par connexion
+    # ----------------------
+
+    def setup(self):
+        super().setup()
+        self.nb_requetes_connexion = 0
+        self.wfile = serveur_metriques.CompteurEcriture(self.wfile)
+
+    def parse_request(self):
+        self.debut_requete = time.perf_counter()
+        ok = super().parse_request()
+        if ok:
+            self.nb_requetes_connexion += 1
+            self._connexion_annoncee = False
+            if self.nb_requetes_connexion >= self.max_requetes_connexion:
+                self.close_connection = True
+        return ok
+
+    # ----------------------
+    # Mesures: code, octets, duree totale / demarrage / traitement / premier octet
+    # ----------------------
+
+    def handle_one_request(self):
+        self.debut_requete = None
+        self.code_reponse = None
+        self.page_mesuree = serveur_metriques.LIBELLE_STATIQUE
+        self.phases = {}
+        octets_avant = self.wfile.octets
+        self.wfile.premier_octet = None
+        super().handle_one_request()
+        if self.metriques is None or self.debut_requete is None or self.code_reponse is None:
+            return
+        fin = time.perf_counter()
+        if self.wfile.premier_octet is not None:
+            self.phases["ttfb"] = self.wfile.premier_octet - self.debut_requete
+        self.metriques.enregistrer(
+            self.page_mesuree, self.command, self.code_reponse,
+            self.wfile.octets - octets_avant, fin - self.debut_requete, self.phases
+        )
+
+    def send_response_only(self, code, message=None):
+        self.code_reponse = code
+        super().send_response_only(code, message)
+
+    def envoyer_metriques(self):
+        self.page_mesuree = serveur_metriques.CHEMIN_METRIQUES
+        corps = self.metriques.texte().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corps)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        return io.BytesIO(corps)
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == "connection":
+            self._connexion_annoncee = True
+        super().send_header(keyword, value)
+
+    def end_headers(self):
+        # Annoncer au client si la connexion reste ouverte (sauf si deja fait, ex: send_error)
+        if self.request_version == "HTTP/1.1" and not getattr(self, "_connexion_annoncee", True):
+            if self.close_connection:
+                self.send_header("Connection", "close")
+            else:
+                self.send_header("Keep-Alive", "timeout=%d, max=%d" % (
+                    self.timeout, self.max_requetes_connexion - self.nb_requetes_connexion
+                ))
+        super().end_headers()
+
+    # ----------------------
+    # Fichiers statiques: ETag / Last-Modified, URLs avec empreinte, variantes WebP / gzip
+    # ----------------------
+
+    def send_head(self):
+        if self.metriques is not None and urllib.parse.urlsplit(self.path).path == serveur_metriques.CHEMIN_METRIQUES:
+            return self.envoyer_metriques()
+        if self.is_cgi():
+            return self.run_cgi()
+        return self.envoyer_statique()
+
+    def envoyer_statique(self):
+        chemin = self.translate_path(self.path)
+        immuable = False
+        if not os.path.isfile(chemin):
+            # /fond.<empreinte>.png -> fond.png (si l'empreinte correspond au contenu actuel)
+            url_chemin = urllib.parse.urlsplit(self.path).path
+            url_origine, empreinte = serveur_statique.separer_empreinte(url_chemin)
+            origine = self.translate_path(url_origine) if empreinte else None
+            if (origine is None or not os.path.isfile(origine)
+                    or serveur_statique.empreinte_courte(origine) != empreinte):
+                return super().send_head()
+            chemin = origine
+            immuable = True
+        if chemin.endswith("/"):
+            return super().send_head()
+
+        envoye, ctype, encodage, vary = serveur_statique.choisir_variante(
+            self.directory, chemin,
+            self.headers.get("Accept"), self.headers.get("Accept-Encoding")
+        )
+        try:
+            f = open(envoye, "rb")
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+
+        try:
+            fs = os.fstat(f.fileno())
+            mtime = os.stat(chemin).st_mtime
+            valeur_etag = serveur_statique.etag(envoye)
+
+            def entetes_cache():
+                self.send_header("ETag", valeur_etag)
+                self.send_header("Last-Modified", self.date_time_string(mtime))
+                self.send_header("Cache-Control", serveur_statique.CACHE_IMMUABLE if immuable
+                                 else serveur_statique.CACHE_REVALIDER)
+                if vary:
+                    self.send_header("Vary", vary)
+
+            if self.deja_en_cache(valeur_etag, mtime):
+                f.close()
+                self.send_response(304)
+                entetes_cache()
+                self.end_headers()
+                return None
+
+            self.send_response(200)
+            self.send_header("Content-type", ctype or self.guess_type(chemin))
+            self.send_header("Content-Length", str(fs.st_size))
+            if encodage:
+                self.send_header("Content-Encoding", encodage)
+            entetes_cache()
+            self.end_headers()
+            return f
+        except Exception:
+            f.close()
+            raise
+
+    def deja_en_cache(self, valeur_etag, mtime):
+        """If-None-Match prioritaire, sinon If-Modified-Since (a la seconde pres)."""
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return serveur_statique.etag_correspond(if_none_match, valeur_etag)
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if not if_modified_since:
+            return False
+        try:
+            ims = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+        if ims.tzinfo is None:
+            ims = ims.replace(tzinfo=datetime.timezone.utc)
+        modif = datetime.datetime.fromtimestamp(mtime, datetime.timezone.utc).replace(microsecond=0)
+        return modif <= ims
+
+    # ----------------------
+    # Mode "cgi": un processus python par page, sortie envoyee au fil de l'eau
+    # ----------------------
+
+    def executer_cgi_externe(self):
+        nom_script, chemin_script, path_info, query = self.decouper_chemin_cgi()
+        if not os.path.isfile(chemin_script) or not chemin_script.endswith(".py"):
+            self.send_error(404, "No such CGI script (%r)" % nom_script)
+            return
+
+        env = self.environnement_cgi(nom_script, path_info, query)
+        corps = self.lire_corps()
+        debut = time.perf_counter()
+        processus = subprocess.Popen(
+            [sys.executable, chemin_script],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env
+        )
+
+        # Corps de la requete ecrit a part (evite un blocage si le script ecrit beaucoup)
+        def ecrire_entree():
+            try:
+                processus.stdin.write(corps)
+            except OSError:
+                pass
+            finally:
+                processus.stdin.close()
+        threading.Thread(target=ecrire_entree, daemon=True).start()
+
+        # Demarrage: jusqu'au premier octet ecrit par le script (interpreteur + imports compris)
+        processus.stdout.peek(1)
+        premier_octet = time.perf_counter()
+        envoi = 0.0  # temps passe a compresser / envoyer au client: hors traitement
+
+        # En-tetes CGI: lignes jusqu'a la premiere ligne vide
+        bloc = b""
+        while True:
+            ligne = processus.stdout.readline()
+            if not ligne or ligne in (b"\n", b"\r\n"):
+                break
+            bloc += ligne
+        code, message, entetes = serveur_pages.lire_entetes_cgi(bloc)
+
+        # Page cachable: on garde aussi une copie complete de la sortie
+        copie = [bloc + b"\n"] if self.cle_cache is not None else None
+
+        # Compression: on attend d'avoir au moins "seuil" octets (sinon pas la peine)
+        encodage = self.encodage_reponse(entetes)
+        premier = b""
+        if encodage:
+            while len(premier) < self.seuil_compression:
+                morceau = processus.stdout.read1(TAILLE_MORCEAU)
+                if not morceau:
+                    break
+                premier += morceau
+            if len(premier) < self.seuil_compression:
+                encodage = None
+        compresseur = serveur_compression.Compresseur(encodage, self.niveau_compression) if encodage else None
+
+        # Longueur inconnue: chunked en HTTP/1.1, sinon fermeture de la connexion
+        chunked = (self.protocol_version == "HTTP/1.1" and self.request_version == "HTTP/1.1"
+                   and self.command != "HEAD")
+        if not chunked:
+            self.close_connection = True
+        t = time.perf_counter()
+        self.send_response(code, message)
+        for nom, valeur in entetes:
+            self.send_header(nom, valeur)
+        self.entetes_compression(entetes, encodage)
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        envoi += time.perf_counter() - t
+
+        suite = iter(lambda: processus.stdout.read1(TAILLE_MORCEAU), b"")
+        for morceau in itertools.chain([premier] if premier else [], suite):
+            t = time.perf_counter()
+            if copie is not None:
+                copie.append(morceau)
+            if compresseur is not None:
+                morceau = compresseur.ajouter(morceau) + compresseur.vider()
+            self.envoyer_morceau(morceau, chunked)
+            envoi += time.perf_counter() - t
+        fin_sortie = time.perf_counter()
+        if compresseur is not None:
+            self.envoyer_morceau(compresseur.terminer(), chunked)
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
+        code_sortie = processus.wait()
+        # Memes phases que les modes interne / workers: envoi au client exclu du traitement
+        self.phases = {"demarrage": premier_octet - debut,
+                       "traitement": max(0.0, fin_sortie - premier_octet - envoi)}
+        if code_sortie:
+            self.log_error("CGI script exit code %s", code_sortie)
+        elif copie is not None:
+            self.garder_en_cache(b"".join(copie))
+
+    def envoyer_morceau(self, donnees, chunked):
+        """Ecrit un morceau de corps (un morceau vide terminerait le chunked: ignore)."""
+        if not donnees or self.command == "HEAD":
+            return
+        if chunked:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(donnees), donnees))
+        else:
+            self.wfile.write(donnees)
+
+    # ----------------------
+    # Compression gzip / deflate (HTML, SVG)
+    # ----------------------
+
+    def encodage_reponse(self, entetes):
+        """Encodage a utiliser pour cette reponse (None = pas de compression)."""
+        if self.niveau_compression <= 0 or not serveur_compression.type_compressible(entetes):
+            return None
+        return serveur_compression.choisir_encodage(self.headers.get("Accept-Encoding"))
+
+    def entetes_compression(self, entetes, encodage):
+        if self.niveau_compression > 0 and serveur_compression.type_compressible(entetes):
+            self.send_header("Vary", "Accept-Encoding")
+        if encodage:
+            self.send_header("Content-Encoding", encodage)
+
+    # ----------------------
+    # Modes "interne" / "workers"
+    # ----------------------
+
+    def decouper_chemin_cgi(self):
+        """'/cgi-bin/objet.py?nom=x' -> (nom_script, chemin_script, path_info, query)."""
+        dossier, reste = self.cgi_info
+        reste, _, query = reste.partition("?")
+        script, sep, path_info = reste.partition("/")
+        nom_script = dossier + "/" + script
+        return nom_script, self.translate_path(nom_script), (sep + path_info), query
+
+    def environnement_cgi(self, nom_script, path_info, query):
+        """Environnement CGI d'une requete (memes variables que CGIHTTPRequestHandler)."""
+        env = dict(getattr(os.environ, "_reel", os.environ))
+        env["SERVER_SOFTWARE"] = self.version_string()
+        env["SERVER_NAME"] = self.server.server_name
+        env["GATEWAY_INTERFACE"] = "CGI/1.1"
+        env["SERVER_PROTOCOL"] = self.protocol_version
+        env["SERVER_PORT"] = str(self.server.server_port)
+        env["REQUEST_METHOD"] = self.command
+        uqrest = urllib.parse.unquote(path_info)
+        env["PATH_INFO"] = uqrest
+        env["PATH_TRANSLATED"] = self.translate_path(uqrest)
+        env["SCRIPT_NAME"] = nom_script
+        env["QUERY_STRING"] = query
+        env["REMOTE_ADDR"] = self.client_address[0]
+        if self.headers.get("content-type") is None:
+            env["CONTENT_TYPE"] = self.headers.get_content_type()
+        else:
+            env["CONTENT_TYPE"] = self.headers["content-type"]
+        longueur = self.headers.get("content-length")
+        if longueur:
+            env["CONTENT_LENGTH"] = longueur
+        referer = self.headers.get("referer")
+        if referer:
+            env["HTTP_REFERER"] = referer
+        env["HTTP_ACCEPT"] = ",".join(self.headers.get_all("accept", ()))
+        ua = self.headers.get("user-agent")
+        if ua:
+            env["HTTP_USER_AGENT"] = ua
+        cookies = ", ".join(filter(None, self.headers.get_all("cookie", [])))
+        if cookies:
+            env["HTTP_COOKIE"] = cookies
+        for cle in ("QUERY_STRING", "REMOTE_HOST", "CONTENT_LENGTH",
+                    "HTTP_USER_AGENT", "HTTP_COOKIE", "HTTP_REFERER"):
+            env.setdefault(cle, "")
+        return env
+
+    def lire_corps(self):
+        """Corps de la requete (POST), vide sinon."""
+        try:
+            taille = int(self.headers.get("content-length") or 0)
+        except ValueError:
+            taille = 0
+        return self.rfile.read(taille) if taille > 0 else b""
+
+    def executer_page_interne(self):
+        nom_script, chemin_script, path_info, query = self.decouper_chemin_cgi()
+        if not os.path.isfile(chemin_script) or not chemin_script.endswith(".py"):
+            self.send_error(404, "No such CGI script (%r)" % nom_script)
+            return
+
+        env = self.environnement_cgi(nom_script, path_info, query)
+        debut = time.perf_counter()
+        try:
+            sortie = self.executeur(chemin_script, env, self.lire_corps())
+        except serveur_workers.FileSaturee:
+            self.send_error(503, "Serveur sature, reessayer plus tard")
+            return
+        except serveur_workers.WorkerPerdu:
+            self.send_error(502, "Worker termine pendant la page")
+            return
+        duree = time.perf_counter() - debut
+        pool = getattr(self.server, "pool", None)
+        attente = pool.derniere_attente() if pool is not None else 0.0
+        self.phases = {"demarrage": attente, "traitement": duree - attente}
+        self.garder_en_cache(sortie)
+        self.envoyer_sortie_cgi(sortie)
+
+    def envoyer_sortie_cgi(self, sortie):
+        """Envoie la sortie d'un script (en-tetes CGI + corps inchange)."""
+        code, message, entetes, corps = serveur_pages.separer_sortie_cgi(sortie)
+        if self.empreintes and any(n.lower() == "content-type" and "html" in v.lower() for (n, v) in entetes):
+            corps = serveur_statique.reecrire_references(corps, self.translate_path)
+        encodage = self.encodage_reponse(entetes) if len(corps) >= self.seuil_compression else None
+        if encodage:
+            corps = serveur_compression.compresser(corps, encodage, self.niveau_compression)
+        self.send_response(code, message)
+        for nom, valeur in entetes:
+            if nom.lower() != "content-length":
+                self.send_header(nom, valeur)
+        self.entetes_compression(entetes, encodage)
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(corps)
+
+
+def classe_serveur(options):
+    """Classe de serveur: avec threads (connexions persistantes), + SO_REUSEPORT pour un enfant du superviseur."""
+    classe = http.server.ThreadingHTTPServer
+    if options.enfant:
+        classe = type("ServeurReusePort", (serveur_reuseport.ReutiliserPortMixin, classe), {})
+    return classe
+
+
+def creer_serveur(options):
+    """Construit le serveur HTTP selon le mode choisi."""
+    GestionnairePages.mode_execution = options.mode
+    if options.sans_keepalive:
+        GestionnairePages.protocol_version = "HTTP/1.0"
+    GestionnairePages.timeout = options.keepalive_delai
+    GestionnairePages.max_requetes_connexion = max(1, options.keepalive_max)
+    GestionnairePages.empreintes = options.empreintes
+    if not options.sans_metriques:
+        GestionnairePages.metriques = serveur_metriques.Metriques(options.metriques_journal)
+    GestionnairePages.niveau_compression = max(0, min(9, options.compression))
+    GestionnairePages.seuil_compression = max(0, options.compression_seuil)
+    if options.cache_pages > 0:
+        GestionnairePages.cache_pages = serveur_cache.CachePages(
+            nb_entrees=options.cache_pages,
+            octets_max=options.cache_octets
+        )
+    server_address = ("", options.port)
+    classe = classe_serveur(options)
+    if options.mode == "interne":
+        # Modules lourds importes avant les threads (pas d'import "paresseux" concurrent)
+        serveur_workers.precharger_modules()
+        return classe(server_address, GestionnairePages)
+    if options.mode == "workers":
+        pool = serveur_workers.PoolWorkers(
+            nb_workers=options.workers,
+            max_requetes=options.max_requetes,
+            file_max=options.file_max
+        )
+        GestionnairePages.executeur = staticmethod(pool.executer)
+        httpd = classe(server_address, GestionnairePages)
+        httpd.pool = pool
+        return httpd
+    return classe(server_address, GestionnairePages)
+
+
+def lire_options():
+    parser = argparse.ArgumentParser(description="Serveur Privealy Economy")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--mode", choices=MODES, default="cgi",
+                        help="cgi: un processus par page / interne: pages executees dans le serveur"
+                             " / workers: pool de processus pre-lances")
+    parser.add_argument("--workers", type=int, default=serveur_workers.NB_WORKERS_DEFAUT,
+                        help="mode workers: nombre de processus")
+    parser.add_argument("--max-requetes", type=int, default=serveur_workers.MAX_REQUETES_DEFAUT,
+                        help="mode workers: pages traitees avant recyclage d'un processus")
+    parser.add_argument("--file-max", type=int, default=serveur_workers.FILE_MAX_DEFAUT,
+                        help="mode workers: requetes en attente max (au dela -> 503)")
+    parser.add_argument("--keepalive-delai", type=int, default=KEEPALIVE_DELAI,
+                        help="secondes d'inactivite avant fermeture d'une connexion")
+    parser.add_argument("--keepalive-max", type=int, default=KEEPALIVE_MAX,
+                        help="requetes max par connexion")
+    parser.add_argument("--sans-keepalive", action="store_true",
+                        help="repondre en HTTP/1.0 (une connexion par requete)")
+    parser.add_argument("--processus", type=int, default=1,
+                        help="nombre de processus serveurs sur le meme port (SO_REUSEPORT, SIGHUP = recharger)")
+    parser.add_argument("--cache-pages", type=int, default=serveur_cache.NB_ENTREES_DEFAUT,
+                        help="pages GET gardees en memoire (classements, filtres, objet...), 0 = sans cache")
+    parser.add_argument("--cache-octets", type=int, default=serveur_cache.OCTETS_MAX_DEFAUT,
+                        help="taille max du cache de pages (octets)")
+    parser.add_argument("--compression", type=int, default=serveur_compression.NIVEAU_DEFAUT,
+                        help="niveau gzip/deflate des pages HTML/SVG (1-9), 0 = sans compression")
+    parser.add_argument("--compression-seuil", type=int, default=serveur_compression.SEUIL_DEFAUT,
+                        help="taille min (octets) d'une page pour la compresser")
+    parser.add_argument("--sans-metriques", action="store_true",
+                        help="ne pas mesurer les pages (pas de /metrics)")
+    parser.add_argument("--metriques-journal", default=None,
+                        help="fichier: une ligne JSON par requete (page, code, octets, durees)")
+    parser.add_argument("--empreintes", action="store_true",
+                        help="modes interne/workers: images des pages en URLs avec empreinte (cache long)")
+    # Interne: processus lance par le superviseur (--processus > 1)
+    parser.add_argument("--enfant", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
 
 
-handler.cgi_directories = ["/cgi-bin"]
+if __name__ == "__main__":
+    options = lire_options()
 
-# Si autre problème, exécuter des scripts à la racine (déconseiller) 
-# handler.cgi_directories = ["/cgi-bin", "/"] 
-# ----------------------
+    if options.processus > 1 and not options.enfant:
+        print("Serveur actif sur le port :", options.port)
+        serveur_reuseport.superviser(options.processus)
+        raise SystemExit
 
-print("Serveur actif sur le port :", PORT)
-print("Racine du serveur dans", os.getcwd())
+    if not options.enfant:
+        print("Serveur actif sur le port :", options.port)
+        print("Racine du serveur dans", os.getcwd())
+        print("Mode d'execution des pages :", options.mode)
 
-httpd = http.server.HTTPServer(server_address, handler)
-httpd.serve_forever()
+    httpd = creer_serveur(options)
+    if options.enfant:
+        serveur_reuseport.preparer_enfant(httpd)
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.server_close()
+        if getattr(httpd, "pool", None) is not None:
+            httpd.pool.arreter()
+        if GestionnairePages.metriques is not None:
+            GestionnairePages.metriques.fermer()
 
 #http://localhost:578/cgi-bin/vrai_index.py
-     
@@ -0,0 +1,142 @@
+# serveur_cache.py
+# Cache des pages completes (sortie CGI) pour les pages GET sans effet de bord
+#
+# Objectif:
+# - calculs_classements.py, recherche_populaire.py, filtre_simple.py, index.py, objet.py
+#   ne dependent que de la query string et du contenu de objets.db
+# - Une requete deja vue -> reponse servie depuis la memoire (pas de SQLite, pas de HTML a refaire)
+#
+# Cle du cache: (script, query string normalisee)
+# Chaque entree garde la "version" des bases lues par la page (mtime + taille du fichier,
+# et du -wal s'il existe): si une base change, l'entree n'est plus servie (invalidation auto)
+#
+# IMPORTANT:
+# - Seules les reponses 200 sans Set-Cookie sont gardees
+# - Taille bornee (nombre d'entrees + octets), eviction LRU
+
+import os
+import threading
+import collections
+import urllib.parse
+
+import serveur_pages
+
+
+# ============================================================
+# Constantes
+# ============================================================
+
+NB_ENTREES_DEFAUT = 256
+OCTETS_MAX_DEFAUT = 32 * 1024 * 1024
+
+# Une reponse plus grosse n'est pas gardee (evite qu'une page vide tout le cache)
+TAILLE_ENTREE_MAX = 2 * 1024 * 1024
+
+# Pages cachables -> bases dont elles dependent (relatives a la racine du serveur)
+PAGES_CACHABLES = {
+    "calculs_classements.py": ("cgi-bin/objets.db",),
+    "recherche_populaire.py": ("cgi-bin/objets.db",),
+    "filtre_simple.py": ("cgi-bin/objets.db",),
+    "index.py": ("cgi-bin/objets.db",),
+    "objet.py": ("cgi-bin/objets.db",),
+}
+
+
+# ============================================================
+# Cle + version
+# ============================================================
+
+def normaliser_query(query):
+    """'b=2&a=1&a=0' -> 'a=1&a=0&b=2' (ordre des parametres sans importance, valeurs gardees)."""
+    paires = urllib.parse.parse_qsl(query or "", keep_blank_values=True)
+    paires.sort(key=lambda p: p[0])
+    return urllib.parse.urlencode(paires)
+
+
+def version_bases(chemins):
+    """Version des fichiers de base: (mtime_ns, taille) de la base et de son -wal."""
+    version = []
+    for chemin in chemins:
+        for fichier in (chemin, chemin + "-wal"):
+            try:
+                st = os.stat(fichier)
+                version.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                version.append(None)
+    return tuple(version)
+
+
+def reponse_cachable(sortie):
+    """Vrai si la sortie CGI est un 200 sans cookie."""
+    code, _message, entetes, _corps = serveur_pages.separer_sortie_cgi(sortie)
+    if code != 200:
+        return False
+    return not any(n.lower() == "set-cookie" for (n, _v) in entetes)
+
+
+# ============================================================
+# Cache LRU
+# ============================================================
+
+class CachePages:
+    """Cache LRU (thread-safe) des sorties CGI."""
+
+    def __init__(self, nb_entrees=NB_ENTREES_DEFAUT, octets_max=OCTETS_MAX_DEFAUT,
+                 pages=PAGES_CACHABLES):
+        self.nb_entrees = max(0, int(nb_entrees))
+        self.octets_max = max(0, int(octets_max))
+        self.pages = dict(pages)
+
+        self._entrees = collections.OrderedDict()  # cle -> (version, sortie)
+        self._octets = 0
+        self._verrou = threading.Lock()
+        self.succes = 0
+        self.echecs = 0
+
+    def cle(self, nom_script, query):
+        """Cle du cache, ou None si la page n'est pas cachable."""
+        nom = os.path.basename(nom_script)
+        if self.nb_entrees == 0 or nom not in self.pages:
+            return None
+        return (nom, normaliser_query(query))
+
+    def lire(self, cle):
+        """Sortie CGI en cache (None si absente ou perimee)."""
+        version = version_bases(self.pages[cle[0]])
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is None or entree[0] != version:
+                if entree is not None:
+                    self._retirer(cle)
+                self.echecs += 1
+                return None
+            self._entrees.move_to_end(cle)
+            self.succes += 1
+            return entree[1]
+
+    def ecrire(self, cle, version, sortie):
+        """
+        Garde une sortie. version = version des bases AVANT l'execution de la page
+        (si la base a change pendant la page, l'entree sera simplement perimee).
+        """
+        if len(sortie) > TAILLE_ENTREE_MAX or not reponse_cachable(sortie):
+            return
+        with self._verrou:
+            if cle in self._entrees:
+                self._retirer(cle)
+            self._entrees[cle] = (version, sortie)
+            self._octets += len(sortie)
+            while self._entrees and (len(self._entrees) > self.nb_entrees or self._octets > self.octets_max):
+                self._retirer(next(iter(self._entrees)))
+
+    def version(self, cle):
+        return version_bases(self.pages[cle[0]])
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+            self._octets = 0
+
+    def _retirer(self, cle):
+        _version, sortie = self._entrees.pop(cle)
+        self._octets -= len(sortie)
@@ -0,0 +1,101 @@
+# serveur_compression.py
+# Compression gzip / deflate des pages dynamiques (HTML + SVG)
+#
+# Objectif:
+# - Les pages embarquent des centaines de lignes de CSS, sim.py des SVG (un <circle> par point):
+#   tres repetitif -> se compresse tres bien
+# - Encodage negocie avec Accept-Encoding (gzip prefere, sinon deflate)
+# - Fonctionne aussi en flux (mode cgi: sortie envoyee au fil de l'eau)
+#
+# IMPORTANT:
+# - Seuls text/html et image/svg+xml sont compresses
+# - En dessous de SEUIL_DEFAUT octets, la compression coute plus qu'elle ne rapporte
+# - Une reponse qui a deja un Content-Encoding n'est pas touchee
+
+import zlib
+
+
+# ============================================================
+# Constantes
+# ============================================================
+
+NIVEAU_DEFAUT = 6
+SEUIL_DEFAUT = 1024
+
+TYPES_COMPRESSIBLES = ("text/html", "image/svg+xml")
+
+# Ordre de preference a q egal
+ENCODAGES = ("gzip", "deflate")
+
+
+# ============================================================
+# Negociation
+# ============================================================
+
+def choisir_encodage(accept_encoding):
+    """Meilleur encodage accepte par le client ('gzip' / 'deflate'), None sinon."""
+    poids = {}
+    etoile = None
+    for morceau in (accept_encoding or "").split(","):
+        parties = [p.strip() for p in morceau.split(";")]
+        nom = parties[0].lower()
+        if not nom:
+            continue
+        q = 1.0
+        for p in parties[1:]:
+            if p.startswith("q="):
+                try:
+                    q = float(p[2:])
+                except ValueError:
+                    q = 0.0
+        if nom == "*":
+            etoile = q
+        else:
+            poids[nom] = q
+
+    meilleur = None
+    for nom in ENCODAGES:
+        q = poids.get(nom, etoile if etoile is not None else 0.0)
+        if q > 0 and (meilleur is None or q > meilleur[1]):
+            meilleur = (nom, q)
+    return meilleur[0] if meilleur else None
+
+
+def type_compressible(entetes):
+    """Vrai si les en-tetes CGI annoncent du HTML / SVG pas encore encode."""
+    ctype = ""
+    for nom, valeur in entetes:
+        n = nom.lower()
+        if n == "content-encoding":
+            return False
+        if n == "content-type":
+            ctype = valeur.split(";")[0].strip().lower()
+    return ctype in TYPES_COMPRESSIBLES
+
+
+# ============================================================
+# Compression
+# ============================================================
+
+class Compresseur:
+    """Compression par morceaux (gzip: en-tete gzip, deflate: format zlib comme attendu en HTTP)."""
+
+    def __init__(self, encodage, niveau=NIVEAU_DEFAUT):
+        wbits = 16 + zlib.MAX_WBITS if encodage == "gzip" else zlib.MAX_WBITS
+        self._z = zlib.compressobj(niveau, zlib.DEFLATED, wbits)
+
+    def ajouter(self, morceau):
+        """Morceau compresse (peut etre vide: zlib garde des donnees en reserve)."""
+        return self._z.compress(morceau)
+
+    def vider(self):
+        """Force l'envoi de ce qui est en reserve (le navigateur peut commencer l'affichage)."""
+        return self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def terminer(self):
+        return self._z.flush(zlib.Z_FINISH)
+
+
+def compresser(corps, encodage, niveau=NIVEAU_DEFAUT):
+    c = Compresseur(encodage, niveau)
+    return c.ajouter(corps) + c.terminer()
@@ -0,0 +1,168 @@
+# serveur_metriques.py
+# Mesures par page: nombre de requetes, codes HTTP, octets envoyes, latences
+#
+# Objectif:
+# - Savoir quelles pages (sim.py, recherche.py, liaison.py, ...) consomment le serveur
+# - Latence totale: histogramme + p50 / p95 / p99 (sur les dernieres requetes)
+# - Decoupage du temps d'une page:
+#     * demarrage : mode cgi: lancement du processus jusqu'au premier octet qu'il ecrit
+#                   (interpreteur + imports) / mode workers: attente d'un worker libre
+#     * traitement: execution du script jusqu'a la fin de sa sortie (envoi au client exclu,
+#                   dans tous les modes)
+#     * ttfb      : debut de la requete -> premier octet envoye (en-tetes)
+# - Exposition: texte (GET /metrics) + une ligne JSON par requete (--metriques-journal)
+#
+# IMPORTANT:
+# - Avec --processus N, chaque processus a ses propres compteurs (/metrics = le processus qui repond);
+#   le journal JSON, lui, recoit les lignes de tous les processus (champ "pid")
+
+import os
+import json
+import math
+import time
+import bisect
+import threading
+import collections
+
+
+# ============================================================
+# Constantes
+# ============================================================
+
+CHEMIN_METRIQUES = "/metrics"
+
+# Bornes des seaux de l'histogramme (secondes)
+SEAUX = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Nombre de latences gardees par page pour les percentiles
+TAILLE_ECHANTILLON = 2048
+
+PERCENTILES = (50, 95, 99)
+
+# Libelle commun a tous les fichiers statiques (images...)
+LIBELLE_STATIQUE = "(statique)"
+
+PHASES = ("demarrage", "traitement", "ttfb")
+
+
+def percentile(valeurs_triees, p):
+    """Percentile (rang le plus proche) d'une liste deja triee."""
+    if not valeurs_triees:
+        return 0.0
+    rang = math.ceil(p / 100.0 * len(valeurs_triees))
+    return valeurs_triees[max(0, min(len(valeurs_triees), rang) - 1)]
+
+
+class _StatsPage:
+    """Compteurs d'une page."""
+
+    def __init__(self):
+        self.nb = 0
+        self.codes = collections.Counter()
+        self.octets = 0
+        self.seaux = [0] * (len(SEAUX) + 1)
+        self.somme = 0.0
+        self.echantillon = collections.deque(maxlen=TAILLE_ECHANTILLON)
+        self.phases = {nom: 0.0 for nom in PHASES}
+
+    def ajouter(self, code, octets, duree, phases):
+        self.nb += 1
+        self.codes[code] += 1
+        self.octets += octets
+        self.seaux[bisect.bisect_left(SEAUX, duree)] += 1
+        self.somme += duree
+        self.echantillon.append(duree)
+        for nom in PHASES:
+            self.phases[nom] += phases.get(nom) or 0.0
+
+
+class Metriques:
+    """Compteurs de toutes les pages (thread-safe) + journal JSON optionnel."""
+
+    def __init__(self, chemin_journal=None):
+        self._pages = {}
+        self._verrou = threading.Lock()
+        self._journal = None
+        if chemin_journal:
+            # buffering=1: une ligne = une ecriture (lignes de plusieurs processus non melangees)
+            self._journal = open(chemin_journal, "a", encoding="utf-8", buffering=1)
+        self.debut = time.time()
+
+    def enregistrer(self, page, methode, code, octets, duree, phases):
+        with self._verrou:
+            stats = self._pages.get(page)
+            if stats is None:
+                stats = self._pages[page] = _StatsPage()
+            stats.ajouter(code, octets, duree, phases)
+            if self._journal is not None:
+                ligne = {
+                    "t": round(time.time(), 3),
+                    "pid": os.getpid(),
+                    "page": page,
+                    "methode": methode,
+                    "code": code,
+                    "octets": octets,
+                    "duree": round(duree, 6),
+                }
+                for nom in PHASES:
+                    if phases.get(nom) is not None:
+                        ligne[nom] = round(phases[nom], 6)
+                self._journal.write(json.dumps(ligne) + "\n")
+
+    def texte(self):
+        """Exposition texte (format Prometheus)."""
+        lignes = [
+            "# TYPE prevealy_requetes_total counter",
+            "# TYPE prevealy_octets_envoyes_total counter",
+            "# TYPE prevealy_duree_secondes histogram",
+            "# TYPE prevealy_duree_percentile_secondes gauge",
+            "# TYPE prevealy_phase_secondes_total counter",
+            "prevealy_uptime_secondes %.3f" % (time.time() - self.debut),
+        ]
+        with self._verrou:
+            for page in sorted(self._pages):
+                s = self._pages[page]
+                etiquette = 'page="%s"' % page.replace("\\", "\\\\").replace('"', '\\"')
+                for code in sorted(s.codes):
+                    lignes.append('prevealy_requetes_total{%s,code="%d"} %d' % (etiquette, code, s.codes[code]))
+                lignes.append("prevealy_octets_envoyes_total{%s} %d" % (etiquette, s.octets))
+
+                cumul = 0
+                for borne, nb in zip(SEAUX, s.seaux):
+                    cumul += nb
+                    lignes.append('prevealy_duree_secondes_bucket{%s,le="%g"} %d' % (etiquette, borne, cumul))
+                lignes.append('prevealy_duree_secondes_bucket{%s,le="+Inf"} %d' % (etiquette, s.nb))
+                lignes.append("prevealy_duree_secondes_sum{%s} %.6f" % (etiquette, s.somme))
+                lignes.append("prevealy_duree_secondes_count{%s} %d" % (etiquette, s.nb))
+
+                triees = sorted(s.echantillon)
+                for p in PERCENTILES:
+                    lignes.append('prevealy_duree_percentile_secondes{%s,p="%d"} %.6f'
+                                  % (etiquette, p, percentile(triees, p)))
+                for nom in PHASES:
+                    lignes.append('prevealy_phase_secondes_total{%s,phase="%s"} %.6f'
+                                  % (etiquette, nom, s.phases[nom]))
+        return "\n".join(lignes) + "\n"
+
+    def fermer(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+
+class CompteurEcriture:
+    """Enveloppe de wfile: compte les octets envoyes et note l'instant du premier octet."""
+
+    def __init__(self, flux):
+        self._flux = flux
+        self.octets = 0
+        self.premier_octet = None
+
+    def write(self, donnees):
+        if self.premier_octet is None and donnees:
+            self.premier_octet = time.perf_counter()
+        self.octets += len(donnees)
+        return self._flux.write(donnees)
+
+    def __getattr__(self, attribut):
+        return getattr(self._flux, attribut)
@@ -0,0 +1,254 @@
+# serveur_pages.py
+# Execution "en processus" des pages CGI (cgi-bin/*.py)
+#
+# Objectif:
+# - Ne plus lancer un nouvel interpreteur Python a chaque page
+# - Garder les modules (sqlite3, difflib, stats_utils, sim_calc, ...) charges entre deux requetes
+# - Garder le contrat CGI des scripts: QUERY_STRING, REQUEST_METHOD, stdin, sortie sur stdout
+#
+# IMPORTANT:
+# - Les scripts de cgi-bin ne sont PAS modifies: on execute leur code (compile une seule fois)
+# - os.environ, sys.stdout et sys.stdin sont remplaces par des "aiguillages" par thread:
+#   chaque requete voit son propre environnement CGI et sa propre sortie
+# - Une page peut aussi etre remplacee par une fonction python (enregistrer_page)
+
+import os
+import sys
+import io
+import builtins
+import threading
+import traceback
+import collections.abc
+
+
+# ============================================================
+# Constantes
+# ============================================================
+
+# Dossier des scripts CGI (relatif a la racine du serveur)
+DOSSIER_CGI = "cgi-bin"
+
+
+# ============================================================
+# Aiguillages par thread (environnement + flux standard)
+# ============================================================
+
+_local = threading.local()
+
+
+class _EnvironnementParThread(collections.abc.MutableMapping):
+    """
+    Remplace os.environ:
+    - si une requete est en cours dans ce thread -> environnement CGI de la requete
+    - sinon -> vrai environnement du processus
+    """
+
+    def __init__(self, environ_reel):
+        self._reel = environ_reel
+
+    def _courant(self):
+        env = getattr(_local, "environ", None)
+        return self._reel if env is None else env
+
+    def __getitem__(self, cle):
+        return self._courant()[cle]
+
+    def __setitem__(self, cle, valeur):
+        self._courant()[cle] = valeur
+
+    def __delitem__(self, cle):
+        del self._courant()[cle]
+
+    def __iter__(self):
+        return iter(self._courant())
+
+    def __len__(self):
+        return len(self._courant())
+
+    def copy(self):
+        return dict(self._courant())
+
+    def __repr__(self):
+        return "environ({!r})".format(dict(self._courant()))
+
+
+class _FluxParThread:
+    """Remplace sys.stdout / sys.stdin: redirige vers le flux de la requete du thread."""
+
+    def __init__(self, nom, flux_reel):
+        self._nom = nom
+        self._reel = flux_reel
+
+    def _courant(self):
+        flux = getattr(_local, self._nom, None)
+        return self._reel if flux is None else flux
+
+    def __getattr__(self, attribut):
+        return getattr(self._courant(), attribut)
+
+    def __iter__(self):
+        return iter(self._courant())
+
+
+_installe = False
+_verrou = threading.Lock()
+
+
+def installer_aiguillages():
+    """Installe (une seule fois) les aiguillages + le chemin d import de cgi-bin."""
+    global _installe
+    with _verrou:
+        if _installe:
+            return
+        if not isinstance(os.environ, _EnvironnementParThread):
+            os.environ = _EnvironnementParThread(os.environ)
+        sys.stdout = _FluxParThread("stdout", sys.stdout)
+        sys.stdin = _FluxParThread("stdin", sys.stdin)
+
+        # Les scripts font "from stats_utils import ..." (dossier du script dans sys.path en CGI)
+        dossier = os.path.abspath(DOSSIER_CGI)
+        if dossier not in sys.path:
+            sys.path.insert(0, dossier)
+        _installe = True
+
+
+# ============================================================
+# Cache du code compile des scripts
+# ============================================================
+
+_cache_code = {}  # chemin -> (mtime, code)
+
+
+def compiler_script(chemin):
+    """Compile un script une seule fois (recompile si le fichier a change)."""
+    mtime = os.stat(chemin).st_mtime_ns
+    entree = _cache_code.get(chemin)
+    if entree is not None and entree[0] == mtime:
+        return entree[1]
+
+    with open(chemin, "rb") as f:
+        source = f.read()
+    code = compile(source, chemin, "exec", dont_inherit=True)
+    _cache_code[chemin] = (mtime, code)
+    return code
+
+
+# ============================================================
+# Registre des pages (nom du script -> fonction)
+# ============================================================
+
+# Une fonction de page recoit (chemin_script, environ_cgi, corps) et renvoie les octets CGI
+PAGES = {}
+
+
+def enregistrer_page(nom_script, fonction):
+    """Associe /cgi-bin/<nom_script> a une fonction python (au lieu du script)."""
+    PAGES[nom_script] = fonction
+
+
+def executer_script(chemin_script, environ_cgi, corps=b""):
+    """
+    Execute un script CGI dans le processus courant.
+    Retour: octets produits sur stdout (en-tetes CGI + corps), comme en CGI classique.
+    """
+    installer_aiguillages()
+    code = compiler_script(chemin_script)
+
+    tampon = io.BytesIO()
+    sortie = io.TextIOWrapper(tampon, encoding="utf-8", newline="\n", write_through=True)
+    entree = io.TextIOWrapper(io.BytesIO(corps or b""), encoding="utf-8")
+
+    _local.environ = environ_cgi
+    _local.stdout = sortie
+    _local.stdin = entree
+
+    espace = {
+        "__name__": "__main__",
+        "__file__": chemin_script,
+        "__builtins__": builtins,
+    }
+    try:
+        exec(code, espace)
+    except SystemExit:
+        # sys.exit() / raise SystemExit: fin normale d une page CGI
+        pass
+    except Exception:
+        # Comme en CGI: la trace part dans le journal du serveur, la sortie deja produite est gardee
+        sys.stderr.write("Erreur dans {}:\n{}".format(chemin_script, traceback.format_exc()))
+    finally:
+        try:
+            sortie.flush()
+        except Exception:
+            pass
+        # Variables du script liberees tout de suite (curseurs SQLite -> verrous de lecture rendus)
+        espace.clear()
+        # Connexions SQLite de la page rendues (voir cgi-bin/acces_bdd.py)
+        acces_bdd = sys.modules.get("acces_bdd")
+        if acces_bdd is not None:
+            acces_bdd.fin_de_page()
+        _local.environ = None
+        _local.stdout = None
+        _local.stdin = None
+
+    return tampon.getvalue()
+
+
+def executer_page(chemin_script, environ_cgi, corps=b""):
+    """Execute la page: fonction enregistree si elle existe, sinon le script."""
+    fonction = PAGES.get(os.path.basename(chemin_script), executer_script)
+    return fonction(chemin_script, environ_cgi, corps)
+
+
+# ============================================================
+# Lecture de la sortie CGI (en-tetes + corps)
+# ============================================================
+
+def separer_sortie_cgi(sortie):
+    """
+    Separe la sortie d un script CGI.
+    Retour: (code_statut, message, liste_entetes, corps)
+    """
+    fin = -1
+    taille_sep = 0
+    for sep in (b"\r\n\r\n", b"\n\n"):
+        pos = sortie.find(sep)
+        if pos >= 0 and (fin < 0 or pos < fin):
+            fin = pos
+            taille_sep = len(sep)
+
+    if fin < 0:
+        bloc, corps = sortie, b""
+    else:
+        bloc, corps = sortie[:fin], sortie[fin + taille_sep:]
+
+    code, message, entetes = lire_entetes_cgi(bloc)
+    return code, message, entetes, corps
+
+
+def lire_entetes_cgi(bloc):
+    """
+    Lit le bloc d en-tetes d un script CGI (sans la ligne vide finale).
+    Retour: (code_statut, message, liste_entetes)
+    """
+    code = 200
+    message = None
+    entetes = []
+    for ligne in bloc.decode("latin-1").splitlines():
+        if ":" not in ligne:
+            continue
+        nom, valeur = ligne.split(":", 1)
+        nom = nom.strip()
+        valeur = valeur.strip()
+        if nom.lower() == "status":
+            morceaux = valeur.split(" ", 1)
+            if morceaux[0].isdigit():
+                code = int(morceaux[0])
+                message = morceaux[1] if len(morceaux) > 1 else None
+            continue
+        entetes.append((nom, valeur))
+
+    # Redirection CGI sans statut explicite
+    if code == 200 and any(n.lower() == "location" for (n, _v) in entetes):
+        code = 302
+
+    return code, message, entetes
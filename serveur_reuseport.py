@@ -0,0 +1,168 @@
+# serveur_reuseport.py
+# Mode multi-processus: N serveurs ecoutent le meme port (SO_REUSEPORT)
+#
+# Objectif:
+# - Utiliser tous les coeurs: le noyau repartit les connexions entre les processus
+# - Chaque processus garde ses propres caches (modules, code compile, workers...)
+# - Arret propre (SIGTERM / Ctrl+C) et rechargement du code sur SIGHUP
+#
+# Fonctionnement:
+# - Le processus "superviseur" ne sert aucune page: il lance N enfants
+#   (python serveur.py ... --enfant) et les surveille
+# - SIGHUP: une nouvelle generation d'enfants demarre (code relu depuis le disque),
+#   puis l'ancienne generation termine ses requetes en cours et s'arrete
+# - Un enfant qui meurt tout seul est relance, avec une pause qui double a chaque echec rapide
+#   (mort moins de DUREE_VIE_MIN apres son lancement); apres MAX_ECHECS_RAPIDES echecs rapides
+#   de suite (port deja pris, erreur au demarrage...), le superviseur arrete tout
+#
+# IMPORTANT:
+# - SO_REUSEPORT existe sous Linux / BSD / macOS, pas sous Windows
+
+import os
+import sys
+import time
+import socket
+import signal
+import threading
+import subprocess
+
+
+# Temps laisse a la nouvelle generation pour ouvrir le port avant d'arreter l'ancienne
+DELAI_RELAIS = 1.0
+
+# Temps max laisse a un enfant pour finir ses requetes (SIGTERM) avant SIGKILL
+DELAI_ARRET = 30.0
+
+# Relance d'un enfant mort: echec "rapide" si mort avant DUREE_VIE_MIN secondes;
+# pause PAUSE_RELANCE_MIN, doublee a chaque echec rapide (max PAUSE_RELANCE_MAX)
+DUREE_VIE_MIN = 10.0
+PAUSE_RELANCE_MIN = 0.5
+PAUSE_RELANCE_MAX = 30.0
+MAX_ECHECS_RAPIDES = 5
+
+
+def reuseport_disponible():
+    return hasattr(socket, "SO_REUSEPORT")
+
+
+class ReutiliserPortMixin:
+    """A melanger avec HTTPServer: ouvre le port avec SO_REUSEPORT."""
+
+    # Les threads de requetes sont attendus a l'arret (arret propre)
+    daemon_threads = False
+
+    def server_bind(self):
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+def preparer_enfant(httpd):
+    """
+    Signaux cote enfant:
+    - SIGTERM: on arrete d'accepter, on finit les requetes en cours
+    - SIGINT / SIGHUP: ignores (c'est le superviseur qui decide)
+    """
+    def arreter(_signum, _frame):
+        # shutdown() attend la fin de serve_forever: il faut l'appeler depuis un autre thread
+        threading.Thread(target=httpd.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, arreter)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+
+# ============================================================
+# Superviseur
+# ============================================================
+
+def _commande_enfant():
+    """Meme ligne de commande que le superviseur, + --enfant."""
+    return [sys.executable, os.path.abspath(sys.argv[0])] + sys.argv[1:] + ["--enfant"]
+
+
+def _lancer_generation(nb_processus):
+    return [subprocess.Popen(_commande_enfant()) for _ in range(nb_processus)]
+
+
+def _arreter_generation(enfants):
+    """SIGTERM a chaque enfant, puis attente (SIGKILL si trop long)."""
+    for p in enfants:
+        if p.poll() is None:
+            p.terminate()
+    limite = time.time() + DELAI_ARRET
+    for p in enfants:
+        try:
+            p.wait(timeout=max(0.1, limite - time.time()))
+        except subprocess.TimeoutExpired:
+            p.kill()
+            p.wait()
+
+
+def superviser(nb_processus):
+    """Lance et surveille nb_processus serveurs enfants sur le meme port."""
+    if not reuseport_disponible():
+        raise SystemExit("SO_REUSEPORT indisponible sur ce systeme: utiliser --processus 1")
+
+    demandes = {"recharger": False, "arreter": False}
+
+    def demander_rechargement(_signum, _frame):
+        demandes["recharger"] = True
+
+    def demander_arret(_signum, _frame):
+        demandes["arreter"] = True
+
+    signal.signal(signal.SIGTERM, demander_arret)
+    signal.signal(signal.SIGINT, demander_arret)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, demander_rechargement)
+
+    enfants = _lancer_generation(nb_processus)
+    # Par enfant: date de lancement, echecs rapides de suite, date de relance prevue (None = vivant)
+    lances = [time.time()] * nb_processus
+    echecs = [0] * nb_processus
+    relances = [None] * nb_processus
+    print("Superviseur pid", os.getpid(), "-", nb_processus, "processus (SIGHUP = recharger)")
+
+    while not demandes["arreter"]:
+        time.sleep(0.5)
+
+        if demandes["recharger"]:
+            demandes["recharger"] = False
+            print("Rechargement: nouvelle generation de", nb_processus, "processus")
+            anciens = enfants
+            enfants = _lancer_generation(nb_processus)
+            lances = [time.time()] * nb_processus
+            echecs = [0] * nb_processus
+            relances = [None] * nb_processus
+            time.sleep(DELAI_RELAIS)
+            _arreter_generation(anciens)
+            continue
+
+        # Relancer un enfant mort sans qu'on le demande (pause croissante si il meurt au demarrage)
+        maintenant = time.time()
+        for i, p in enumerate(enfants):
+            if demandes["arreter"]:
+                break
+            if relances[i] is None:
+                if p.poll() is None:
+                    continue
+                if maintenant - lances[i] < DUREE_VIE_MIN:
+                    echecs[i] += 1
+                else:
+                    echecs[i] = 0
+                if echecs[i] >= MAX_ECHECS_RAPIDES:
+                    print("Processus", p.pid, "termine (code", p.returncode, "):",
+                          echecs[i], "echecs de suite au demarrage -> arret du superviseur")
+                    _arreter_generation(enfants)
+                    raise SystemExit(1)
+                pause = min(PAUSE_RELANCE_MAX, PAUSE_RELANCE_MIN * 2 ** max(0, echecs[i] - 1))
+                print("Processus", p.pid, "termine (code", p.returncode, ") -> relance dans", pause, "s")
+                relances[i] = maintenant + pause
+            elif maintenant >= relances[i]:
+                enfants[i] = subprocess.Popen(_commande_enfant())
+                lances[i] = maintenant
+                relances[i] = None
+
+    print("Arret: fin des requetes en cours...")
+    _arreter_generation(enfants)
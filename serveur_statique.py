@@ -0,0 +1,265 @@
+# serveur_statique.py
+# Fichiers statiques (images PNG de la racine, etc.): validateurs de cache + variantes
+#
+# Objectif:
+# - ETag fort (empreinte du contenu) + Last-Modified, reponse 304 si le navigateur a deja le fichier
+# - URLs avec empreinte (/fond.<empreinte>.png): Cache-Control longue duree (immutable)
+# - Etape de construction optionnelle (python serveur_statique.py --construire):
+#     * variante WebP des images (si Pillow est installe)
+#     * variante gzip des fichiers texte (svg, css, js, ...)
+#   La variante est choisie selon les en-tetes Accept / Accept-Encoding du navigateur
+#
+# IMPORTANT:
+# - Les fichiers d'origine ne sont jamais modifies
+# - Les variantes sont rangees dans DOSSIER_CONSTRUIT (non versionne)
+# - Une variante plus ancienne que le fichier d'origine est ignoree
+
+import os
+import re
+import sys
+import gzip
+import hashlib
+import argparse
+import urllib.parse
+
+
+# ============================================================
+# Constantes
+# ============================================================
+
+DOSSIER_CONSTRUIT = ".statique"
+
+EXTENSIONS_WEBP = (".png", ".jpg", ".jpeg")
+EXTENSIONS_GZIP = (".svg", ".css", ".js", ".html", ".txt", ".json")
+
+# Dossiers jamais parcourus par la construction
+DOSSIERS_IGNORES = (DOSSIER_CONSTRUIT, "cgi-bin", ".git", "__pycache__")
+
+# URL avec empreinte: /chemin/nom.<10 hex>.ext
+LONGUEUR_EMPREINTE = 10
+MOTIF_EMPREINTE = re.compile(r"^(.*)\.([0-9a-f]{%d})(\.[A-Za-z0-9]+)$" % LONGUEUR_EMPREINTE)
+
+CACHE_IMMUABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDER = "no-cache"
+
+# References a des fichiers statiques dans le HTML des pages: url('/x.png'), src="/x.png"
+MOTIF_REFERENCE = re.compile(
+    rb"""(?<=["'(])(/[^"'()\s?#<>]+\.(?:png|jpe?g|gif|svg|webp|css|js))(?=["')])"""
+)
+
+
+# ============================================================
+# Empreintes (cache par fichier, recalcule si le fichier change)
+# ============================================================
+
+_empreintes = {}  # chemin -> (mtime_ns, taille, empreinte_hex)
+
+
+def empreinte_fichier(chemin):
+    """Empreinte sha256 (hex) du contenu, mise en cache tant que le fichier ne change pas."""
+    st = os.stat(chemin)
+    entree = _empreintes.get(chemin)
+    if entree is not None and entree[0] == st.st_mtime_ns and entree[1] == st.st_size:
+        return entree[2]
+
+    h = hashlib.sha256()
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloc)
+    valeur = h.hexdigest()
+    _empreintes[chemin] = (st.st_mtime_ns, st.st_size, valeur)
+    return valeur
+
+
+def empreinte_courte(chemin):
+    return empreinte_fichier(chemin)[:LONGUEUR_EMPREINTE]
+
+
+def separer_empreinte(url_chemin):
+    """'/fond.0123456789.png' -> ('/fond.png', '0123456789'), sinon (url_chemin, None)."""
+    m = MOTIF_EMPREINTE.match(url_chemin)
+    if not m:
+        return url_chemin, None
+    return m.group(1) + m.group(3), m.group(2)
+
+
+def url_avec_empreinte(url_chemin, chemin_fichier):
+    """'/fond.png' -> '/fond.<empreinte>.png'."""
+    base, ext = os.path.splitext(url_chemin)
+    return "{}.{}{}".format(base, empreinte_courte(chemin_fichier), ext)
+
+
+# ============================================================
+# Variantes (WebP / gzip)
+# ============================================================
+
+def chemin_variante(racine, chemin_fichier, suffixe):
+    """Chemin de la variante construite: .statique/<chemin relatif><suffixe>."""
+    relatif = os.path.relpath(chemin_fichier, racine)
+    return os.path.join(racine, DOSSIER_CONSTRUIT, relatif + suffixe)
+
+
+def variante_valide(chemin_fichier, chemin_var):
+    """Une variante n'est utilisee que si elle existe et n'est pas plus ancienne que l'original."""
+    try:
+        return os.stat(chemin_var).st_mtime_ns >= os.stat(chemin_fichier).st_mtime_ns
+    except OSError:
+        return False
+
+
+def accepte(valeur_entete, jeton):
+    """Vrai si l'en-tete (Accept / Accept-Encoding) accepte le jeton (q > 0)."""
+    for morceau in (valeur_entete or "").split(","):
+        parties = [p.strip() for p in morceau.split(";")]
+        if parties[0].lower() != jeton:
+            continue
+        for p in parties[1:]:
+            if p.startswith("q="):
+                try:
+                    return float(p[2:]) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def choisir_variante(racine, chemin_fichier, accept, accept_encoding):
+    """
+    Choisit le fichier a envoyer.
+    Retour: (chemin_a_envoyer, type_mime_force_ou_None, content_encoding_ou_None, vary_ou_None)
+    """
+    ext = os.path.splitext(chemin_fichier)[1].lower()
+
+    if ext in EXTENSIONS_WEBP:
+        webp = chemin_variante(racine, chemin_fichier, ".webp")
+        if variante_valide(chemin_fichier, webp):
+            if accepte(accept, "image/webp"):
+                return webp, "image/webp", None, "Accept"
+            return chemin_fichier, None, None, "Accept"
+
+    if ext in EXTENSIONS_GZIP:
+        gz = chemin_variante(racine, chemin_fichier, ".gz")
+        if variante_valide(chemin_fichier, gz):
+            if accepte(accept_encoding, "gzip"):
+                return gz, None, "gzip", "Accept-Encoding"
+            return chemin_fichier, None, None, "Accept-Encoding"
+
+    return chemin_fichier, None, None, None
+
+
+def etag(chemin_envoye):
+    """ETag fort: empreinte du contenu reellement envoye (chaque variante a le sien)."""
+    return '"' + empreinte_fichier(chemin_envoye)[:32] + '"'
+
+
+def etag_correspond(if_none_match, valeur_etag):
+    """Compare If-None-Match (liste possible, W/ toleres) a l'ETag courant."""
+    if not if_none_match:
+        return False
+    for morceau in if_none_match.split(","):
+        m = morceau.strip()
+        if m == "*":
+            return True
+        if m.startswith("W/"):
+            m = m[2:]
+        if m == valeur_etag:
+            return True
+    return False
+
+
+# ============================================================
+# Reecriture des references dans le HTML (option --empreintes)
+# ============================================================
+
+def reecrire_references(corps, traduire_chemin):
+    """
+    Remplace les references '/x.png' du HTML par '/x.<empreinte>.png'.
+    traduire_chemin: fonction URL -> chemin disque (translate_path du gestionnaire)
+    """
+    def remplacer(m):
+        url = m.group(1)
+        try:
+            chemin = traduire_chemin(urllib.parse.unquote(url.decode("utf-8")))
+            if not os.path.isfile(chemin):
+                return url
+            return url_avec_empreinte(url.decode("utf-8"), chemin).encode("utf-8")
+        except (OSError, UnicodeDecodeError):
+            return url
+
+    return MOTIF_REFERENCE.sub(remplacer, corps)
+
+
+# ============================================================
+# Etape de construction (variantes)
+# ============================================================
+
+def _fichiers_statiques(racine):
+    for dossier, sous_dossiers, fichiers in os.walk(racine):
+        relatif = os.path.relpath(dossier, racine)
+        premier = relatif.split(os.sep)[0]
+        if premier in DOSSIERS_IGNORES or premier.startswith("."):
+            if relatif != ".":
+                sous_dossiers[:] = []
+                continue
+        sous_dossiers[:] = [d for d in sous_dossiers if d not in DOSSIERS_IGNORES and not d.startswith(".")]
+        for nom in fichiers:
+            yield os.path.join(dossier, nom)
+
+
+def construire_variantes(racine=".", qualite_webp=80, niveau_gzip=9):
+    """Genere les variantes WebP / gzip. Une variante plus grosse que l'original est abandonnee."""
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+        print("Pillow absent: pas de variantes WebP (pip install Pillow)")
+
+    racine = os.path.abspath(racine)
+    nb = 0
+    for chemin in _fichiers_statiques(racine):
+        ext = os.path.splitext(chemin)[1].lower()
+        taille = os.path.getsize(chemin)
+
+        if ext in EXTENSIONS_WEBP and Image is not None:
+            cible = chemin_variante(racine, chemin, ".webp")
+            if not variante_valide(chemin, cible):
+                os.makedirs(os.path.dirname(cible), exist_ok=True)
+                try:
+                    with Image.open(chemin) as img:
+                        img.save(cible, "WEBP", quality=qualite_webp, method=6)
+                except Exception as e:
+                    print("WebP impossible:", chemin, e)
+                    continue
+                if os.path.getsize(cible) >= taille:
+                    os.remove(cible)
+                else:
+                    nb += 1
+                    print("webp", os.path.relpath(chemin, racine), taille, "->", os.path.getsize(cible))
+
+        if ext in EXTENSIONS_GZIP:
+            cible = chemin_variante(racine, chemin, ".gz")
+            if not variante_valide(chemin, cible):
+                os.makedirs(os.path.dirname(cible), exist_ok=True)
+                with open(chemin, "rb") as f:
+                    donnees = gzip.compress(f.read(), compresslevel=niveau_gzip, mtime=0)
+                if len(donnees) >= taille:
+                    continue
+                with open(cible, "wb") as f:
+                    f.write(donnees)
+                nb += 1
+                print("gzip", os.path.relpath(chemin, racine), taille, "->", len(donnees))
+
+    print(nb, "variante(s) construite(s) dans", os.path.join(racine, DOSSIER_CONSTRUIT))
+    return nb
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Variantes des fichiers statiques (WebP, gzip)")
+    parser.add_argument("--construire", action="store_true", help="generer les variantes")
+    parser.add_argument("--racine", default=".")
+    parser.add_argument("--qualite-webp", type=int, default=80)
+    options = parser.parse_args()
+    if not options.construire:
+        parser.print_help()
+        sys.exit(0)
+    construire_variantes(options.racine, qualite_webp=options.qualite_webp)
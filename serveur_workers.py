@@ -0,0 +1,240 @@
+# serveur_workers.py
+# Pool de processus "workers" pre-lances pour les pages CGI (facon FastCGI)
+#
+# Objectif:
+# - Lancer N processus a l'avance, avec sqlite3 / difflib / stats_utils / sim_calc deja importes
+# - Chaque requete est envoyee a un worker libre, qui execute le script de cgi-bin
+#   avec l'environnement CGI de la requete (voir serveur_pages.executer_page)
+# - Un worker est recycle apres max_requetes pages (fuites memoire, etat residuel)
+# - Si trop de requetes attendent un worker libre -> refus (503) au lieu d'empiler
+# - Worker mort pendant une page (os._exit, crash) -> 502, et un worker neuf le remplace
+#
+# IMPORTANT:
+# - Les scripts ne sont pas modifies
+# - Un worker ne traite qu'une page a la fois (pas de partage d'etat entre requetes simultanees)
+# - Les workers de remplacement sont forkes par un seul thread dedie ("lanceur"), jamais par
+#   un thread de requete: l'enfant n'herite pas d'un verrou pris par une page en cours
+
+import sys
+import time
+import queue
+import threading
+import multiprocessing
+
+import serveur_pages
+
+
+# ============================================================
+# Constantes par defaut
+# ============================================================
+
+NB_WORKERS_DEFAUT = 4
+MAX_REQUETES_DEFAUT = 500
+FILE_MAX_DEFAUT = 64
+
+# Temps max (secondes) d'attente d'un worker libre
+DELAI_ATTENTE_DEFAUT = 30.0
+
+# Pause (secondes) avant un nouvel essai si un worker ne peut pas etre lance
+PAUSE_RELANCE = 1.0
+
+# Modules importes une fois pour toutes (avant le fork)
+MODULES_PRECHARGES = (
+    "sqlite3",
+    "difflib",
+    "html",
+    "json",
+    "urllib.parse",
+    "urllib.request",
+    "acces_bdd",
+    "migrations",
+    "catalogue",
+    "facettes",
+    "stats_utils",
+    "sim_calc",
+)
+
+# Modules optionnels: precharges seulement s'ils sont installes (numpy: moteur sim_vectoriel)
+MODULES_OPTIONNELS = ("numpy",)
+
+
+class FileSaturee(Exception):
+    """Trop de requetes en attente d'un worker."""
+
+
+class WorkerPerdu(Exception):
+    """Le worker s'est arrete pendant la page (aucune sortie)."""
+
+
+def precharger_modules():
+    """Importe les modules lourds (chemin cgi-bin compris)."""
+    serveur_pages.installer_aiguillages()
+    for nom in MODULES_PRECHARGES:
+        try:
+            __import__(nom)
+        except Exception as e:
+            sys.stderr.write("Prechargement impossible ({}): {}\n".format(nom, e))
+    for nom in MODULES_OPTIONNELS:
+        try:
+            # Acces a un attribut: charge vraiment un module deja differe (import_differe)
+            getattr(__import__(nom), "__file__", None)
+        except ImportError:
+            pass
+
+
+# ============================================================
+# Cote worker (processus enfant)
+# ============================================================
+
+def _boucle_worker(connexion, max_requetes):
+    """Boucle d'un worker: recoit (script, environ, corps), renvoie la sortie CGI."""
+    precharger_modules()
+    nb = 0
+    while nb < max_requetes:
+        try:
+            travail = connexion.recv()
+        except (EOFError, OSError):
+            break
+        if travail is None:
+            break
+        chemin_script, environ_cgi, corps = travail
+        sortie = serveur_pages.executer_page(chemin_script, environ_cgi, corps)
+        connexion.send(sortie)
+        nb += 1
+    connexion.close()
+
+
+# ============================================================
+# Cote serveur (processus parent)
+# ============================================================
+
+def _contexte():
+    """fork si disponible (modules deja charges dans le parent), sinon spawn."""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+class _Worker:
+    """Un processus worker + son tuyau de communication."""
+
+    def __init__(self, contexte, max_requetes):
+        self.connexion, connexion_enfant = contexte.Pipe()
+        self.processus = contexte.Process(
+            target=_boucle_worker,
+            args=(connexion_enfant, max_requetes),
+            daemon=True
+        )
+        self.processus.start()
+        connexion_enfant.close()
+        self.nb_requetes = 0
+        self.max_requetes = max_requetes
+
+    def executer(self, chemin_script, environ_cgi, corps):
+        self.connexion.send((chemin_script, environ_cgi, corps))
+        sortie = self.connexion.recv()
+        self.nb_requetes += 1
+        return sortie
+
+    def est_use(self):
+        return self.nb_requetes >= self.max_requetes or not self.processus.is_alive()
+
+    def arreter(self):
+        try:
+            self.connexion.send(None)
+        except Exception:
+            pass
+        self.connexion.close()
+        self.processus.join(timeout=2)
+        if self.processus.is_alive():
+            self.processus.terminate()
+
+
+class PoolWorkers:
+    """Pool de workers pre-lances, avec recyclage et limite de file d'attente."""
+
+    def __init__(self, nb_workers=NB_WORKERS_DEFAUT, max_requetes=MAX_REQUETES_DEFAUT,
+                 file_max=FILE_MAX_DEFAUT, delai_attente=DELAI_ATTENTE_DEFAUT):
+        self.nb_workers = max(1, int(nb_workers))
+        self.max_requetes = max(1, int(max_requetes))
+        self.file_max = max(0, int(file_max))
+        self.delai_attente = delai_attente
+
+        self._contexte = _contexte()
+        self._libres = queue.Queue()
+        self._en_cours = 0
+        self._verrou = threading.Lock()
+        self._local = threading.local()
+
+        precharger_modules()
+        for _ in range(self.nb_workers):
+            self._libres.put(_Worker(self._contexte, self.max_requetes))
+
+        # Workers a remplacer -> thread lanceur (arrete l'ancien, forke le nouveau)
+        self._a_remplacer = queue.Queue()
+        self._lanceur = threading.Thread(target=self._boucle_lanceur, name="lanceur-workers", daemon=True)
+        self._lanceur.start()
+
+    def _boucle_lanceur(self):
+        """Seul thread qui forke apres le demarrage: remplace les workers uses ou morts."""
+        while True:
+            ancien = self._a_remplacer.get()
+            if ancien is None:
+                break
+            ancien.arreter()
+            while True:
+                try:
+                    self._libres.put(_Worker(self._contexte, self.max_requetes))
+                    break
+                except Exception as e:
+                    sys.stderr.write("Lancement d'un worker impossible: {}\n".format(e))
+                    time.sleep(PAUSE_RELANCE)
+
+    def executer(self, chemin_script, environ_cgi, corps=b""):
+        """
+        Execute une page sur un worker libre.
+        Leve FileSaturee si la file est pleine, WorkerPerdu si le worker meurt pendant la page.
+        """
+        with self._verrou:
+            # en cours = pages sur un worker + pages en attente d'un worker
+            if self._en_cours >= self.nb_workers + self.file_max:
+                raise FileSaturee()
+            self._en_cours += 1
+        try:
+            debut = time.perf_counter()
+            try:
+                worker = self._libres.get(timeout=self.delai_attente)
+            except queue.Empty:
+                raise FileSaturee()
+            self._local.attente = time.perf_counter() - debut
+
+            try:
+                sortie = worker.executer(chemin_script, environ_cgi, corps)
+            except (EOFError, OSError) as e:
+                # Worker mort pendant la page: remplace par le lanceur, erreur signalee au client
+                self._a_remplacer.put(worker)
+                raise WorkerPerdu() from e
+
+            if worker.est_use():
+                self._a_remplacer.put(worker)
+            else:
+                self._libres.put(worker)
+            return sortie
+        finally:
+            with self._verrou:
+                self._en_cours -= 1
+
+    def derniere_attente(self):
+        """Temps (s) passe a attendre un worker libre pour la derniere page de ce thread."""
+        return getattr(self._local, "attente", 0.0)
+
+    def arreter(self):
+        """Arrete le lanceur et tous les workers libres."""
+        self._a_remplacer.put(None)
+        self._lanceur.join(timeout=5)
+        while True:
+            try:
+                worker = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            worker.arreter()